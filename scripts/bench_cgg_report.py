@@ -0,0 +1,623 @@
+# -*- coding: utf-8 -*-
+# Benchmarks for generate_cgg_report.py and its renderers.
+#   python scripts/bench_cgg_report.py table [--sizes 1000 10000 100000]
+#   python scripts/bench_cgg_report.py code [--lines 50000]
+#   python scripts/bench_cgg_report.py template [--reports 50]
+#   python scripts/bench_cgg_report.py analytics [--messages 10000000]
+#   python scripts/bench_cgg_report.py geo [--profiles 100000]
+#   python scripts/bench_cgg_report.py startup [--runs 10] [--target-ms 100]
+#   python scripts/bench_cgg_report.py service [--requests 50] [--records 1000]
+#   python scripts/bench_cgg_report.py suite [--scales 1000 100000 1000000]
+#       [--output results.json] [--baseline baseline.json] [--threshold 0.25]
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from docx import Document
+
+import cgg_cache
+import cgg_docx
+import generate_cgg_report
+
+PROFILE_HEADERS = ["uid", "displayName", "city", "styles", "latitude", "longitude"]
+
+
+def synthetic_profile_rows(n):
+    for i in range(n):
+        yield [
+            f"uid{i:08d}",
+            f"Artist {i}",
+            ("Montréal", "Québec", "Laval", "Toronto")[i % 4],
+            "blackwork, fineline",
+            f"{45.5 + (i % 1000) / 10000:.5f}",
+            f"{-73.6 + (i % 1000) / 10000:.5f}",
+        ]
+
+
+def bench_table(sizes):
+    results = []
+    for n in sizes:
+        doc = Document()
+        t0 = time.perf_counter()
+        cgg_docx.add_table(doc, PROFILE_HEADERS, synthetic_profile_rows(n),
+                           col_widths_pt=[70, 80, 60, 100, 55, 55])
+        elapsed = time.perf_counter() - t0
+        results.append((n, elapsed))
+        print(f"add_table rows={n:>8}  {elapsed:8.3f}s  {elapsed / n * 1e6:7.2f} us/row")
+    # Near-linear scaling: per-row cost of the largest run vs the smallest
+    if len(results) > 1:
+        (n0, t0), (n1, t1) = results[0], results[-1]
+        print(f"per-row cost ratio {n1}/{n0} rows: {(t1 / n1) / (t0 / n0):.2f}x")
+    return results
+
+
+def bench_code(lines):
+    # The deployed database rules repeated up to `lines` lines, plain and
+    # highlighted (highlighting stops at cgg_highlight.MAX_LINES)
+    import cgg_highlight
+
+    source = generate_cgg_report.RULES_PATH.read_text(encoding='utf-8')
+    text = '\n'.join([source] * max(1, lines // (source.count('\n') + 1)))
+    results = []
+    for language in (None, 'json'):
+        cgg_highlight._cache.clear()
+        doc = Document()
+        t0 = time.perf_counter()
+        cgg_docx.add_code_block(doc, text, language)
+        elapsed = time.perf_counter() - t0
+        with tempfile.TemporaryDirectory() as tmp:
+            t0 = time.perf_counter()
+            doc.save(f"{tmp}/code.docx")
+            saved = time.perf_counter() - t0
+        results.append((language, elapsed, saved))
+        print(f"add_code_block lines={text.count(chr(10)) + 1:>8}  language={language or '-':<5} "
+              f"{elapsed:7.3f}s  save {saved:7.3f}s")
+    return results
+
+
+def _per_report(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def bench_template(n):
+    report = generate_cgg_report.build_report()
+    skeleton = report.nodes[:report.skeleton]
+
+    def cold():
+        # What every report paid before the template cache
+        doc = Document()
+        cgg_docx.set_styles(doc)
+        for node in skeleton:
+            cgg_docx.RENDERERS[type(node)](doc, node)
+        cgg_docx.add_footer_page_numbers(doc)
+
+    def disk_hit():
+        cgg_docx._templates.clear()
+        cgg_docx.open_template(skeleton)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cgg_cache.CACHE_DIR = cache_dir
+        cgg_docx.template_bytes(skeleton)
+        results = {
+            'cold setup': _per_report(cold, n),
+            'disk cache, first report in process': _per_report(disk_hit, n),
+            'warm clone': _per_report(lambda: cgg_docx.open_template(skeleton), n),
+        }
+    base = results['cold setup']
+    for name, t in results.items():
+        print(f"{name:<36} {t * 1000:8.2f} ms/report  saving {(base - t) * 1000:7.2f} ms")
+    return results
+
+
+def bench_analytics(n, threads=None, artists=5000):
+    # Aggregation only: the columns are what analyze_export() builds from a scan
+    import numpy as np
+
+    import cgg_analytics
+
+    rng = np.random.default_rng(0)
+    threads = threads or max(1, n // 20)
+    cats = cgg_analytics.Categories()
+    for i in range(threads):
+        cats.code(f"t{i}")
+    messages = {
+        'thread': rng.integers(0, threads, n, dtype=np.int32),
+        'createdAt': 1.7e12 + rng.random(n) * 365 * cgg_analytics.DAY_MS,
+    }
+    t0 = time.perf_counter()
+    cgg_analytics._analyze_messages(messages, cats)
+    elapsed = time.perf_counter() - t0
+    print(f"messages={n:>10}  threads={threads:>8}  {elapsed:7.3f}s  {elapsed / n * 1e9:6.1f} ns/message")
+
+    codes = rng.integers(0, artists, n, dtype=np.int32)
+    minutes = rng.choice([60.0, 90.0, 120.0, 180.0], n)
+    t0 = time.perf_counter()
+    cgg_analytics.group_stats(codes, minutes, artists)
+    elapsed = time.perf_counter() - t0
+    print(f"group_stats rows={n:>10}  groups={artists:>6}  {elapsed:7.3f}s")
+    return elapsed
+
+
+def bench_geo(n, spread=0.3):
+    # Nearest-neighbour and coverage queries on clustered coordinates: n
+    # artists around five cities and n clients spread wider around them
+    import numpy as np
+
+    import cgg_geo
+
+    rng = np.random.default_rng(0)
+    centers = np.array([[45.50, -73.57], [46.81, -71.21], [43.65, -79.38],
+                        [49.28, -123.12], [51.05, -114.07]])
+    c = rng.integers(0, len(centers), n)
+    lat = centers[c, 0] + rng.normal(0, 0.08, n)
+    lon = centers[c, 1] + rng.normal(0, 0.12, n)
+    c = rng.integers(0, len(centers), n)
+    clat = centers[c, 0] + rng.normal(0, spread, n)
+    clon = centers[c, 1] + rng.normal(0, spread * 1.5, n)
+
+    t0 = time.perf_counter()
+    cgg_geo.artist_nearest(lat, lon)
+    elapsed = time.perf_counter() - t0
+    print(f"artist NN     profiles={n:>8}  {elapsed:7.3f}s")
+    t0 = time.perf_counter()
+    cgg_geo.GridIndex(lat, lon).nearest(clat, clon)
+    elapsed = time.perf_counter() - t0
+    print(f"client cover  profiles={n:>8}  {elapsed:7.3f}s")
+    return elapsed
+
+
+STARTUP_TARGET_MS = 100
+
+
+def _import_times(stderr):
+    # -X importtime output -> [(module, cumulative us)] for top-level imports
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            imports.append((name.strip(), int(cumulative)))
+    return imports
+
+
+def bench_startup(runs=10, target_ms=STARTUP_TARGET_MS):
+    # Wall time of a complete Markdown-only run (interpreter start, imports,
+    # report build, render) -> 1 when the best of `runs` misses target_ms
+    script = str(Path(__file__).with_name("generate_cgg_report.py"))
+    with tempfile.TemporaryDirectory() as tmp:
+        command = [sys.executable, script, "--format", "md", "--out", tmp]
+        best = float("inf")
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+            best = min(best, time.perf_counter() - t0)
+        proc = subprocess.run(command[:1] + ["-X", "importtime"] + command[1:],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    imports = _import_times(proc.stderr)
+    backends = sorted(m for m, _ in imports if m.split(".")[0] in ("docx", "lxml", "reportlab", "numpy"))
+    print(f"imports {sum(us for _, us in imports) / 1000:7.1f} ms", file=sys.stderr)
+    for name, us in sorted(imports, key=lambda i: -i[1])[:8]:
+        print(f"  {name:<28} {us / 1000:7.1f} ms", file=sys.stderr)
+    if backends:
+        print(f"backend modules imported by a Markdown run: {', '.join(backends)}", file=sys.stderr)
+    print(f"markdown run  best of {runs}: {best * 1000:7.1f} ms  (target {target_ms} ms)",
+          file=sys.stderr)
+    return 1 if best * 1000 > target_ms or backends else 0
+
+
+async def _fetch(port, target):
+    # -> (status, raw response, seconds); the body is still chunk-encoded
+    import asyncio
+
+    t0 = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1]), response, time.perf_counter() - t0
+
+
+def bench_service(requests, records=1000, artists=4, data_dir=None):
+    # Two bursts of concurrent requests against --serve on a synthetic
+    # export: both formats of the platform report and a few artists, each
+    # asked for many times at once. Identical requests must share one render.
+    import asyncio
+
+    export = synthetic_export(data_dir or Path(tempfile.gettempdir()) / "cgg-bench", records)
+    targets = [f"/report?format={fmt}" for fmt in ("docx", "pdf")]
+    targets += [f"/report/artist{i:07d}?format=pdf" for i in range(artists)]
+    script = str(Path(__file__).with_name("generate_cgg_report.py"))
+    server = subprocess.Popen([sys.executable, script, "--serve", "0", "--input", str(export)],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(server.stdout.readline().split("127.0.0.1:")[1].split("/")[0])
+
+        async def burst():
+            t0 = time.perf_counter()
+            results = await asyncio.gather(*(_fetch(port, targets[i % len(targets)])
+                                             for i in range(requests)))
+            return results, time.perf_counter() - t0
+
+        for label in ("cold", "cached"):
+            results, elapsed = asyncio.run(burst())
+            latencies = sorted(seconds for _, _, seconds in results)
+            failed = sorted(status for status, _, _ in results if status != 200)
+            print(f"{label:<7} requests={requests:>5}  distinct={len(targets)}  {elapsed:7.3f}s  "
+                  f"p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms  "
+                  f"max {latencies[-1] * 1000:7.1f} ms  failed={len(failed)} {failed[:1]}")
+        _, response, _ = asyncio.run(_fetch(port, "/health"))
+        health = json.loads(response.split(b"\r\n\r\n", 1)[1])
+        print(f"renders={health['renders']} for {requests * 2} requests "
+              f"({len(targets)} distinct), cache {health['cache_bytes'] / 1024:.0f} KiB")
+        return health
+    finally:
+        server.terminate()
+        server.wait()
+
+
+# -- suite -------------------------------------------------------------------
+# Times add_table, add_code_block, add_content and the full DOCX + PDF build
+# on synthetic RTDB exports of increasing size. Every (step, scale) runs in
+# a fresh interpreter with an empty CGG_CACHE_DIR, so its peak RSS and its
+# cold-cache time are its own; save_docx_and_pdf_warm times a second build
+# against the caches filled by a first one. The results are written as JSON
+# and compared against a baseline file from an earlier run.
+
+SUITE_SCALES = [1_000, 100_000, 1_000_000]
+SUITE_STEPS = ["add_table", "add_code_block", "add_content", "save_docx_and_pdf",
+               "save_docx_and_pdf_warm"]
+SUITE_THRESHOLD = 0.25     # allowed relative growth of time / peak RSS / output size
+SUITE_SLACK_SECONDS = 0.05  # smaller time differences are noise
+SUITE_SLACK_MIB = 8
+EXPORT_VERSION = 2         # bump when write_synthetic_export() changes its output
+
+CITIES = [("Montréal", 45.50, -73.57), ("Québec", 46.81, -71.21), ("Laval", 45.57, -73.70),
+          ("Sherbrooke", 45.40, -71.89), ("Gatineau", 45.48, -75.70)]
+STYLES = ["blackwork", "fineline", "réalisme", "traditionnel", "japonais", "minimaliste"]
+LEAD_STATUSES = ["new", "accepted", "declined", "archived"]  # database.rules.json
+CARE_STATUSES = ["active", "completed", "completed"]
+T0_MS = 1_700_000_000_000
+# Records per artist in write_synthetic_export(): 3 profiles, 3 users,
+# 2 threads, 10 messages, 2 userThreads, 3 + 3 leads, 2 appointments,
+# 1 stencil, 1 + 1 aftercare
+RECORDS_PER_ARTIST = 31
+
+
+def _mix(k):
+    # Deterministic value in [0, 1) for record k, so the two views of a lead
+    # or aftercare record (by artist, by client) agree
+    return (k * 2654435761 % 4294967296) / 4294967296
+
+
+def _synthetic_nodes(artists, rng):
+    # -> [(top-level node, iterator of (key path, record))] with the paths
+    # and fields of database.rules.json, every record valid under its
+    # .validate rules; paths are at most two keys deep and grouped by their
+    # first key
+    from cgg_analytics import DAY_MS
+
+    clients = 2 * artists
+    leads = 3 * artists
+
+    def uid(i):
+        return f"artist{i:07d}" if i < artists else f"client{i - artists:07d}"
+
+    def when(k, days=60):
+        return T0_MS + int(_mix(k) * days * DAY_MS)
+
+    def profiles():
+        for i in range(artists + clients):
+            city, lat, lon = CITIES[int(rng.random() * len(CITIES))]
+            yield (uid(i),), {
+                "role": "artist" if i < artists else "client", "isPublic": True,
+                "displayName": uid(i).title(), "city": city, "styles": rng.sample(STYLES, 2),
+                "rating": round(3 + 2 * rng.random(), 1),
+                "latitude": round(rng.gauss(lat, 0.08), 5),
+                "longitude": round(rng.gauss(lon, 0.12), 5),
+            }
+
+    def users():
+        for i in range(artists + clients):
+            yield (uid(i),), {"role": "artist" if i < artists else "client",
+                              "email": f"{uid(i)}@example.com", "displayName": uid(i).title(),
+                              "createdAt": when(i, 365)}
+
+    def threads():
+        for c in range(clients):
+            yield (f"thread{c:07d}",), {
+                "members": {uid(c % artists): True, uid(artists + c): True},
+                "createdAt": when(c), "lastMessage": "Bonjour !",
+            }
+
+    def messages():
+        for c in range(clients):
+            at = when(c)
+            for k in range(5):
+                at += int(rng.expovariate(1 / 3_600_000))
+                yield (f"thread{c:07d}", f"msg{k}"), {
+                    "id": f"msg{k}", "senderId": uid(artists + c if k % 2 == 0 else c % artists),
+                    "kind": "text", "text": "Bonjour !", "createdAt": at,
+                }
+
+    def user_threads():
+        for c in range(clients):
+            yield (uid(artists + c), f"thread{c:07d}"), {"updatedAt": when(c), "unreadCount": c % 3,
+                                                                "lastMessage": "Bonjour !"}
+
+    def lead(k):
+        client = uid(artists + k % clients)
+        return {"clientId": client, "clientName": client.title(),
+                "style": STYLES[k % len(STYLES)], "message": "Projet de tatouage",
+                "city": CITIES[k % len(CITIES)][0],
+                "status": LEAD_STATUSES[int(_mix(k + 1) * len(LEAD_STATUSES))],
+                "createdAt": when(k)}
+
+    def leads_by_artist():
+        for k in range(leads):
+            yield (uid(k // 3), f"lead{k:07d}"), lead(k)
+
+    def leads_by_client():
+        for c in range(clients):
+            for k in range(c, leads, clients):
+                yield (uid(artists + c), f"lead{k:07d}"), dict(lead(k), artistUid=uid(k // 3))
+
+    def appointments():
+        for a in range(artists):
+            for j in range(2):
+                start = when(2 * a + j)
+                yield (uid(a), f"appt{j}"), {"title": "Séance", "startsAt": start,
+                                             "endsAt": start + (60 + 30 * (a % 4)) * 60_000}
+
+    def stencils():
+        for a in range(artists):
+            yield (uid(a), "stencil0"), {"name": "Flash", "createdAt": when(a),
+                                         "downloadURL": f"https://example.com/{uid(a)}.png"}
+
+    def care(a):
+        created = when(a)
+        return {"clientUid": uid(artists + 2 * a), "clientName": uid(artists + 2 * a).title(),
+                "status": CARE_STATUSES[a % len(CARE_STATUSES)], "createdAt": created,
+                "updatedAt": created + int(_mix(a + 2) * 30 * DAY_MS)}
+
+    def care_by_artist(a):
+        return dict(care(a), aftercareId=f"care{a:07d}")
+
+    def care_by_client(a):
+        return dict(care(a), artistUid=uid(a), artistName=uid(a).title(),
+                    instructions={"0": "Hydrater deux fois par jour", "1": "Éviter le soleil"})
+
+    return [
+        ("publicProfiles", profiles()),
+        ("users", users()),
+        ("threads", threads()),
+        ("messages", messages()),
+        ("userThreads", user_threads()),
+        ("leadsByArtist", leads_by_artist()),
+        ("leadsByClient", leads_by_client()),
+        ("appointmentsByArtist", appointments()),
+        ("stencilsByUser", stencils()),
+        ("aftercareByArtist", (((uid(a), f"care{a:07d}"), care_by_artist(a)) for a in range(artists))),
+        ("aftercareByClient", (((uid(artists + 2 * a), f"care{a:07d}"), care_by_client(a))
+                               for a in range(artists))),
+    ]
+
+
+def write_synthetic_export(path, records, seed=0):
+    # Streams an export of about `records` records to path -> records written
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    written = 0
+    with open(path, "w", encoding="utf-8") as out:
+        out.write("{")
+        nodes = _synthetic_nodes(max(1, records // RECORDS_PER_ARTIST), random.Random(seed))
+        for n, (node, items) in enumerate(nodes):
+            out.write(f'{"," if n else ""}{dumps(node)}:{{')
+            parent = None
+            sep = ""
+            for keys, record in items:
+                if len(keys) == 2 and keys[0] != parent:
+                    out.write(f'{"}," if parent is not None else ""}{dumps(keys[0])}:{{')
+                    parent = keys[0]
+                    sep = ""
+                out.write(f"{sep}{dumps(keys[-1])}:{dumps(record)}")
+                sep = ","
+                written += 1
+            out.write("}}" if parent is not None else "}")
+        out.write("}")
+    return written
+
+
+def synthetic_export(data_dir, records, seed=0):
+    # Cached export for this scale and generator version
+    path = Path(data_dir) / f"rtdb-{records}-s{seed}-v{EXPORT_VERSION}.json"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".part")
+        write_synthetic_export(partial, records, seed)
+        # Records that break database.rules.json would make the suite time
+        # the violations annex instead of the normal report
+        violations = generate_cgg_report.scan_export(str(partial)).total_violations
+        if violations:
+            raise AssertionError(f"synthetic export breaks database.rules.json: {violations} violation(s)")
+        partial.replace(path)
+    return path
+
+
+def _peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+
+
+def run_step(step, scale, export):
+    # One measurement in this process -> {"seconds", "peak_rss_mib", ...}
+    result = {}
+    if step == "add_table":
+        rows = synthetic_profile_rows(scale)
+        doc = Document()
+        t0 = time.perf_counter()
+        cgg_docx.add_table(doc, PROFILE_HEADERS, rows, col_widths_pt=[70, 80, 60, 100, 55, 55])
+        elapsed = time.perf_counter() - t0
+    elif step == "add_code_block":
+        source = generate_cgg_report.RULES_PATH.read_text(encoding="utf-8").splitlines()
+        text = "\n".join(source[i % len(source)] for i in range(scale))
+        doc = Document()
+        t0 = time.perf_counter()
+        cgg_docx.add_code_block(doc, text, "json")
+        elapsed = time.perf_counter() - t0
+    elif step == "add_content":
+        from cgg_model import Report
+
+        stats, activity, geography = generate_cgg_report.analyze_input(export)
+        t0 = time.perf_counter()
+        report = Report()
+        generate_cgg_report.add_content(report, stats, activity, geography)
+        elapsed = time.perf_counter() - t0
+        result["nodes"] = len(report)
+        result["violations"] = stats.total_violations
+    elif step in ("save_docx_and_pdf", "save_docx_and_pdf_warm"):
+        with tempfile.TemporaryDirectory() as tmp:
+            if step == "save_docx_and_pdf_warm":
+                generate_cgg_report.save_report(("docx", "pdf"), tmp, input_path=export)
+            t0 = time.perf_counter()
+            paths = generate_cgg_report.save_report(("docx", "pdf"), tmp, input_path=export)
+            elapsed = time.perf_counter() - t0
+            result["output_bytes"] = {fmt: os.path.getsize(p) for fmt, p in paths.items()}
+    else:
+        raise ValueError(f"unknown step: {step}")
+    result["seconds"] = round(elapsed, 4)
+    result["peak_rss_mib"] = round(_peak_rss_mib(), 1)
+    return result
+
+
+def run_suite(scales, steps, data_dir, seed=0):
+    results = {}
+    for scale in scales:
+        t0 = time.perf_counter()
+        export = synthetic_export(data_dir, scale, seed)
+        print(f"export records={scale:>9}  {export.stat().st_size / 2**20:8.1f} MiB"
+              f"  ({time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+        for step in steps:
+            # CGG_CACHE_DIR is read at import time, hence one directory per step
+            with tempfile.TemporaryDirectory(prefix="cgg-bench-cache-") as cache_dir:
+                proc = subprocess.run(
+                    [sys.executable, __file__, "_step", step, str(scale), str(export)],
+                    stdout=subprocess.PIPE, check=True, text=True,
+                    env=dict(os.environ, CGG_CACHE_DIR=cache_dir),
+                )
+            result = json.loads(proc.stdout.splitlines()[-1])
+            results[f"{step}/{scale}"] = dict(result, step=step, scale=scale)
+            size = sum(result.get("output_bytes", {}).values())
+            print(f"{step:<22} records={scale:>9}  {result['seconds']:8.3f}s"
+                  f"  rss {result['peak_rss_mib']:7.1f} MiB"
+                  + (f"  output {size / 2**20:6.2f} MiB" if size else ""), file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold=SUITE_THRESHOLD):
+    # -> regression messages for every measurement shared with the baseline
+    # that grew by more than threshold (and more than the absolute slack)
+    regressions = []
+    for key, new in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        checks = [("seconds", new["seconds"], old["seconds"], SUITE_SLACK_SECONDS),
+                  ("peak_rss_mib", new["peak_rss_mib"], old["peak_rss_mib"], SUITE_SLACK_MIB)]
+        for fmt, size in new.get("output_bytes", {}).items():
+            if fmt in old.get("output_bytes", {}):
+                checks.append((f"{fmt} bytes", size, old["output_bytes"][fmt], 0))
+        for metric, value, reference, slack in checks:
+            if value > reference * (1 + threshold) and value - reference > slack:
+                regressions.append(f"{key} {metric}: {value:g} vs baseline {reference:g} "
+                                   f"(+{(value / reference - 1) * 100 if reference else float('inf'):.0f} %)")
+    return regressions
+
+
+def bench_suite(scales, steps, output, baseline=None, threshold=SUITE_THRESHOLD, data_dir=None):
+    results = run_suite(scales, steps, data_dir or Path(tempfile.gettempdir()) / "cgg-bench")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                   "cpus": os.cpu_count(), "results": results}, f, indent=1)
+    print(f"results: {output}", file=sys.stderr)
+    if baseline is None:
+        return 0
+    with open(baseline, encoding="utf-8") as f:
+        regressions = compare(results, json.load(f)["results"], threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}", file=sys.stderr)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {threshold:.0%} against {baseline}",
+              file=sys.stderr)
+        return 1
+    print(f"no regression over {threshold:.0%} against {baseline}", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for generate_cgg_report.py and its renderers.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_table = sub.add_parser("table", help="add_table scaling")
+    p_table.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    p_code = sub.add_parser("code", help="compact code block of a long listing")
+    p_code.add_argument("--lines", type=int, default=50_000)
+    p_template = sub.add_parser("template", help="per-report skeleton setup cost")
+    p_template.add_argument("--reports", type=int, default=50)
+    p_analytics = sub.add_parser("analytics", help="vectorized activity aggregation")
+    p_analytics.add_argument("--messages", type=int, default=10_000_000)
+    p_geo = sub.add_parser("geo", help="grid-index nearest-neighbour queries")
+    p_geo.add_argument("--profiles", type=int, default=100_000)
+    p_startup = sub.add_parser("startup", help="Markdown-only CLI run against a time target")
+    p_startup.add_argument("--runs", type=int, default=10)
+    p_startup.add_argument("--target-ms", type=float, default=STARTUP_TARGET_MS)
+    p_service = sub.add_parser("service", help="request bursts against the --serve mode")
+    p_service.add_argument("--requests", type=int, default=50)
+    p_service.add_argument("--records", type=int, default=1000)
+    p_suite = sub.add_parser("suite", help="end-to-end steps on synthetic exports, with a baseline")
+    p_suite.add_argument("--scales", type=int, nargs="+", default=SUITE_SCALES)
+    p_suite.add_argument("--steps", nargs="+", choices=SUITE_STEPS, default=SUITE_STEPS)
+    p_suite.add_argument("--output", default="bench_cgg_results.json")
+    p_suite.add_argument("--baseline", help="results JSON of an earlier run; exit 1 on regression")
+    p_suite.add_argument("--threshold", type=float, default=SUITE_THRESHOLD)
+    p_suite.add_argument("--data-dir", help="where the synthetic exports are cached")
+    p_step = sub.add_parser("_step")  # one suite measurement, run by run_suite()
+    p_step.add_argument("step", choices=SUITE_STEPS)
+    p_step.add_argument("scale", type=int)
+    p_step.add_argument("export")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "table":
+        bench_table(args.sizes)
+    elif args.cmd == "code":
+        bench_code(args.lines)
+    elif args.cmd == "template":
+        bench_template(args.reports)
+    elif args.cmd == "analytics":
+        bench_analytics(args.messages)
+    elif args.cmd == "geo":
+        bench_geo(args.profiles)
+    elif args.cmd == "startup":
+        return bench_startup(args.runs, args.target_ms)
+    elif args.cmd == "service":
+        bench_service(args.requests, args.records)
+    elif args.cmd == "suite":
+        return bench_suite(args.scales, args.steps, args.output, args.baseline, args.threshold,
+                           args.data_dir)
+    elif args.cmd == "_step":
+        print(json.dumps(run_step(args.step, args.scale, args.export)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
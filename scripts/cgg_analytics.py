@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+# Activity analytics for generate_cgg_report.py.
+#
+# Records streamed from an RTDB export (cgg_ingest.iter_records) are packed
+# into columnar NumPy arrays: numbers as float64 (NaN when absent), strings as
+# int32 category codes. Every aggregation is a vectorized group-by over those
+# codes (bincount, lexsort + searchsorted), never a Python loop over records.
+from array import array
+
+import numpy as np
+
+from cgg_i18n import Messages
+from cgg_ingest import RULES_PATH, iter_records
+
+DAY_MS = 86_400_000
+MINUTE_MS = 60_000
+TOP_N = 15
+MAX_DAILY_BARS = 60
+
+# Record pattern -> dataset. Duplicated indexes (leadsByClient,
+# bookingsByClient) are not read; the flat layouts documented in section 2.5
+# are, and ids that appear under several layouts are counted once.
+SOURCES = {
+    'messages/$threadId/$messageId': 'messages',
+    'leadsByArtist/$uid/$leadId': 'leads',
+    'leads/$leadId': 'leads',
+    'bookingsByArtist/$uid/$bookingId': 'bookings',
+    'bookings/$bookingId': 'bookings',
+    'appointmentsByArtist/$uid/$id': 'appointments',
+    'aftercareByArtist/$artistUid/$aftercareId': 'aftercare',
+    'aftercareByClient/$clientUid/$aftercareId': 'aftercare',
+    'publicProfiles/$uid': 'profiles',
+}
+
+# Known lead statuses first (live values, then the ones of the original
+# specification), anything else found in the export after them
+LEAD_STATUSES = ['new', 'pending', 'accepted', 'declined', 'rejected', 'completed', 'archived']
+
+LATENCY_BINS_DAYS = [0, 1, 3, 7, 14, 30, 60, 90, np.inf]
+
+
+# -- columnar storage ----------------------------------------------------------
+
+class Categories:
+    # String -> dense int code, shared by the columns that must agree on codes
+    __slots__ = ('codes', 'labels')
+
+    def __init__(self):
+        self.codes = {}
+        self.labels = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.labels)
+            self.labels.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.labels)
+
+
+class ColumnBuilder:
+    # Appends records field by field into typed buffers (array.array), so
+    # memory per record is 8 bytes per number and 4 per category.
+
+    def __init__(self, numeric=(), categorical=None):
+        self.numeric = {name: array('d') for name in numeric}
+        self.categorical = {name: (cats, array('i')) for name, cats in (categorical or {}).items()}
+
+    def add(self, numbers, strings):
+        for name, column in self.numeric.items():
+            v = numbers.get(name)
+            column.append(v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan)
+        for name, (cats, column) in self.categorical.items():
+            v = strings.get(name)
+            column.append(cats.code('' if v is None else str(v)))
+
+    def build(self):
+        columns = {name: np.frombuffer(col, dtype=np.float64) for name, col in self.numeric.items()}
+        columns.update({name: np.frombuffer(col, dtype=np.int32)
+                        for name, (_, col) in self.categorical.items()})
+        return columns
+
+
+def dedupe(columns, key):
+    # Keeps the first row of every id
+    if not len(columns[key]):
+        return columns
+    _, first = np.unique(columns[key], return_index=True)
+    first.sort()
+    return {name: col[first] for name, col in columns.items()}
+
+
+def group_stats(codes, values, n):
+    # Per group: count, sum, mean and median of the non-NaN values
+    ok = ~np.isnan(values)
+    codes, values = codes[ok], values[ok]
+    count = np.bincount(codes, minlength=n)
+    total = np.bincount(codes, weights=values, minlength=n)
+    mean = np.divide(total, count, out=np.full(n, np.nan), where=count > 0)
+    if len(values) and n * (values.max() - values.min() + 1) < 2 ** 50:
+        # One float sort on (group, value) packed into a single key; much
+        # faster than lexsort, and exact while the packed range fits 50 bits
+        order = np.argsort(codes * (values.max() - values.min() + 1) + (values - values.min()))
+    else:
+        order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    start = np.searchsorted(codes[order], np.arange(n))
+    lo = start + np.maximum(count - 1, 0) // 2
+    hi = start + count // 2
+    median = np.full(n, np.nan)
+    has = count > 0
+    median[has] = (sorted_values[lo[has]] + sorted_values[hi[has]]) / 2
+    return count, total, mean, median
+
+
+def _day_labels(first_day, count, step=1):
+    days = np.datetime64(int(first_day), 'D') + np.arange(count) * step
+    return [str(d) for d in days]
+
+
+# -- analysis ------------------------------------------------------------------
+
+class Activity:
+    # Aggregated results only (small lists and scalars)
+    __slots__ = ('source', 'messages', 'leads', 'bookings', 'aftercare')
+
+    def __init__(self, source):
+        self.source = str(source)
+        self.messages = None
+        self.leads = None
+        self.bookings = None
+        self.aftercare = None
+
+    def frequency_summary(self, msg=None):
+        msg = msg or Messages()
+        parts = []
+        if self.messages and self.messages['total']:
+            m = self.messages
+            parts.append(msg('requirements.measured.messages', total=m['total'], per_day=m['per_active_day'],
+                             peak=m['peak_count'], day=m['peak_day']))
+        if self.leads and self.leads['total']:
+            parts.append(msg('requirements.measured.leads', total=self.leads['total']))
+        if self.bookings and self.bookings['total']:
+            parts.append(msg('requirements.measured.bookings', total=self.bookings['total']))
+        return "; ".join(parts)
+
+
+def _analyze_messages(cols, threads: Categories):
+    n = len(cols['createdAt'])
+    if not n:
+        return None
+    counts = np.bincount(cols['thread'], minlength=len(threads))
+    top = np.argsort(-counts, kind='stable')[:TOP_N]
+    per_thread = counts[counts > 0]
+
+    ts = cols['createdAt'][~np.isnan(cols['createdAt'])]
+    result = {
+        'total': n,
+        'threads': int(len(per_thread)),
+        'per_thread': {
+            'mean': float(per_thread.mean()), 'median': float(np.median(per_thread)),
+            'p95': float(np.percentile(per_thread, 95)), 'max': int(per_thread.max()),
+        },
+        'top_threads': [(threads.labels[t], int(counts[t])) for t in top if counts[t]],
+        'daily_labels': [], 'daily_counts': [], 'period': 'day',
+        'per_active_day': 0.0, 'peak_day': '—', 'peak_count': 0,
+    }
+    if len(ts):
+        day = np.floor_divide(ts, DAY_MS).astype(np.int64)
+        first = day.min()
+        daily = np.bincount(day - first)
+        active = np.count_nonzero(daily)
+        peak = int(daily.argmax())
+        result.update(per_active_day=n / active if active else 0.0,
+                      peak_day=_day_labels(first + peak, 1)[0], peak_count=int(daily[peak]))
+        if len(daily) > MAX_DAILY_BARS:
+            weekly = np.bincount((day - first) // 7)
+            result.update(period='week', daily_counts=weekly.tolist(),
+                          daily_labels=_day_labels(first, len(weekly), 7))
+        else:
+            result.update(daily_counts=daily.tolist(), daily_labels=_day_labels(first, len(daily)))
+    return result
+
+
+def _analyze_leads(cols, statuses: Categories):
+    n = len(cols['status'])
+    if not n:
+        return None
+    counts = np.bincount(cols['status'], minlength=len(statuses))
+    order = sorted(range(len(statuses)), key=lambda c: (
+        LEAD_STATUSES.index(statuses.labels[c]) if statuses.labels[c] in LEAD_STATUSES
+        else len(LEAD_STATUSES), statuses.labels[c]))
+    return {
+        'total': n,
+        'statuses': [(statuses.labels[c] or '—', int(counts[c])) for c in order if counts[c]],
+    }
+
+
+def _analyze_bookings(bookings, appointments, artists: Categories, names):
+    n_art = len(artists)
+    if not n_art:
+        return None
+    per_artist = np.bincount(bookings['artist'], minlength=n_art)
+    duration = (appointments['endsAt'] - appointments['startsAt']) / MINUTE_MS
+    duration[duration < 0] = np.nan
+    count, total, mean, median = group_stats(appointments['artist'], duration, n_art)
+    rank = np.lexsort((-count, -per_artist))[:TOP_N]
+    rank = rank[(per_artist[rank] > 0) | (count[rank] > 0)]
+    valid = duration[~np.isnan(duration)]
+    return {
+        'total': int(per_artist.sum()),
+        'appointments': int(len(appointments['artist'])),
+        'artists': int(np.count_nonzero((per_artist > 0) | (count > 0))),
+        'median_duration': float(np.median(valid)) if len(valid) else None,
+        'rows': [
+            (names.get(artists.labels[a], artists.labels[a]), int(per_artist[a]), int(count[a]),
+             None if np.isnan(mean[a]) else float(mean[a]),
+             None if np.isnan(median[a]) else float(median[a]), float(total[a]) / 60)
+            for a in rank
+        ],
+    }
+
+
+def _analyze_aftercare(cols, statuses: Categories):
+    n = len(cols['createdAt'])
+    if not n:
+        return None
+    completed = cols['status'] == statuses.codes.get('completed', -1)
+    done_at = np.where(np.isnan(cols['completedAt']), cols['updatedAt'], cols['completedAt'])
+    latency = (done_at - cols['createdAt'])[completed] / DAY_MS
+    latency = latency[~np.isnan(latency) & (latency >= 0)]
+    histogram, _ = np.histogram(latency, bins=LATENCY_BINS_DAYS)
+    counts = np.bincount(cols['status'], minlength=len(statuses))
+    return {
+        'total': n,
+        'completed': int(completed.sum()),
+        'statuses': [(statuses.labels[c] or '—', int(counts[c])) for c in np.argsort(-counts) if counts[c]],
+        'latency': None if not len(latency) else {
+            'mean': float(latency.mean()), 'median': float(np.median(latency)),
+            'p90': float(np.percentile(latency, 90)), 'max': float(latency.max()),
+        },
+        'histogram': histogram.tolist(),
+    }
+
+
+class ActivityCollector:
+    # Packs the SOURCES records into columns as they stream by, from
+    # iter_records() or from the sink of cgg_ingest.scan_export()
+    patterns = SOURCES
+
+    def __init__(self):
+        self.threads, self.lead_statuses, self.artists, self.care_statuses, ids = (
+            Categories() for _ in range(5))
+        self.messages = ColumnBuilder(['createdAt'], {'thread': self.threads})
+        self.leads = ColumnBuilder([], {'status': self.lead_statuses, 'id': ids})
+        self.bookings = ColumnBuilder([], {'artist': self.artists, 'id': ids})
+        self.appointments = ColumnBuilder(['startsAt', 'endsAt'], {'artist': self.artists})
+        self.aftercare = ColumnBuilder(['createdAt', 'updatedAt', 'completedAt'],
+                                       {'status': self.care_statuses, 'id': ids})
+        self.names = {}
+
+    def add(self, pattern, keys, record):
+        dataset = SOURCES[pattern]
+        if dataset == 'messages':
+            self.messages.add(record, {'thread': keys[0]})
+        elif dataset == 'leads':
+            self.leads.add(record, {'status': record.get('status'), 'id': keys[-1]})
+        elif dataset == 'bookings':
+            owner = keys[0] if len(keys) > 1 else record.get('artistUid') or record.get('artistId')
+            self.bookings.add(record, {'artist': owner, 'id': keys[-1]})
+        elif dataset == 'appointments':
+            self.appointments.add(record, {'artist': keys[0]})
+        elif dataset == 'aftercare':
+            self.aftercare.add(record, {'status': record.get('status'), 'id': keys[-1]})
+        elif record.get('displayName'):
+            self.names[keys[0]] = str(record['displayName'])
+
+    def result(self, source):
+        # Vectorized aggregation of everything added
+        activity = Activity(source)
+        activity.messages = _analyze_messages(self.messages.build(), self.threads)
+        activity.leads = _analyze_leads(dedupe(self.leads.build(), 'id'), self.lead_statuses)
+        activity.bookings = _analyze_bookings(dedupe(self.bookings.build(), 'id'),
+                                              self.appointments.build(), self.artists, self.names)
+        activity.aftercare = _analyze_aftercare(dedupe(self.aftercare.build(), 'id'),
+                                                self.care_statuses)
+        return activity
+
+
+def analyze_export(path, rules_path=RULES_PATH):
+    # One streaming pass over the export, then vectorized aggregation
+    collector = ActivityCollector()
+    for pattern, keys, record in iter_records(path, SOURCES, rules_path):
+        collector.add(pattern, keys, record)
+    return collector.result(path)
+
+
+# -- report content ------------------------------------------------------------
+
+def _fmt(value, digits=1):
+    return "—" if value is None else f"{value:.{digits}f}"
+
+
+def _percent_rows(msg, items, total):
+    return [[label, count, msg.percent(count * 100 / total)] for label, count in items]
+
+
+def add_activity_content(report, activity: Activity, msg=None):
+    msg = msg or Messages()
+    report.heading(msg('activity.heading'), level=1)
+    report.paragraph(msg('activity.source', source=activity.source.rsplit('/', 1)[-1]))
+
+    report.heading(msg('activity.messages.heading'), level=2)
+    m = activity.messages
+    if m is None:
+        report.paragraph(msg('activity.messages.none'), italic=True)
+    else:
+        per = m['per_thread']
+        labels = msg['activity.messages.labels']
+        report.table(msg['activity.messages.headers'], list(zip(labels, [
+            m['total'],
+            m['threads'],
+            f"{per['mean']:.1f} / {per['median']:.0f}",
+            f"{per['p95']:.0f} / {per['max']}",
+            f"{m['per_active_day']:.1f}",
+            msg('activity.messages.peak', day=m['peak_day'], count=m['peak_count']),
+        ])))
+        if m['daily_counts']:
+            report.chart(msg('activity.messages.chart', period=msg(f"activity.period.{m['period']}")),
+                         m['daily_labels'], m['daily_counts'], unit=msg('activity.messages.unit'))
+        report.table(msg['activity.threads.headers'], m['top_threads'])
+
+    report.heading(msg('activity.leads.heading'), level=2)
+    leads = activity.leads
+    if leads is None:
+        report.paragraph(msg('activity.leads.none'), italic=True)
+    else:
+        report.table(msg['activity.leads.headers'], _percent_rows(msg, leads['statuses'], leads['total']))
+        report.chart(msg('activity.leads.chart'), [s for s, _ in leads['statuses']],
+                     [c for _, c in leads['statuses']], unit=msg('activity.leads.unit'))
+
+    report.heading(msg('activity.bookings.heading'), level=2)
+    b = activity.bookings
+    if b is None:
+        report.paragraph(msg('activity.bookings.none'), italic=True)
+    else:
+        report.paragraph(msg('activity.bookings.summary', total=b['total'], appointments=b['appointments'],
+                             artists=b['artists'], median=_fmt(b['median_duration'], 0)))
+        report.table(
+            msg['activity.bookings.headers'],
+            [[name, nb, na, _fmt(mean, 0), _fmt(med, 0), _fmt(hours)]
+             for name, nb, na, mean, med, hours in b['rows']],
+        )
+        report.chart(msg('activity.bookings.chart', top=TOP_N), [r[0] for r in b['rows']],
+                     [r[1] for r in b['rows']], unit=msg('activity.bookings.unit'))
+
+    report.heading(msg('activity.aftercare.heading'), level=2)
+    a = activity.aftercare
+    if a is None:
+        report.paragraph(msg('activity.aftercare.none'), italic=True)
+    else:
+        report.table(msg['activity.aftercare.headers'], _percent_rows(msg, a['statuses'], a['total']))
+        lat = a['latency']
+        if lat is None:
+            report.paragraph(msg('activity.aftercare.no_latency'), italic=True)
+        else:
+            report.paragraph(msg('activity.aftercare.latency', completed=a['completed'], **lat))
+            report.chart(msg('activity.aftercare.chart'), msg['activity.aftercare.latency_labels'],
+                         a['histogram'], unit=msg('activity.aftercare.unit'))
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+# Per-artist batch reports: one report per UID from an RTDB JSON export,
+# fanned out over a pool of warm worker processes. The export is streamed
+# once (cgg_ingest.iter_records) and only the records of the reports are
+# kept, grouped per artist.
+import json
+import os
+import re
+import traceback
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+
+from cgg_i18n import DEFAULT_LOCALE, Messages
+from cgg_ingest import RULES_PATH, iter_records
+from cgg_model import RENDERERS, Report, preload, render
+
+# Section -> candidate sources (record pattern, owner field for flat nodes;
+# None: the owner is the first wildcard key), the first one with records wins.
+# The per-artist indexes are the live layout (database.rules.json, lib/*.ts);
+# the flat nodes are the layout documented in section 2.5 of the report.
+PROFILE_SOURCE = 'publicProfiles/$uid'
+ARTIST_SOURCES = {
+    'profile': [(PROFILE_SOURCE, None)],
+    'leads': [('leadsByArtist/$uid/$leadId', None), ('leads/$leadId', 'artistId')],
+    'bookings': [('bookingsByArtist/$uid/$bookingId', None), ('bookings/$bookingId', 'artistId')],
+    'appointments': [('appointmentsByArtist/$uid/$id', None)],
+    'aftercare': [('aftercareByArtist/$artistUid/$aftercareId', None)],
+    'stencils': [('stencilsByUser/$uid/$id', None), ('stencils/$artistId/$stencilId', None)],
+}
+
+# Profile fields of the report, labelled by artist.field.<field> (cgg_i18n)
+PROFILE_FIELDS = ("displayName", "role", "city", "address", "styles", "rating", "latitude", "longitude",
+                  "isPublic", "subscriptionTier", "coverURL")
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _records(node):
+    # Records of a section, keyed by id
+    return list(node.values()) if isinstance(node, dict) else []
+
+
+def fmt_ts(ms, with_time=False):
+    if not isinstance(ms, (int, float)):
+        return "—"
+    dt = datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+    return dt.strftime('%Y-%m-%d %H:%M' if with_time else '%Y-%m-%d')
+
+
+def fmt_value(value, msg=None):
+    msg = msg or Messages()
+    if value is None or value == "":
+        return "—"
+    if isinstance(value, bool):
+        return msg('artist.yes') if value else msg('artist.no')
+    if isinstance(value, float):
+        return f"{value:.6f}".rstrip('0').rstrip('.').replace('.', msg['number.decimal'])
+    if isinstance(value, dict):
+        value = [k for k, v in value.items() if v] if all(isinstance(v, bool) for v in value.values()) \
+            else list(value.values())
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+
+class ArtistIndex:
+    # Records of the artist reports grouped by owner as they stream by, from
+    # iter_records() or from the sink of cgg_ingest.scan_export(). uids: the
+    # artists to keep; by default every artist profile and its records.
+    _owners = {pattern: field for sources in ARTIST_SOURCES.values() for pattern, field in sources}
+    patterns = tuple(_owners)
+
+    def __init__(self, uids=None):
+        self.wanted = set(uids) if uids else None
+        self.profiles = {}  # uid -> public profile
+        self.records = {}   # (uid, pattern) -> {record id: record}
+
+    def add(self, pattern, keys, record):
+        field = self._owners[pattern]
+        uid = keys[0] if field is None else record.get(field)
+        if not isinstance(uid, str) or (self.wanted is not None and uid not in self.wanted):
+            return
+        if pattern == PROFILE_SOURCE:
+            if self.wanted is not None or record.get('role', 'artist') == 'artist':
+                self.profiles[uid] = record
+        else:
+            self.records.setdefault((uid, pattern), {})[keys[-1]] = record
+
+    def uids(self):
+        # Artists with a public profile
+        return sorted(self.profiles)
+
+    def data(self, uid):
+        # -> {section: profile or {record id: record}}
+        data = {}
+        profile = self.profiles.get(uid)
+        if profile:
+            data['profile'] = profile
+        for section, sources in ARTIST_SOURCES.items():
+            for pattern, _ in sources:
+                value = self.records.get((uid, pattern))
+                if value:
+                    data[section] = value
+                    break
+        return data
+
+
+def load_artists(export_path, uids=None, rules_path=RULES_PATH):
+    # One streaming pass over the export -> ArtistIndex
+    index = ArtistIndex(uids)
+    for pattern, keys, record in iter_records(export_path, index.patterns, rules_path):
+        index.add(pattern, keys, record)
+    return index
+
+
+def _table_or_note(report, msg, headers, rows):
+    if rows:
+        report.table(msg[headers], rows)
+    else:
+        report.paragraph(msg('artist.none'), italic=True)
+
+
+def add_artist_content(report: Report, uid, data, msg=None):
+    # msg: the catalog of the report's locale, French by default
+    msg = msg or Messages()
+    value = partial(fmt_value, msg=msg)
+    profile = data.get('profile') or {}
+    name = profile.get('displayName') or uid
+    meta = {'uid': uid, 'city': value(profile.get('city')),
+            'date': datetime.now(timezone.utc).strftime('%Y-%m-%d')}
+    report.cover(
+        title=msg('artist.cover.title'),
+        subtitle=msg('artist.cover.subtitle', name=name),
+        meta=[line.format(**meta) for line in msg['artist.cover.meta']],
+        institution=msg('cover.institution'),
+    )
+
+    report.heading(msg('artist.profile.heading'), level=1)
+    _table_or_note(report, msg, 'artist.profile.headers', [
+        [msg(f'artist.field.{key}'), value(profile.get(key))] for key in PROFILE_FIELDS
+        if profile.get(key) not in (None, "")
+    ])
+
+    leads = sorted(_records(data.get('leads')), key=lambda r: r.get('createdAt') or 0)
+    report.heading(msg('artist.leads.heading'), level=1)
+    report.paragraph(msg('artist.leads.count', n=len(leads)))
+    if leads:
+        counts = Counter(str(r.get('status') or '—') for r in leads)
+        report.table(msg['artist.leads.status_headers'], sorted(counts.items()))
+    _table_or_note(report, msg, 'artist.leads.headers', [
+        [fmt_ts(r.get('createdAt')), value(r.get('clientName')), value(r.get('style')),
+         value(r.get('city')), value(r.get('status')),
+         f"{r['quotedPrice']} {r.get('currency') or ''}".strip() if r.get('quotedPrice') is not None else "—"]
+        for r in leads
+    ])
+
+    bookings = sorted(_records(data.get('bookings')), key=lambda r: r.get('requestedAt') or 0)
+    report.heading(msg('artist.bookings.heading'), level=1)
+    report.heading(msg('artist.bookings.requests.heading'), level=2)
+    _table_or_note(report, msg, 'artist.bookings.requests.headers', [
+        [fmt_ts(r.get('requestedAt')), value(r.get('clientUid')), value(r.get('scheduledFor')),
+         value(r.get('scheduledTime')), value(r.get('status')), value(r.get('paymentStatus'))]
+        for r in bookings
+    ])
+    appointments = sorted(_records(data.get('appointments')), key=lambda r: r.get('startsAt') or 0)
+    report.heading(msg('artist.bookings.calendar.heading'), level=2)
+    _table_or_note(report, msg, 'artist.bookings.calendar.headers', [
+        [value(r.get('title')), fmt_ts(r.get('startsAt'), True), fmt_ts(r.get('endsAt'), True),
+         round((r['endsAt'] - r['startsAt']) / 60000)
+         if isinstance(r.get('startsAt'), (int, float)) and isinstance(r.get('endsAt'), (int, float)) else "—"]
+        for r in appointments
+    ])
+
+    aftercare = sorted(_records(data.get('aftercare')), key=lambda r: r.get('createdAt') or 0)
+    report.heading(msg('artist.aftercare.heading'), level=1)
+    _table_or_note(report, msg, 'artist.aftercare.headers', [
+        [value(r.get('clientName')), fmt_ts(r.get('createdAt')), value(r.get('status'))]
+        for r in aftercare
+    ])
+
+    stencils = sorted(_records(data.get('stencils')), key=lambda r: r.get('createdAt') or r.get('uploadedAt') or 0)
+    report.heading(msg('artist.stencils.heading'), level=1)
+    _table_or_note(report, msg, 'artist.stencils.headers', [
+        [value(r.get('name') or r.get('title')), fmt_ts(r.get('createdAt') or r.get('uploadedAt'))]
+        for r in stencils
+    ])
+
+
+def build_artist_report(uid, data, locale=DEFAULT_LOCALE) -> Report:
+    msg = Messages(locale)
+    name = (data.get('profile') or {}).get('displayName') or uid
+    report = Report(title=msg('artist.title', name=name), locale=locale)
+    add_artist_content(report, uid, data, msg)
+    return report
+
+
+def safe_name(uid):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', uid)
+
+
+# -- worker side ------------------------------------------------------------
+
+_FORMATS = ()
+_OUT_DIR = None
+_LOCALE = DEFAULT_LOCALE
+
+
+def _init_worker(formats, out_dir, locale=DEFAULT_LOCALE):
+    # Runs once per worker: imports the renderers and builds their templates
+    global _FORMATS, _OUT_DIR, _LOCALE
+    _FORMATS = formats
+    _OUT_DIR = out_dir
+    _LOCALE = locale
+    for fmt in formats:
+        preload(fmt)
+
+
+def _render_artist(task):
+    uid, data = task
+    try:
+        if not data.get('profile'):
+            raise LookupError(f"publicProfiles/{uid} introuvable dans l'export")
+        report = build_artist_report(uid, data, _LOCALE)
+        paths = []
+        for fmt in _FORMATS:
+            path = os.path.join(_OUT_DIR, safe_name(uid) + RENDERERS[fmt][1])
+            paths.append(render(fmt, report, path))
+        return uid, paths, None
+    except Exception as exc:
+        return uid, [], f"{type(exc).__name__}: {exc}\n{traceback.format_exc(limit=3)}"
+
+
+def run_batch(export_path, uids=None, out_dir='.', formats=('docx', 'pdf'), workers=None,
+              chunk_size=16, locale=DEFAULT_LOCALE):
+    index = load_artists(export_path, uids)
+    uids = list(uids) if uids else index.uids()
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+    manifest = {
+        'export': str(export_path),
+        'formats': list(formats),
+        'locale': locale,
+        'requested': len(uids),
+        'generated': [],
+        'failed': [],
+    }
+    tasks = ((uid, index.data(uid)) for uid in uids)
+    if workers == 1:
+        _init_worker(tuple(formats), out_dir, locale)
+        results = map(_render_artist, tasks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(tuple(formats), out_dir, locale))
+        results = pool.map(_render_artist, tasks, chunksize=max(1, chunk_size))
+    try:
+        for uid, paths, error in results:
+            if error is None:
+                manifest['generated'].append({'uid': uid, 'outputs': paths})
+            else:
+                manifest['failed'].append({'uid': uid, 'error': error})
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
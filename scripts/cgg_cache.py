@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# On-disk cache shared by the renderers (DOCX templates and sections in
+# cgg_docx, figures in cgg_figures) under CGG_CACHE_DIR, ~/.cache/cgg_report
+# by default; an empty CGG_CACHE_DIR turns caching off.
+#
+# Entries are written atomically, since concurrent workers may race to create
+# the same one, and evicted least recently used first: read() refreshes an
+# entry's mtime. Eviction lists the directory under a lock shared by every
+# process, so concurrent workers never each evict against a stale view.
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+CACHE_DIR = os.environ.get('CGG_CACHE_DIR', str(Path.home() / '.cache' / 'cgg_report'))
+
+
+def entry(name):
+    # -> path of the entry `name`, or None when caching is off
+    return os.path.join(CACHE_DIR, name) if CACHE_DIR else None
+
+
+def read(path):
+    # -> the entry's bytes, or None when it is not cached
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass  # read-only cache
+    return data
+
+
+@contextmanager
+def atomic(path):
+    # Yields a temporary path to write the entry to; it replaces `path` once
+    # the block succeeds
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def write(path, data):
+    with atomic(path) as tmp:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+
+
+@contextmanager
+def locked(path):
+    # Exclusive advisory lock on `path` across processes (none on Windows)
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def evict(pattern, max_files=None, max_bytes=None):
+    # Oldest entries matching `pattern` go first: down to max_files, and
+    # down to 3/4 of max_bytes once their total passes it, so the next
+    # eviction is many stores away
+    with locked(os.path.join(CACHE_DIR, 'cache.lock')):
+        entries = []
+        for path in Path(CACHE_DIR).glob(pattern):
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                pass
+        entries.sort(key=lambda e: -e[1].st_mtime)
+        stale = entries[max_files:] if max_files is not None else []
+        entries = entries[:len(entries) - len(stale)]
+        if max_bytes is not None and sum(st.st_size for _, st in entries) > max_bytes:
+            total = 0
+            for i, (_, st) in enumerate(entries):
+                if total + st.st_size > max_bytes * 3 // 4:
+                    stale.append(entries[i])
+                else:
+                    total += st.st_size
+        for path, _ in stale:
+            path.unlink(missing_ok=True)
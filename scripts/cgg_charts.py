@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# Column charts for generate_cgg_report.py.
+#
+# A Chart node is laid out once into primitives measured in points from the
+# top-left corner; cgg_pdf draws them as vector operators, cgg_html as SVG and
+# cgg_docx rasterizes them with Pillow (imported only when a PNG is needed).
+import math
+import os
+from functools import lru_cache
+from io import BytesIO
+
+WIDTH = 468.0    # 6.5 in: the text width of a Letter page with 1 in margins
+HEIGHT = 216.0
+FONT_SIZE = 8
+TITLE_SIZE = 10
+MAX_LABEL_CHARS = 14
+PNG_DPI = 200
+
+BAR = (0x1F, 0x4E, 0x79)
+GRID = (0xD0, 0xD0, 0xD0)
+TEXT = (0, 0, 0)
+
+
+def fmt_number(value):
+    if isinstance(value, float) and not value.is_integer():
+        return f"{value:,.1f}".replace(',', ' ')
+    return f"{int(value):,}".replace(',', ' ')
+
+
+def _label(text):
+    text = str(text)
+    return text if len(text) <= MAX_LABEL_CHARS else text[:MAX_LABEL_CHARS - 1] + '…'
+
+
+def _approx_width(text, size):
+    # Layout only needs an estimate; each backend measures with its own font
+    return len(text) * size * 0.55
+
+
+def _nice_step(span, ticks=4):
+    raw = span / ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for m in (1, 2, 2.5, 5, 10):
+        if raw <= m * magnitude:
+            return m * magnitude
+    return 10 * magnitude
+
+
+def layout(chart, width=WIDTH, height=HEIGHT):
+    # -> [('rect', x, y, w, h, color) | ('line', x1, y1, x2, y2, color)
+    #     | ('text', x, baseline, text, size, anchor, color)]; anchor is
+    # 'start', 'middle' or 'end' as in SVG.
+    values = [float(v) for v in chart.values]
+    labels = [_label(l) for l in chart.labels]
+    x0, x1 = 44.0, width - 8.0
+    y0, y1 = TITLE_SIZE * 2.2, height - FONT_SIZE * 3.0
+    ops = [('text', width / 2, TITLE_SIZE * 1.2, chart.title, TITLE_SIZE, 'middle', TEXT)]
+
+    vmax = max(values, default=0.0)
+    step = _nice_step(vmax) if vmax > 0 else 1.0
+    top = step * max(1, math.ceil(vmax / step))
+
+    def y_of(v):
+        return y1 - (y1 - y0) * v / top
+
+    tick = 0.0
+    while tick <= top + step / 2:
+        y = y_of(tick)
+        ops.append(('line', x0, y, x1, y, GRID))
+        ops.append(('text', x0 - 4, y + FONT_SIZE / 3, fmt_number(tick), FONT_SIZE, 'end', TEXT))
+        tick += step
+    if chart.unit:
+        ops.append(('text', 2.0, y0 - FONT_SIZE * 0.8, chart.unit, FONT_SIZE, 'start', TEXT))
+
+    n = len(values)
+    if n:
+        slot = (x1 - x0) / n
+        bar = slot * 0.7
+        widest = max(_approx_width(l, FONT_SIZE) for l in labels) + 4
+        every = max(1, math.ceil(widest / slot))
+        show_values = n <= 24 and slot >= _approx_width(fmt_number(vmax), FONT_SIZE)
+        for i, (label, v) in enumerate(zip(labels, values)):
+            cx = x0 + slot * (i + 0.5)
+            y = y_of(max(v, 0.0))
+            if y1 - y > 0:
+                ops.append(('rect', cx - bar / 2, y, bar, y1 - y, BAR))
+            if show_values:
+                ops.append(('text', cx, y - 2, fmt_number(v), FONT_SIZE, 'middle', TEXT))
+            if i % every == 0:
+                ops.append(('text', cx, y1 + FONT_SIZE * 1.4, label, FONT_SIZE, 'middle', TEXT))
+    ops.append(('line', x0, y1, x1, y1, TEXT))
+    return ops
+
+
+# -- raster output -----------------------------------------------------------
+
+def font_path():
+    # Pillow's built-in font has no accented glyphs; reportlab (already needed
+    # by cgg_pdf) ships Bitstream Vera, located without importing reportlab
+    import importlib.util
+
+    spec = importlib.util.find_spec('reportlab')
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    path = os.path.join(spec.submodule_search_locations[0], 'fonts', 'Vera.ttf')
+    return path if os.path.exists(path) else None
+
+
+@lru_cache(maxsize=None)
+def font(size):
+    # Pillow font of `size` pixels for the rasterized charts, figures and maps
+    from PIL import ImageFont
+
+    path = font_path()
+    return ImageFont.truetype(path, size) if path else ImageFont.load_default(size=size)
+
+
+_ANCHORS = {'start': 'ls', 'middle': 'ms', 'end': 'rs'}
+
+
+def png(chart, width=WIDTH, height=HEIGHT, dpi=PNG_DPI):
+    from PIL import Image, ImageDraw
+
+    scale = dpi / 72.0
+    image = Image.new('RGB', (round(width * scale), round(height * scale)), 'white')
+    draw = ImageDraw.Draw(image)
+    for op in layout(chart, width, height):
+        if op[0] == 'rect':
+            _, x, y, w, h, color = op
+            draw.rectangle([x * scale, y * scale, (x + w) * scale, (y + h) * scale], fill=color)
+        elif op[0] == 'line':
+            _, xa, ya, xb, yb, color = op
+            draw.line([xa * scale, ya * scale, xb * scale, yb * scale], fill=color,
+                      width=max(1, round(scale * 0.5)))
+        else:
+            _, x, y, text, size, anchor, color = op
+            draw.text((x * scale, y * scale), text, fill=color, font=font(round(size * scale)),
+                      anchor=_ANCHORS[anchor])
+    out = BytesIO()
+    image.save(out, 'PNG')
+    return out.getvalue()
@@ -0,0 +1,768 @@
+# -*- coding: utf-8 -*-
+# DOCX renderer for generate_cgg_report.py (python-docx).
+import copy
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from io import BufferedWriter, BytesIO
+from itertools import islice
+from xml.sax.saxutils import escape
+from zipfile import ZIP_DEFLATED, ZIP_STORED, BadZipFile, ZipFile, ZipInfo
+
+import docx
+from docx import Document
+from docx.enum.section import WD_ORIENT
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.opc.oxml import CT_Relationships, serialize_part_xml
+from docx.opc.packuri import PACKAGE_URI
+from docx.opc.part import XmlPart
+from docx.opc.pkgwriter import _ContentTypesItem
+from docx.oxml.parser import element_class_lookup
+from docx.shared import Pt, RGBColor
+from lxml import etree
+
+import cgg_cache
+import cgg_charts
+import cgg_highlight
+import cgg_profile
+from cgg_paginate import anchor_id
+from cgg_model import (
+    Bullet, Chart, CodeBlock, Cover, Definition, Heading, Image, PageBreak, Paragraph, Table, Toc,
+    iter_rows,
+)
+
+BLUE = RGBColor(0x1F, 0x4E, 0x79)  # CGG-like blue for headings
+
+# Everything set_styles() applies; part of the template cache key.
+STYLE = {
+    'font': 'Times New Roman',
+    'size': 12,
+    'heading_sizes': {1: 16, 2: 14, 3: 12, 4: 12},
+    'heading_color': str(BLUE),
+}
+
+# Styled skeletons (styles, footer, plus the report's static cover/TOC) are
+# built once, stored as package bytes in cgg_cache and cloned for every
+# report. Bump TEMPLATE_VERSION whenever the skeleton-building code changes.
+TEMPLATE_VERSION = 2
+TEMPLATE_CACHE_MAX_FILES = 32
+TEMPLATE_MEMORY_SLOTS = 8
+_templates = OrderedDict()  # key -> parsed template Document (in-process LRU)
+
+
+def set_styles(doc: Document):
+    style = doc.styles['Normal']
+    style.font.name = STYLE['font']
+    style.font.size = Pt(STYLE['size'])
+
+    for level, size in STYLE['heading_sizes'].items():
+        try:
+            s = doc.styles[f'Heading {level}']
+        except KeyError:
+            continue
+        s.font.name = STYLE['font']
+        s.font.size = Pt(size)
+        s.font.color.rgb = BLUE
+
+
+def add_field_run(paragraph, instr_text: str):
+    # Creates a complex field like PAGE or NUMPAGES
+    run = paragraph.add_run()
+    r_element = run._r
+    fldChar1 = OxmlElement('w:fldChar')
+    fldChar1.set(qn('w:fldCharType'), 'begin')
+
+    instrText = OxmlElement('w:instrText')
+    instrText.set(qn('xml:space'), 'preserve')
+    instrText.text = instr_text
+
+    fldChar2 = OxmlElement('w:fldChar')
+    fldChar2.set(qn('w:fldCharType'), 'separate')
+
+    fldChar3 = OxmlElement('w:fldChar')
+    fldChar3.set(qn('w:fldCharType'), 'end')
+
+    r_element.append(fldChar1)
+    r_element.append(instrText)
+    r_element.append(fldChar2)
+    r_element.append(fldChar3)
+    return run
+
+
+def add_footer_page_numbers(doc: Document):
+    section = doc.sections[0]
+    section.different_first_page_header_footer = True
+    footer = section.footer
+    p = footer.paragraphs[0] if footer.paragraphs else footer.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    p.add_run("Page ")
+    add_field_run(p, 'PAGE')
+    p.add_run(" / ")
+    add_field_run(p, 'NUMPAGES')
+
+
+def add_cover_page(doc: Document, cover: Cover):
+    section = doc.sections[0]
+    section.orientation = WD_ORIENT.PORTRAIT
+    # Centered title block
+    spacer = doc.add_paragraph("\n\n\n\n")
+    spacer.paragraph_format.space_after = Pt(0)
+
+    title = doc.add_paragraph()
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    r = title.add_run(f"{cover.title}\n\n")
+    r.bold = True
+    r.font.size = Pt(24)
+    r.font.color.rgb = BLUE
+
+    app = doc.add_paragraph()
+    app.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    app.add_run(f"{cover.subtitle}\n\n").font.size = Pt(16)
+
+    meta = doc.add_paragraph()
+    meta.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for i, line in enumerate(cover.meta):
+        end = "\n\n" if i == len(cover.meta) - 1 else "\n"
+        meta.add_run(f"{line}{end}").font.size = Pt(12)
+
+    college = doc.add_paragraph()
+    college.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    rr = college.add_run(cover.institution)
+    rr.font.size = Pt(12)
+    rr.bold = True
+
+    # Page break to start content
+    doc.add_page_break()
+
+
+def add_bookmark(paragraph, anchor):
+    # Bookmark around the paragraph's content: target of the TOC hyperlinks
+    if not anchor:
+        return
+    p = paragraph._p
+    start = OxmlElement('w:bookmarkStart')
+    start.set(qn('w:id'), str(anchor_id(anchor)))
+    start.set(qn('w:name'), anchor)
+    end = OxmlElement('w:bookmarkEnd')
+    end.set(qn('w:id'), str(anchor_id(anchor)))
+    p.insert(1 if p.pPr is not None else 0, start)
+    p.append(end)
+
+
+def _add_heading(doc: Document, node: Heading):
+    add_bookmark(doc.add_heading(node.text, level=node.level), node.anchor)
+
+
+TOC_INDENT_TWIPS = 360
+
+
+def _toc_field(doc: Document, toc: Toc):
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    r = p.add_run(toc.hint)
+    r.italic = True
+    # Insert a TOC field (Word must update to render)
+    p = doc.add_paragraph()
+    fld = OxmlElement('w:fldSimple')
+    fld.set(qn('w:instr'), 'TOC \\o "1-3" \\h \\z \\u')
+    r = OxmlElement('w:r')
+    r.append(OxmlElement('w:t'))
+    fld.append(r)
+    p._p.append(fld)
+
+
+def add_toc(doc: Document, toc: Toc):
+    # Static entries linked to the bookmarks, with the page numbers estimated
+    # by cgg_paginate. A table of contents that was not paginated stays a
+    # TOC field that Word fills in; lists of figures and tables have no field
+    # to fall back on and are written without page numbers.
+    pages = toc.pages.get('docx')
+    if toc.entries is None or (pages is None and toc.kind == 'contents'):
+        _toc_field(doc, toc)
+        return
+    section = doc.sections[-1]
+    tab = int((section.page_width - section.left_margin - section.right_margin) / 635)
+    for i, (level, text, anchor) in enumerate(toc.entries):
+        page = pages[i] if pages and pages[i] is not None else None
+        number = f'<w:r><w:tab/></w:r><w:r><w:t>{page}</w:t></w:r>' if page is not None else ''
+        _append_block(doc, parse_xml(
+            f'<w:p {nsdecls("w")}><w:pPr>'
+            f'<w:tabs><w:tab w:val="right" w:leader="dot" w:pos="{tab}"/></w:tabs>'
+            f'<w:spacing w:after="0"/><w:ind w:left="{TOC_INDENT_TWIPS * (max(level, 1) - 1)}"/>'
+            f'</w:pPr><w:hyperlink w:anchor="{anchor}" w:history="1">'
+            f'<w:r>{_t_xml(escape(_XML_INVALID.sub("", text)))}</w:r>{number}</w:hyperlink></w:p>'
+        ))
+
+
+def set_language(doc: Document, locale):
+    # Proofing language of the text (the template's default is en-US)
+    doc.core_properties.language = locale
+    path = '/'.join(qn(tag) for tag in ('w:docDefaults', 'w:rPrDefault', 'w:rPr', 'w:lang'))
+    for lang in doc.styles.element.iterfind(path):
+        lang.set(qn('w:val'), locale)
+
+
+def set_page_count(doc: Document, pages):
+    # Cached result of the footer's NUMPAGES field, for viewers that show
+    # fields without laying the document out (Word recomputes it)
+    for instr in doc.sections[0].footer._element.iter(qn('w:instrText')):
+        if instr.text.strip() == 'NUMPAGES':
+            t = OxmlElement('w:t')
+            t.text = str(pages)
+            instr.getnext().addnext(t)  # after the 'separate' fldChar
+
+
+# Table engine: rows are serialized straight to w:tbl XML in batches instead of
+# going through python-docx's cell proxies, so cost stays linear in row count.
+TABLE_STYLE_ID = 'CGGTable'
+TABLE_BATCH_ROWS = 2000
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+# xml:space is only emitted when whitespace would otherwise be lost (as
+# python-docx does): lxml re-resolves the xml: namespace for every such
+# attribute when the tree is grafted into the document, which is quadratic.
+_NEEDS_PRESERVE = re.compile(r'^\s|\s$|\s\s')
+
+
+def ensure_table_style(doc: Document):
+    # Header formatting lives in one table style (firstRow conditional format)
+    styles = doc.styles.element
+    if styles.get_by_id(TABLE_STYLE_ID) is not None:
+        return TABLE_STYLE_ID
+    based_on = '<w:basedOn w:val="TableGrid"/>' if styles.get_by_id('TableGrid') is not None else ''
+    styles.append(parse_xml(
+        f'<w:style {nsdecls("w")} w:type="table" w:customStyle="1" w:styleId="{TABLE_STYLE_ID}">'
+        '<w:name w:val="CGG Table"/>'
+        f'{based_on}'
+        '<w:uiPriority w:val="59"/>'
+        '<w:pPr><w:spacing w:after="0" w:line="240" w:lineRule="auto"/></w:pPr>'
+        '<w:tblPr><w:tblBorders>'
+        '<w:top w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+        '<w:left w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+        '<w:bottom w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+        '<w:right w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+        '<w:insideH w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+        '<w:insideV w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+        '</w:tblBorders></w:tblPr>'
+        '<w:tblStylePr w:type="firstRow">'
+        '<w:rPr><w:b/><w:color w:val="FFFFFF"/></w:rPr>'
+        f'<w:tcPr><w:shd w:val="clear" w:color="auto" w:fill="{BLUE}"/></w:tcPr>'
+        '</w:tblStylePr>'
+        '</w:style>'
+    ))
+    return TABLE_STYLE_ID
+
+
+def _t_xml(text: str) -> str:
+    if _NEEDS_PRESERVE.search(text):
+        return f'<w:t xml:space="preserve">{text}</w:t>'
+    return f'<w:t>{text}</w:t>'
+
+
+def _cell_xml(value) -> str:
+    text = escape(_XML_INVALID.sub('', str(value)))
+    if '\n' in text:
+        text = '<w:br/>'.join(_t_xml(part) for part in text.split('\n'))
+    else:
+        text = _t_xml(text)
+    return f'<w:tc><w:p><w:r>{text}</w:r></w:p></w:tc>'
+
+
+def _row_xml(row, ncols, header=False) -> str:
+    cells = [_cell_xml(v) for v in row]
+    if len(cells) > ncols:
+        raise ValueError(f"Row has {len(cells)} cells, table has {ncols} columns: {row!r}")
+    cells.extend([_cell_xml('')] * (ncols - len(cells)))
+    tr_pr = '<w:trPr><w:tblHeader/></w:trPr>' if header else ''
+    return f'<w:tr>{tr_pr}{"".join(cells)}</w:tr>'
+
+
+def _grid_widths_twips(doc: Document, ncols, col_widths_pt):
+    if col_widths_pt:
+        if len(col_widths_pt) != ncols:
+            raise ValueError(f"Expected {ncols} column widths, got {len(col_widths_pt)}")
+        return [int(round(w * 20)) for w in col_widths_pt]
+    section = doc.sections[-1]
+    block = section.page_width - section.left_margin - section.right_margin
+    return [int(block / 635 / ncols)] * ncols
+
+
+def add_table(doc: Document, headers, rows, col_widths_pt=None, caption='', anchor=None):
+    ncols = len(headers)
+    if caption:
+        p = doc.add_paragraph()
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        p.paragraph_format.keep_with_next = True
+        r = p.add_run(caption)
+        r.italic = True
+        r.font.size = Pt(10)
+        add_bookmark(p, anchor)
+    widths = _grid_widths_twips(doc, ncols, col_widths_pt)
+    if col_widths_pt:
+        tbl_w = f'<w:tblW w:w="{sum(widths)}" w:type="dxa"/><w:tblLayout w:type="fixed"/>'
+    else:
+        tbl_w = '<w:tblW w:w="0" w:type="auto"/>'
+    grid = ''.join(f'<w:gridCol w:w="{w}"/>' for w in widths)
+    # Feed the XML to the (python-docx aware) parser batch by batch: one parse,
+    # one tree, and the source text never has to be held in memory at once.
+    parser = etree.XMLParser(remove_blank_text=True, resolve_entities=False)
+    parser.set_element_class_lookup(element_class_lookup)
+    parser.feed(
+        f'<w:tbl {nsdecls("w")}>'
+        f'<w:tblPr><w:tblStyle w:val="{ensure_table_style(doc)}"/>{tbl_w}'
+        '<w:tblLook w:val="04A0" w:firstRow="1" w:lastRow="0" w:firstColumn="0" '
+        'w:lastColumn="0" w:noHBand="0" w:noVBand="1"/></w:tblPr>'
+        f'<w:tblGrid>{grid}</w:tblGrid>'
+        f'{_row_xml(headers, ncols, header=True)}'
+    )
+    it = iter_rows(headers, rows)
+    while True:
+        batch = list(islice(it, TABLE_BATCH_ROWS))
+        if not batch:
+            break
+        parser.feed(''.join(_row_xml(r, ncols) for r in batch))
+    parser.feed('</w:tbl>')
+    tbl = parser.close()
+    _append_block(doc, tbl)
+    doc.add_paragraph("\n")
+    return tbl
+
+
+def _append_block(doc: Document, element):
+    body = doc.element.body
+    sect_pr = body.sectPr
+    if sect_pr is not None:
+        sect_pr.addprevious(element)
+    else:
+        body.append(element)
+
+
+# Code blocks: one paragraph per block, lines separated by w:br, and runs
+# that only reference character styles defined once in styles.xml. Indented
+# lines need xml:space, and grafting a subtree costs quadratic time in its
+# xml:space attributes, so the block is parsed on its own and its runs (at
+# most CODE_RUN_LINES lines each) are moved into the document one by one.
+CODE_STYLE_ID = 'CGGCode'
+CODE_FONT = 'Courier New'
+CODE_SIZE_HALF_POINTS = 18
+CODE_RUN_LINES = 200
+
+
+def _code_style_id(kind):
+    return CODE_STYLE_ID if kind is None else CODE_STYLE_ID + kind.capitalize()
+
+
+def ensure_code_styles(doc: Document):
+    styles = doc.styles.element
+    if styles.get_by_id(CODE_STYLE_ID) is not None:
+        return CODE_STYLE_ID
+    styles.append(parse_xml(
+        f'<w:style {nsdecls("w")} w:type="character" w:customStyle="1" w:styleId="{CODE_STYLE_ID}">'
+        '<w:name w:val="CGG Code"/>'
+        f'<w:rPr><w:rFonts w:ascii="{CODE_FONT}" w:hAnsi="{CODE_FONT}" w:cs="{CODE_FONT}"/>'
+        f'<w:noProof/><w:sz w:val="{CODE_SIZE_HALF_POINTS}"/></w:rPr>'
+        '</w:style>'
+    ))
+    for kind, color in cgg_highlight.COLORS.items():
+        italic = '<w:i/>' if kind == 'comment' else ''
+        styles.append(parse_xml(
+            f'<w:style {nsdecls("w")} w:type="character" w:customStyle="1" '
+            f'w:styleId="{_code_style_id(kind)}">'
+            f'<w:name w:val="CGG Code {kind.capitalize()}"/><w:basedOn w:val="{CODE_STYLE_ID}"/>'
+            f'<w:rPr>{italic}<w:color w:val="{color}"/></w:rPr>'
+            '</w:style>'
+        ))
+    return CODE_STYLE_ID
+
+
+def _code_run(kind):
+    return f'<w:r><w:rPr><w:rStyle w:val="{_code_style_id(kind)}"/></w:rPr><w:t xml:space="preserve">'
+
+
+# Token markup for cgg_highlight: each token starts a run in its style, which
+# also takes the punctuation and whitespace up to the next token (half the
+# runs of closing it after the token)
+_CODE_MARKUP = {kind: f'</w:t></w:r>{_code_run(kind)}%s' for kind in cgg_highlight.COLORS}
+_CODE_EMPTY = re.compile(r'<w:t xml:space="preserve"></w:t>|<w:r><w:rPr><w:rStyle w:val="\w+"/></w:rPr></w:r>')
+
+
+def _code_xml(text, language=None):
+    text = _XML_INVALID.sub('', text.expandtabs(4).rstrip('\n'))
+    marked = cgg_highlight.highlight(text, language, _CODE_MARKUP) if language else None
+    if marked is None:
+        # One plain run per CODE_RUN_LINES lines; each later run starts with a break
+        lines = escape(text).split('\n')
+        marked = ''.join(
+            ('\n' if i else '') + '\n'.join(lines[i:i + CODE_RUN_LINES]) + '</w:t></w:r>' + _code_run(None)
+            for i in range(0, len(lines), CODE_RUN_LINES)
+        )
+    xml = _code_run(None) + marked.replace('\n', '</w:t><w:br/><w:t xml:space="preserve">') + '</w:t></w:r>'
+    # Drop the empty texts and runs left around tokens and breaks
+    return _CODE_EMPTY.sub('', _CODE_EMPTY.sub('', xml))
+
+
+def add_code_block(doc: Document, text: str, language=None):
+    ensure_code_styles(doc)
+    parser = etree.XMLParser(resolve_entities=False)
+    parser.set_element_class_lookup(element_class_lookup)
+    parser.feed(f'<w:p {nsdecls("w")}>')
+    parser.feed(_code_xml(text, language))
+    parser.feed('</w:p>')
+    parsed = parser.close()
+
+    p = parse_xml(f'<w:p {nsdecls("w")}><w:pPr><w:spacing w:after="120" w:line="240" '
+                  'w:lineRule="auto"/></w:pPr></w:p>')
+    _append_block(doc, p)
+    p.extend(list(parsed))
+    return p
+
+
+def _add_paragraph(doc: Document, node: Paragraph):
+    p = doc.add_paragraph()
+    if node.align != 'left':
+        p.alignment = {'center': WD_ALIGN_PARAGRAPH.CENTER, 'right': WD_ALIGN_PARAGRAPH.RIGHT}[node.align]
+    r = p.add_run(node.text)
+    if node.bold:
+        r.bold = True
+    if node.italic:
+        r.italic = True
+
+
+def _add_bullet(doc: Document, node: Bullet):
+    p = doc.add_paragraph()
+    if node.marker == '•':
+        p.add_run("• ").bold = True
+        p.add_run(node.text)
+    else:
+        p.add_run(f"{node.marker} {node.text}")
+
+
+def _add_chart(doc: Document, node: Chart):
+    doc.add_picture(BytesIO(cgg_charts.png(node)), width=Pt(cgg_charts.WIDTH))
+    doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+
+def _add_image(doc: Document, node: Image):
+    doc.add_picture(BytesIO(node.data), width=Pt(node.width_pt or cgg_charts.WIDTH))
+    doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
+    add_bookmark(doc.paragraphs[-1], node.anchor)
+    if node.caption:
+        p = doc.add_paragraph()
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        r = p.add_run(node.caption)
+        r.italic = True
+        r.font.size = Pt(10)
+
+
+RENDERERS = {
+    Cover: add_cover_page,
+    Toc: add_toc,
+    Heading: _add_heading,
+    Paragraph: _add_paragraph,
+    Bullet: _add_bullet,
+    Definition: lambda doc, n: doc.add_paragraph(f"• {n.term} : {n.text}"),
+    Table: lambda doc, n: add_table(doc, n.headers, n.rows, n.col_widths_pt, n.caption, n.anchor),
+    CodeBlock: lambda doc, n: add_code_block(doc, n.text, n.language),
+    Chart: _add_chart,
+    Image: _add_image,
+    PageBreak: lambda doc, n: doc.add_page_break(),
+}
+
+
+def template_key(skeleton) -> str:
+    payload = json.dumps({
+        'version': TEMPLATE_VERSION,
+        'python-docx': docx.__version__,
+        'style': STYLE,
+        'skeleton': [repr(node) for node in skeleton],
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def _build_template(skeleton) -> bytes:
+    doc = Document()
+    set_styles(doc)
+    ensure_table_style(doc)
+    add_footer_page_numbers(doc)
+    for node in skeleton:
+        RENDERERS[type(node)](doc, node)
+    buf = BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def template_bytes(skeleton=()) -> bytes:
+    path = cgg_cache.entry(f'template-{template_key(skeleton)}.docx')
+    data = cgg_cache.read(path) if path else None
+    if data is not None:
+        return data
+    data = _build_template(skeleton)
+    if path:
+        try:
+            cgg_cache.write(path, data)
+            cgg_cache.evict('template-*.docx', max_files=TEMPLATE_CACHE_MAX_FILES)
+        except OSError:
+            pass  # a read-only cache only costs the rebuild
+    return data
+
+
+def open_template(skeleton=()) -> Document:
+    # Clone of the parsed template: an lxml deep copy skips unzipping and
+    # re-parsing every part, which is most of the cost of Document(bytes).
+    key = template_key(skeleton)
+    doc = _templates.get(key)
+    if doc is None:
+        doc = Document(BytesIO(template_bytes(skeleton)))
+        _templates[key] = doc
+        if len(_templates) > TEMPLATE_MEMORY_SLOTS:
+            _templates.popitem(last=False)
+    else:
+        _templates.move_to_end(key)
+    return copy.deepcopy(doc)
+
+
+def preload():
+    open_template()
+
+
+# Section cache: the body XML of every top-level section (a level-1 heading
+# and the nodes up to the next one) is stored on disk with the pictures it
+# references, keyed by a hash of the template and of the section's nodes.
+# A rebuild renders the sections whose nodes changed and splices the stored
+# fragments in for the others. Only reports that opt in (Report.cache_sections)
+# use it, so one-off reports do not push the others out. Bump
+# SECTION_CACHE_VERSION whenever a renderer changes the XML it produces.
+SECTION_CACHE_VERSION = 3
+SECTION_CACHE_MAX_BYTES = 512 * 2**20
+_A_BLIP = qn('a:blip')
+_R_EMBED = qn('r:embed')
+_WP_DOCPR = qn('wp:docPr')
+
+
+def _sections(nodes):
+    # -> [[nodes]], split before every level-1 heading
+    sections = []
+    for node in nodes:
+        if not sections or (type(node) is Heading and node.level == 1):
+            sections.append([])
+        sections[-1].append(node)
+    return sections
+
+
+def _update_node(h, node):
+    h.update(type(node).__name__.encode())
+    for name in node.__slots__:
+        value = getattr(node, name)
+        h.update(b'\0')
+        if isinstance(value, bytes):
+            h.update(value)
+        elif type(node) is Table and name == 'rows':
+            # repr() of a columnar batch may elide values
+            for row in iter_rows(node.headers, value):
+                h.update(repr(tuple(row)).encode('utf-8'))
+        else:
+            h.update(repr(value).encode('utf-8'))
+
+
+def section_key(template, nodes) -> str:
+    h = hashlib.sha256(f'{SECTION_CACHE_VERSION}:{template}'.encode())
+    for node in nodes:
+        _update_node(h, node)
+    return h.hexdigest()[:32]
+
+
+def _section_path(key):
+    return cgg_cache.entry(f'section-{key}.zip')
+
+
+def _store_section(path, doc, elements):
+    # fragment.xml holds the body elements, media/<rId> the pictures they embed
+    with cgg_cache.atomic(path) as tmp, ZipFile(tmp, 'w', ZIP_STORED) as z:
+        z.writestr('fragment.xml', b''.join(etree.tostring(el, encoding='utf-8') for el in elements))
+        for el in elements:
+            for blip in el.iter(_A_BLIP):
+                rId = blip.get(_R_EMBED)
+                if f'media/{rId}' not in z.namelist():
+                    z.writestr(f'media/{rId}', doc.part.related_parts[rId].blob)
+    cgg_cache.evict('section-*.zip', max_bytes=SECTION_CACHE_MAX_BYTES)
+
+
+def _splice_section(doc, path):
+    # -> False when the fragment is not cached
+    data = cgg_cache.read(path)
+    if data is None:
+        return False
+    try:
+        with ZipFile(BytesIO(data)) as z:
+            fragment = z.read('fragment.xml')
+            media = {name[len('media/'):]: z.read(name) for name in z.namelist() if name.startswith('media/')}
+    except (OSError, KeyError, BadZipFile):
+        return False
+    parser = etree.XMLParser(resolve_entities=False, huge_tree=True)
+    parser.set_element_class_lookup(element_class_lookup)
+    parser.feed(f'<w:body {nsdecls("w")}>')
+    parser.feed(fragment)
+    parser.feed('</w:body>')
+    elements = list(parser.close())
+    rIds = {old: doc.part.get_or_add_image(BytesIO(blob))[0] for old, blob in media.items()}
+    next_id = doc.part.next_id if rIds else None
+    for el in elements:
+        for blip in el.iter(_A_BLIP):
+            blip.set(_R_EMBED, rIds[blip.get(_R_EMBED)])
+        for pr in el.iter(_WP_DOCPR):
+            pr.set('id', str(next_id))
+            next_id += 1
+        # Moved child by child, as in add_code_block(): grafting a large
+        # subtree at once is quadratic in its xml:space attributes
+        children = list(el)
+        for child in children:
+            el.remove(child)
+        _append_block(doc, el)
+        el.extend(children)
+    return True
+
+
+class _BodyElements:
+    # Running count of the XML elements in the body for cgg_profile. Steps only
+    # append blocks (before the final w:sectPr), so only new ones are walked.
+
+    def __init__(self, body):
+        self.body = body
+        self.seen = 0
+        self.total = 0
+
+    def __call__(self):
+        body = self.body
+        end = len(body) - (1 if body.sectPr is not None else 0)
+        for i in range(self.seen, end):
+            self.total += sum(1 for _ in body[i].iter())
+        self.seen = max(self.seen, end)
+        return self.total
+
+
+def build_document(report) -> Document:
+    skeleton = report.nodes[:report.skeleton]
+    with cgg_profile.span('open_template', 'setup'):
+        doc = open_template(skeleton)
+    if report.title:
+        doc.core_properties.title = report.title
+    set_language(doc, report.locale)
+    if report.pages.get('docx'):
+        set_page_count(doc, report.pages['docx'])
+    body = doc.element.body
+    profiler = cgg_profile.current()
+    elements = None if profiler is None else _BodyElements(body)
+    template = template_key(skeleton)
+    for nodes in _sections(report.nodes[report.skeleton:]):
+        path = _section_path(section_key(template, nodes)) if report.cache_sections else None
+        if path:
+            with cgg_profile.span(f'cache {getattr(nodes[0], "text", "")}', 'cache', elements):
+                if any(type(node) is CodeBlock for node in nodes):
+                    ensure_code_styles(doc)
+                if _splice_section(doc, path):
+                    continue
+        start = len(body) - (1 if body.sectPr is not None else 0)
+        if profiler is None:
+            for node in nodes:
+                RENDERERS[type(node)](doc, node)
+        else:
+            profiler.render_nodes(RENDERERS, doc, nodes, elements)
+        if path:
+            end = len(body) - (1 if body.sectPr is not None else 0)
+            try:
+                _store_section(path, doc, body[start:end])
+            except OSError:
+                pass  # a read-only cache only costs the rebuild
+    return doc
+
+
+# Packaging: instead of doc.save(), which serializes every part to bytes
+# before zipping it, XML parts are written by lxml's incremental writer
+# straight into their zip entry; libxml2 flushes its output buffer as it
+# goes, so saving never holds a part's serialized text, at the speed of a
+# single serialization and with the same bytes. Image parts with the same
+# bytes are written once and every relationship points to that copy.
+# Compression is chosen per part: PART_COMPRESSION maps a content type (or a
+# partname extension) to (method, level); everything else uses
+# DEFAULT_COMPRESSION. A level of None is the method's default.
+DEFAULT_COMPRESSION = (ZIP_DEFLATED, None)
+PART_COMPRESSION = {
+    'image/png': (ZIP_STORED, None),  # already deflated
+}
+_MEDIA_EXTENSIONS = {'png', 'jpeg', 'jpg', 'gif', 'bmp', 'tiff', 'emf', 'wmf'}
+_ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)  # fixed entry dates: same report, same bytes
+WRITE_BUFFER_BYTES = 256 * 1024
+# A streamed entry's level can only be set from Python 3.13 on
+_STREAM_LEVELS = hasattr(ZipInfo, 'compress_level')
+
+
+def _compression(part, table):
+    if part is None:
+        return DEFAULT_COMPRESSION
+    table = table or PART_COMPRESSION
+    return table.get(part.content_type) or table.get(part.partname.ext.lower()) or DEFAULT_COMPRESSION
+
+
+def _write_bytes(z, name, data, compression=DEFAULT_COMPRESSION):
+    method, level = compression
+    z.writestr(ZipInfo(name, _ZIP_EPOCH), data, compress_type=method, compresslevel=level)
+
+
+def _write_xml(z, name, element, compression=DEFAULT_COMPRESSION, large=False):
+    # `large` entries may pass 2 GiB
+    method, level = compression
+    if level is not None and not _STREAM_LEVELS:
+        return _write_bytes(z, name, serialize_part_xml(element), compression)
+    info = ZipInfo(name, _ZIP_EPOCH)
+    info.compress_type = method
+    if level is not None:
+        info.compress_level = level
+    # Coalesces libxml2's small flushes into zip-sized writes
+    with z.open(info, 'w', force_zip64=large) as entry, BufferedWriter(entry, WRITE_BUFFER_BYTES) as f:
+        with etree.xmlfile(f, encoding='UTF-8') as xf:
+            xf.write_declaration(standalone=True)
+            xf.write(element)
+
+
+def _rels_xml(partname, source, canonical):
+    rels = CT_Relationships.new()
+    for rel in source.rels.values():
+        if rel.is_external:
+            target = rel.target_ref
+        else:
+            target = canonical.get(rel.target_part, rel.target_part).partname.relative_ref(partname.baseURI)
+        rels.add_rel(rel.rId, rel.reltype, target, rel.is_external)
+    return serialize_part_xml(rels)
+
+
+def write_package(doc, path, compression=None):
+    # compression: optional {content type or extension: (method, level)}
+    package = doc.part.package
+    canonical, digests, parts = {}, {}, []
+    for part in package.iter_parts():
+        if part.partname.ext.lower() in _MEDIA_EXTENSIONS:
+            first = digests.setdefault(hashlib.sha256(part.blob).digest(), part)
+            if first is not part:
+                canonical[part] = first
+                continue
+        parts.append(part)
+
+    with ZipFile(path, 'w') as z:
+        _write_bytes(z, '[Content_Types].xml', _ContentTypesItem.from_parts(parts).blob)
+        _write_bytes(z, PACKAGE_URI.rels_uri.membername, _rels_xml(PACKAGE_URI, package, canonical))
+        for part in parts:
+            name = part.partname.membername
+            if isinstance(part, XmlPart):
+                _write_xml(z, name, part._element, _compression(part, compression), part is doc.part)
+            else:
+                _write_bytes(z, name, part.blob, _compression(part, compression))
+            if len(part.rels):
+                _write_bytes(z, part.partname.rels_uri.membername, _rels_xml(part.partname, part, canonical))
+
+
+def render(report, path):
+    doc = build_document(report)
+    with cgg_profile.span('save', 'save'):
+        write_package(doc, path)
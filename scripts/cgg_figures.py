@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+# The twelve UML and architecture figures of generate_cgg_report.py.
+#
+# Each figure is first described as a plain JSON-able spec built from the
+# data model: the record types, fields and status values of
+# database.rules.json, the roles of the app and its main request flows. A spec
+# is drawn with Pillow at SUPERSAMPLE times the target DPI and downsampled,
+# so lines and text stay smooth at a modest file size. PNGs are stored on
+# disk under the hash of their spec, so only figures whose source changed
+# are redrawn, and the misses are drawn by the caller's process pool.
+# Identical images are stored once by each renderer (one media part in the
+# DOCX, one XObject in the PDF).
+import hashlib
+import json
+import math
+import os
+import re
+from io import BytesIO
+
+import cgg_cache
+import cgg_charts
+import cgg_profile
+from cgg_i18n import Messages
+from cgg_ingest import RULES_PATH
+
+FIGURES_VERSION = 2  # bump when the drawing code changes
+FIGURE_DPI = 150
+SUPERSAMPLE = 2
+PALETTE_COLORS = 16
+WIDTH = 468.0        # points, the text width (cgg_charts.WIDTH)
+CACHE_MAX_FILES = 256
+
+FONT_SIZE = 7.0
+LINE = 1.0
+INK = (0x20, 0x20, 0x20)
+BLUE = (0x1F, 0x4E, 0x79)
+FILL = (0xE8, 0xF0, 0xF8)
+EXTERNAL = (0xF4, 0xF4, 0xF4)
+
+# Titles, roles, use cases, sequence messages and node labels come from the
+# message catalog (cgg_i18n, diagrams.*); only the names of the systems are
+# the same in every locale.
+SYSTEMS = ["Firebase Auth", "Realtime Database", "Firebase Storage", "MapLibre", "Nominatim"]
+
+# -- specs --------------------------------------------------------------------
+
+_TYPES = [('isString', 'string'), ('isNumber', 'number'), ('isBoolean', 'bool'), ('hasChildren', 'object')]
+_ENUM = re.compile(r'matches\(/\^\(([\w|]+)\)\$/\)')
+
+
+def _field_type(rule):
+    validate = rule.get('.validate', '') if isinstance(rule, dict) else ''
+    enum = _ENUM.search(validate)
+    if enum:
+        return ' | '.join(enum.group(1).split('|'))
+    return next((name for test, name in _TYPES if test in validate), 'any')
+
+
+def _records(spec, path=()):
+    # -> [(path pattern, {field: type})] for every record level of the rules
+    records = []
+    for key, value in spec.items():
+        if key.startswith('.') or not isinstance(value, dict):
+            continue
+        fields = {k: _field_type(v) for k, v in value.items() if not k.startswith(('.', '$'))}
+        if key.startswith('$') and fields:
+            records.append(('/'.join(path + (key,)), fields))
+        records.extend(_records(value, path + (key,)))
+    return records
+
+
+def _statuses(records, suffix):
+    for pattern, fields in records:
+        if pattern.endswith(suffix) and '|' in fields.get('status', ''):
+            return fields['status'].split(' | ')
+    return []
+
+
+# The status a record is created with and the status changes the app offers
+# (lib/leads.ts, app/leads/page.tsx, lib/aftercare.ts); no page changes the
+# status of an aftercare yet
+LIFECYCLES = {
+    'lead': ('new', [('new', 'accepted'), ('new', 'declined'), ('new', 'archived'),
+                     ('accepted', 'archived'), ('declined', 'archived')]),
+    'aftercare': ('active', []),
+}
+# Accepting a lead opens its aftercare (app/leads/page.tsx)
+HANDOFF = ('accepted', 'active')
+
+
+def _lifecycle(states, kind, initial=None, prefix=''):
+    # Declared transitions between the statuses of the rules, plus an edge
+    # from initial to the status records are created with
+    created, transitions = LIFECYCLES[kind]
+    edges = [(initial, prefix + created, '')] if initial and created in states else []
+    return edges + [(prefix + a, prefix + b, '') for a, b in transitions if a in states and b in states]
+
+
+_parsed_rules = {}
+
+
+def _rules_records(rules_path):
+    # Parsed once per process and rules file version: every locale's specs
+    # share the record types of the data model
+    st = os.stat(rules_path)
+    key = (str(rules_path), st.st_mtime_ns, st.st_size)
+    if _parsed_rules.get('key') != key:
+        with open(rules_path, encoding='utf-8') as f:
+            _parsed_rules.update(key=key, records=_records(json.load(f).get('rules', {})))
+    return _parsed_rules['records']
+
+
+def figure_specs(rules_path=RULES_PATH, msg=None):
+    msg = msg or Messages()
+    records = _rules_records(rules_path)
+    use_cases = dict(msg['diagrams.use_cases'])
+    roles = list(use_cases)
+    app = msg('diagrams.app')
+    browser, iphone, vercel, cloud, osm = msg['diagrams.hardware']
+    pages, components, views, hooks, services, schemas = msg['diagrams.software']
+    classes = [(pattern.split('/')[0], fields) for pattern, fields in records
+               if not pattern.endswith('$i') and pattern.split('/')[0] != 'leadsByClient']
+    lead = _statuses(records, 'leadsByArtist/$uid/$leadId')
+    care = _statuses(records, 'aftercareByClient/$clientUid/$aftercareId')
+    flow = [s for s in lead if s in (LIFECYCLES['lead'][0], HANDOFF[0])]
+    general = ['lead ' + s for s in flow] + ['aftercare ' + s for s in care]
+    handoff = ['lead ' + HANDOFF[0], 'aftercare ' + HANDOFF[1]]
+
+    specs = [
+        {'kind': 'graph', 'nodes': [
+            *[(role, 'actor', 0, i * 2 + 0.5) for i, role in enumerate(roles)],
+            (app, 'box', 1.5, 1.5),
+            *[(name, 'external', 3, i) for i, name in enumerate(SYSTEMS)],
+        ], 'edges': [
+            *[(role, app, '') for role in roles],
+            *[(app, name, '') for name in SYSTEMS],
+        ]},
+        {'kind': 'usecases', 'actors': use_cases},
+        {'kind': 'classes', 'classes': classes, 'more': msg('diagrams.more')},
+        *({'kind': 'sequence', 'participants': p, 'messages': m} for p, m in msg['diagrams.sequences']),
+        {'kind': 'states', 'states': lead, 'edges': _lifecycle(lead, 'lead', '●')},
+        {'kind': 'states', 'states': general, 'edges': [
+            *_lifecycle(flow, 'lead', '●', 'lead '), *_lifecycle(care, 'aftercare', prefix='aftercare '),
+            *([(*handoff, '')] if set(handoff) <= set(general) else [])]},
+        {'kind': 'graph', 'nodes': [
+            (browser, 'box', 0, 0),
+            (iphone, 'box', 0, 2),
+            (vercel, 'box', 1.5, 0),
+            (cloud, 'box', 1.5, 2),
+            (osm, 'external', 3, 1),
+        ], 'edges': [
+            (browser, vercel, 'HTTPS'),
+            (browser, cloud, 'WebSocket'),
+            (iphone, cloud, 'SDK'),
+            (vercel, cloud, 'Admin SDK'),
+            (browser, osm, 'HTTPS'),
+        ]},
+        {'kind': 'graph', 'nodes': [
+            (pages, 'box', 0, 0),
+            (components, 'box', 1, 0),
+            (views, 'box', 2, 0),
+            (hooks, 'box', 0, 1),
+            (services, 'box', 1, 1),
+            (schemas, 'box', 2, 1),
+            *[(name, 'external', i * 0.75, 2) for i, name in enumerate(SYSTEMS)],
+        ], 'edges': [
+            (pages, components, ''),
+            (pages, hooks, ''),
+            (components, services, ''),
+            (hooks, services, ''),
+            (services, schemas, ''),
+            *[(services, name, '') for name in SYSTEMS],
+        ]},
+    ]
+    for spec, title in zip(specs, msg['diagrams.titles']):
+        spec['title'] = title
+    return specs
+
+
+# -- drawing ------------------------------------------------------------------
+
+class _Canvas:
+    # Pillow drawing in points at a fixed scale
+
+    def __init__(self, width, height, dpi):
+        from PIL import Image, ImageDraw
+
+        self.scale = dpi / 72.0
+        self.image = Image.new('RGB', (round(width * self.scale), round(height * self.scale)), 'white')
+        self.draw = ImageDraw.Draw(self.image)
+
+    def font(self, size):
+        return cgg_charts.font(round(size * self.scale))
+
+    def _xy(self, *points):
+        return [v * self.scale for v in points]
+
+    def text_width(self, text, size=FONT_SIZE):
+        return max(self.draw.textlength(line, font=self.font(size)) for line in text.split('\n')) / self.scale
+
+    def text(self, x, y, text, size=FONT_SIZE, anchor='mm', fill=INK):
+        # Multi-line text centred on (x, y) for 'mm'; 'lm' starts at x
+        lines = text.split('\n')
+        top = y - (len(lines) - 1) * size * 0.6
+        for i, line in enumerate(lines):
+            self.draw.text(self._xy(x, top + i * size * 1.2), line, font=self.font(size), anchor=anchor, fill=fill)
+
+    def rect(self, x, y, w, h, fill=FILL, outline=BLUE, radius=0):
+        self.draw.rounded_rectangle(self._xy(x, y, x + w, y + h), radius=radius * self.scale,
+                                    fill=fill, outline=outline, width=round(LINE * self.scale))
+
+    def ellipse(self, x, y, w, h, fill=FILL):
+        self.draw.ellipse(self._xy(x, y, x + w, y + h), fill=fill, outline=BLUE, width=round(LINE * self.scale))
+
+    def line(self, x1, y1, x2, y2, dashed=False, arrow=True, fill=INK):
+        width = round(LINE * self.scale)
+        if dashed:
+            length = math.hypot(x2 - x1, y2 - y1) or 1.0
+            steps = int(length // 4)
+            for i in range(0, steps, 2):
+                a, b = i / steps, min(1.0, (i + 1) / steps)
+                self.draw.line(self._xy(x1 + (x2 - x1) * a, y1 + (y2 - y1) * a,
+                                        x1 + (x2 - x1) * b, y1 + (y2 - y1) * b), fill=fill, width=width)
+        else:
+            self.draw.line(self._xy(x1, y1, x2, y2), fill=fill, width=width)
+        if arrow:
+            angle = math.atan2(y2 - y1, x2 - x1)
+            head = [(x2 - 5 * math.cos(angle + d), y2 - 5 * math.sin(angle + d)) for d in (0.4, -0.4)]
+            self.draw.polygon(self._xy(x2, y2, *head[0], *head[1]), fill=fill)
+
+    def actor(self, x, y, label):
+        # Stick figure centred on x, head at y
+        self.draw.ellipse(self._xy(x - 4, y, x + 4, y + 8), outline=INK, width=round(LINE * self.scale))
+        self.line(x, y + 8, x, y + 20, arrow=False)
+        self.line(x - 7, y + 12, x + 7, y + 12, arrow=False)
+        self.line(x, y + 20, x - 6, y + 28, arrow=False)
+        self.line(x, y + 20, x + 6, y + 28, arrow=False)
+        self.text(x, y + 35, label)
+
+    def png(self, dpi):
+        from PIL import Image
+
+        scale = dpi / 72.0 / self.scale
+        image = self.image.resize((max(1, round(self.image.width * scale)),
+                                   max(1, round(self.image.height * scale))), Image.LANCZOS)
+        # A few inks plus their anti-aliasing ramps: a small palette keeps
+        # the edges smooth at a quarter of the RGB size
+        image = image.quantize(PALETTE_COLORS, method=Image.Quantize.MEDIANCUT)
+        out = BytesIO()
+        image.save(out, 'PNG', optimize=True, dpi=(dpi, dpi))
+        return out.getvalue()
+
+
+def _clip(x1, y1, x2, y2, w, h):
+    # Point where the segment from the centre (x1, y1) of a w x h box towards
+    # (x2, y2) leaves the box
+    dx, dy = x2 - x1, y2 - y1
+    t = min(w / 2 / abs(dx) if dx else float('inf'), h / 2 / abs(dy) if dy else float('inf'))
+    return x1 + dx * min(t, 1.0), y1 + dy * min(t, 1.0)
+
+
+def _draw_graph(spec, dpi):
+    # Nodes at (column, row) grid positions; edges between their borders
+    cols = max(n[2] for n in spec['nodes']) + 1
+    rows = max(n[3] for n in spec['nodes']) + 1
+    cell_w, cell_h = WIDTH / cols, 56.0
+    height = 28 + rows * cell_h
+    c = _Canvas(WIDTH, height, dpi * SUPERSAMPLE)
+    c.text(WIDTH / 2, 10, spec['title'], FONT_SIZE + 2)
+    boxes = {}
+    for name, shape, col, row in spec['nodes']:
+        x, y = cell_w * (col + 0.5), 28 + cell_h * (row + 0.5)
+        w = min(cell_w - 10, c.text_width(name) + 14)
+        boxes[name] = (x, y, w, 30 if shape != 'actor' else 44, shape)
+    for a, b, label in spec['edges']:
+        xa, ya, wa, ha, _ = boxes[a]
+        xb, yb, wb, hb, _ = boxes[b]
+        x1, y1 = _clip(xa, ya, xb, yb, wa, ha)
+        x2, y2 = _clip(xb, yb, xa, ya, wb, hb)
+        c.line(x1, y1, x2, y2)
+        if label:
+            w = c.text_width(label, FONT_SIZE - 1) + 4
+            mx, my = (x1 + x2) / 2, (y1 + y2) / 2
+            c.rect(mx - w / 2, my - 5, w, 10, fill='white', outline='white')
+            c.text(mx, my, label, FONT_SIZE - 1, fill=BLUE)
+    for name, (x, y, w, h, shape) in boxes.items():
+        if shape == 'actor':
+            c.actor(x, y - 20, name)
+        elif shape == 'state':
+            c.rect(x - w / 2, y - h / 2, w, h, radius=10)
+            c.text(x, y, name)
+        elif shape == 'initial':
+            c.draw.ellipse(c._xy(x - 5, y - 5, x + 5, y + 5), fill=INK)
+        else:
+            c.rect(x - w / 2, y - h / 2, w, h, fill=EXTERNAL if shape == 'external' else FILL,
+                   radius=4 if shape == 'external' else 0)
+            c.text(x, y, name)
+    return c
+
+
+def _draw_usecases(spec, dpi):
+    actors = list(spec['actors'].items())
+    rows = max(len(cases) for _, cases in actors)
+    height = 40 + rows * 30
+    c = _Canvas(WIDTH, height, dpi * SUPERSAMPLE)
+    c.text(WIDTH / 2, 10, spec['title'], FONT_SIZE + 2)
+    c.rect(70, 24, WIDTH - 140, height - 30, fill='white', radius=6)
+    c.text(WIDTH / 2, 32, "InkMatching", FONT_SIZE, fill=BLUE)
+    for side, (actor, cases) in enumerate(actors):
+        ax = 30 if side == 0 else WIDTH - 30
+        c.actor(ax, height / 2 - 20, actor)
+        cx = WIDTH / 2 - 80 if side == 0 else WIDTH / 2 + 80
+        for i, case in enumerate(cases):
+            cy = 52 + i * (height - 60) / max(1, len(cases))
+            w = c.text_width(case) + 20
+            c.line(ax + (10 if side == 0 else -10), height / 2, cx + (-w / 2 if side == 0 else w / 2), cy,
+                   arrow=False)
+            c.ellipse(cx - w / 2, cy - 10, w, 20)
+            c.text(cx, cy, case)
+    return c
+
+
+def _draw_classes(spec, dpi, max_fields=9, columns=4):
+    line = FONT_SIZE * 1.25
+    classes = spec['classes']
+    col_w = WIDTH / columns
+    heights = [22 + line * min(len(f), max_fields + 1) for _, f in classes]
+    row_heights = [max(heights[i:i + columns]) + 12 for i in range(0, len(classes), columns)]
+    c = _Canvas(WIDTH, 24 + sum(row_heights), dpi * SUPERSAMPLE)
+    c.text(WIDTH / 2, 10, spec['title'], FONT_SIZE + 2)
+    y = 24
+    for r, row_h in enumerate(row_heights):
+        for k, (name, fields) in enumerate(classes[r * columns:(r + 1) * columns]):
+            x = k * col_w + 4
+            h = heights[r * columns + k]
+            c.rect(x, y, col_w - 8, h, fill='white')
+            c.rect(x, y, col_w - 8, 16)
+            c.text(x + (col_w - 8) / 2, y + 8, name, FONT_SIZE, fill=BLUE)
+            items = [f'{k}: {t}' for k, t in fields.items()]
+            if len(items) > max_fields + 1:
+                items = items[:max_fields] + [spec['more'].format(n=len(items) - max_fields)]
+            for i, item in enumerate(items):
+                text = item if c.text_width(item, FONT_SIZE - 1) < col_w - 14 else item[:24] + '…'
+                c.text(x + 4, y + 22 + i * line, text, FONT_SIZE - 1, anchor='lm')
+        y += row_h
+    return c
+
+
+def _draw_sequence(spec, dpi):
+    participants, messages = spec['participants'], spec['messages']
+    step = 22.0
+    height = 60 + step * len(messages) + 10
+    c = _Canvas(WIDTH, height, dpi * SUPERSAMPLE)
+    c.text(WIDTH / 2, 10, spec['title'], FONT_SIZE + 2)
+    slot = WIDTH / len(participants)
+    xs = {p: slot * (i + 0.5) for i, p in enumerate(participants)}
+    for p, x in xs.items():
+        w = min(slot - 8, c.text_width(p) + 14)
+        c.rect(x - w / 2, 24, w, 18)
+        c.text(x, 33, p)
+        c.line(x, 42, x, height - 4, dashed=True, arrow=False, fill=(0x80, 0x80, 0x80))
+    for i, (a, b, label) in enumerate(messages):
+        y = 58 + i * step
+        if a == b:
+            x = xs[a]
+            c.line(x, y, x + 18, y, arrow=False)
+            c.line(x + 18, y, x + 18, y + 8, arrow=False)
+            c.line(x + 18, y + 8, x + 1, y + 8)
+            c.text(x + 22, y + 2, label, FONT_SIZE - 1, anchor='lm')
+            continue
+        returning = participants.index(b) < participants.index(a)
+        c.line(xs[a], y, xs[b], y, dashed=returning)
+        c.text((xs[a] + xs[b]) / 2, y - 5, label, FONT_SIZE - 1)
+    return c
+
+
+def _draw_states(spec, dpi):
+    states = spec['states']
+    nodes = [('●', 'initial', 0, 0)] + [(s, 'state', i + 1, i % 2) for i, s in enumerate(states)]
+    return _draw_graph({'title': spec['title'], 'nodes': nodes, 'edges': spec['edges']}, dpi)
+
+
+_DRAW = {
+    'graph': _draw_graph,
+    'usecases': _draw_usecases,
+    'classes': _draw_classes,
+    'sequence': _draw_sequence,
+    'states': _draw_states,
+}
+
+
+def draw(spec, dpi=FIGURE_DPI):
+    # -> PNG bytes at dpi
+    return _DRAW[spec['kind']](spec, dpi).png(dpi)
+
+
+# -- cache --------------------------------------------------------------------
+
+def figure_key(spec, dpi=FIGURE_DPI):
+    payload = json.dumps({'version': FIGURES_VERSION, 'dpi': dpi, 'supersample': SUPERSAMPLE,
+                          'colors': PALETTE_COLORS, 'spec': spec}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def render_figures(specs, dpi=FIGURE_DPI, executor=None):
+    # -> PNG bytes per spec; cached figures are read back, the others drawn
+    # by the caller's process pool (in this process without one, or when
+    # only one is missing)
+    pngs = [None] * len(specs)
+    missing = []
+    for i, spec in enumerate(specs):
+        path = cgg_cache.entry(f'figure-{figure_key(spec, dpi)}.png')
+        pngs[i] = cgg_cache.read(path) if path else None
+        if pngs[i] is None:
+            missing.append(i)
+    if executor is not None and len(missing) > 1:
+        drawn = list(executor.map(draw, [specs[i] for i in missing], [dpi] * len(missing)))
+    else:
+        drawn = [draw(specs[i], dpi) for i in missing]
+    for i, data in zip(missing, drawn):
+        pngs[i] = data
+        path = cgg_cache.entry(f'figure-{figure_key(specs[i], dpi)}.png')
+        if path:
+            try:
+                cgg_cache.write(path, data)
+            except OSError:
+                pass  # a read-only cache only costs the redraw
+    if missing and cgg_cache.CACHE_DIR:
+        try:
+            cgg_cache.evict('figure-*.png', max_files=CACHE_MAX_FILES)
+        except OSError:
+            pass
+    return pngs
+
+
+def add_figures_content(report, msg=None, rules_path=RULES_PATH, dpi=FIGURE_DPI, executor=None):
+    msg = msg or Messages()
+    report.heading(msg('diagrams.heading'), level=1)
+    with cgg_profile.span('figures', 'content'):
+        specs = figure_specs(rules_path, msg)
+        pngs = render_figures(specs, dpi, executor)
+    for n, (spec, data) in enumerate(zip(specs, pngs), 1):
+        report.image(data, caption=msg('diagrams.caption', n=n, title=spec['title']))
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+# Artist geography for generate_cgg_report.py: density per city and grid
+# cell, nearest-neighbour distances and client coverage, from the
+# publicProfiles coordinates of an RTDB export.
+#
+# Nearest neighbours go through a multi-level grid index: each level buckets
+# the points into cells three times larger than the previous one. A query
+# looks at the occupied cells around it, skips those whose bounding box is
+# farther than a point already found, measures the rest with a vectorized
+# haversine, and moves up a level while its best distance cannot be
+# certified. This replaces the O(n²) pairwise distances.
+import math
+from io import BytesIO
+
+import numpy as np
+
+from cgg_analytics import Categories, group_stats
+from cgg_i18n import Messages
+from cgg_ingest import RULES_PATH, iter_records
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+
+BASE_CELL_KM = 0.05
+LEVEL_FACTOR = 3
+# A match is certified when it is closer than this share of the distance
+# the searched cells are known to cover (a margin for rounding).
+CERTIFY = 0.9
+SEARCH_RADIUS = 2           # cells searched around a query at each level
+LEAF_SIZE = 16              # cells with more points are split before measuring
+MAX_PAIRS = 4_000_000       # candidate pairs measured at once
+
+DENSITY_CELL_KM = 10.0
+NN_BINS_KM = [0, 0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, np.inf]
+COVERAGE_RADII_KM = [1, 5, 10, 25, 50]
+TOP_N = 15
+
+MAP_WIDTH_PT = 468.0
+MAP_DPI = 150
+MAP_BINS = 96
+BLUE = (0x1F, 0x4E, 0x79)
+CLIENT = (0xC0, 0x39, 0x2B)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# -- index ---------------------------------------------------------------------
+
+def _cell_degrees(cell_km, max_abs_lat):
+    # Cells cell_km high and at least cell_km wide up to max_abs_lat
+    max_abs_lat = min(max_abs_lat, 89.0)
+    return cell_km / KM_PER_DEG, cell_km / (KM_PER_DEG * math.cos(math.radians(max_abs_lat)))
+
+
+class _GridLevel:
+    # Points sorted by cell. A cell is scale x scale base cells of
+    # dlat x dlon degrees, so the levels of an index nest exactly.
+    # Longitudes do not wrap around the antimeridian.
+
+    def __init__(self, lat, lon, dlat, dlon, scale=1):
+        self.base = (dlat, dlon)
+        self.scale = scale
+        self.dlat = dlat * scale
+        self.dlon = dlon * scale
+        self.cell_km = self.dlat * KM_PER_DEG
+        self.ncols = int(360 / dlon) // scale + 2 * SEARCH_RADIUS + 2
+        rows, cols = self.rows_cols(lat, lon)
+        keys = rows * self.ncols + cols
+        self.order = np.argsort(keys, kind='stable')
+        self.cells, self.starts, self.counts = np.unique(keys[self.order], return_index=True,
+                                                         return_counts=True)
+
+    def rows_cols(self, lat, lon):
+        dlat, dlon = self.base
+        rows = np.floor((np.asarray(lat) + 90) / dlat).astype(np.int64) // self.scale
+        cols = np.floor((np.asarray(lon) + 180) / dlon).astype(np.int64) // self.scale
+        return rows, cols + SEARCH_RADIUS + 1
+
+    def bounds(self, cells):
+        # (south, north, west, east) of the given cells
+        rows, cols = np.divmod(self.cells[cells], self.ncols)
+        cols = cols - SEARCH_RADIUS - 1
+        return (rows * self.dlat - 90, (rows + 1) * self.dlat - 90,
+                cols * self.dlon - 180, (cols + 1) * self.dlon - 180)
+
+    def block(self, rows, cols, radius):
+        # (query position, cell position) of the occupied cells within
+        # `radius` cells of each query
+        queries, cells = [], []
+        for dr in range(-radius, radius + 1):
+            for dc in range(-radius, radius + 1):
+                keys = (rows + dr) * self.ncols + cols + dc
+                pos = np.minimum(np.searchsorted(self.cells, keys), len(self.cells) - 1)
+                hit = np.nonzero(self.cells[pos] == keys)[0]
+                queries.append(hit)
+                cells.append(pos[hit])
+        return np.concatenate(queries), np.concatenate(cells)
+
+    def lower_bound(self, qlat, qlon, cells):
+        # Exact distance from each query to its cell: at a fixed latitude the
+        # nearest longitude is the clipped one, and along that meridian the
+        # nearest point is the foot of the perpendicular, clipped to the cell
+        south, north, west, east = self.bounds(cells)
+        lon = np.clip(qlon, west, east)
+        phi = np.radians(qlat)
+        foot = np.degrees(np.arctan2(np.sin(phi), np.cos(phi) * np.cos(np.radians(qlon - lon))))
+        return haversine_km(qlat, qlon, np.clip(foot, south, north), lon)
+
+    def children(self, parent, queries, cells):
+        # The occupied cells of this level inside the given cells of the
+        # level above (LEVEL_FACTOR times larger, same origin)
+        rows, cols = np.divmod(parent.cells[cells], parent.ncols)
+        cols = cols - SEARCH_RADIUS - 1
+        out_q, out_cells = [], []
+        for dr in range(LEVEL_FACTOR):
+            for dc in range(LEVEL_FACTOR):
+                keys = ((rows * LEVEL_FACTOR + dr) * self.ncols
+                        + cols * LEVEL_FACTOR + dc + SEARCH_RADIUS + 1)
+                pos = np.minimum(np.searchsorted(self.cells, keys), len(self.cells) - 1)
+                hit = self.cells[pos] == keys
+                out_q.append(queries[hit])
+                out_cells.append(pos[hit])
+        return np.concatenate(out_q), np.concatenate(out_cells)
+
+    def expand(self, queries, cells):
+        # (query position, point index) for every point of the given cells
+        start, count = self.starts[cells], self.counts[cells]
+        offsets = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        return np.repeat(queries, count), self.order[np.repeat(start, count) + offsets]
+
+
+class GridIndex:
+    def __init__(self, lat, lon, max_abs_lat=None):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        if max_abs_lat is None:
+            max_abs_lat = float(np.abs(self.lat).max()) if len(self.lat) else 0.0
+        dlat, dlon = _cell_degrees(BASE_CELL_KM, max_abs_lat)
+        self.levels = []
+        scale = 1
+        while len(self.lat) and BASE_CELL_KM * scale < math.pi * EARTH_RADIUS_KM:
+            self.levels.append(_GridLevel(self.lat, self.lon, dlat, dlon, scale))
+            scale *= LEVEL_FACTOR
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _search(self, depth, qlat, qlon, best, exclude):
+        # Improves best[] for a batch of queries from the cells of level
+        # `depth` around them. Cells are visited coarse to fine: one real
+        # point per cell tightens an upper bound, cells whose bounding box is
+        # beyond it are dropped, and crowded cells are split into their nine
+        # children one level down before their points are measured.
+        level = self.levels[depth]
+        rows, cols = level.rows_cols(qlat, qlon)
+        q, cells = level.block(rows, cols, SEARCH_RADIUS)
+        while len(q):
+            level = self.levels[depth]
+            first = level.order[level.starts[cells]]
+            d = haversine_km(qlat[q], qlon[q], self.lat[first], self.lon[first])
+            if exclude is not None:
+                d[first == exclude[q]] = np.inf
+            np.minimum.at(best, q, d)
+            keep = level.lower_bound(qlat[q], qlon[q], cells) <= best[q]
+            q, cells = q[keep], cells[keep]
+            crowded = (level.counts[cells] > LEAF_SIZE) & (depth > 0)
+            self._measure(level, q[~crowded], cells[~crowded], qlat, qlon, best, exclude)
+            if depth == 0:
+                break
+            q, cells = self.levels[depth - 1].children(level, q[crowded], cells[crowded])
+            depth -= 1
+        return best
+
+    def _measure(self, level, q, cells, qlat, qlon, best, exclude):
+        load = np.cumsum(level.counts[cells])
+        start = 0
+        while start < len(q):
+            done = load[start - 1] if start else 0
+            stop = max(start + 1, int(np.searchsorted(load, done + MAX_PAIRS, side='right')))
+            pq, p = level.expand(q[start:stop], cells[start:stop])
+            if exclude is not None:
+                other = p != exclude[pq]
+                pq, p = pq[other], p[other]
+            np.minimum.at(best, pq, haversine_km(qlat[pq], qlon[pq], self.lat[p], self.lon[p]))
+            start = stop
+
+    def nearest(self, qlat, qlon, exclude_self=False):
+        # Distance (km) from each query to its nearest indexed point; with
+        # exclude_self the queries are the indexed points themselves
+        qlat = np.asarray(qlat, dtype=np.float64)
+        qlon = np.asarray(qlon, dtype=np.float64)
+        best = np.full(len(qlat), np.inf)
+        # A cap of radius d around a query at latitude lat spans
+        # arcsin(sin d / cos lat) of longitude either side, and reaches the
+        # pole once that passes 90°: the distance covered by a given longitude
+        # span shrinks towards the poles. The grid does not wrap either:
+        # beyond the antimeridian (or the pole) the block proves nothing.
+        coslat = np.cos(np.radians(qlat))
+        dlon = np.radians(np.minimum(180 - np.abs(qlon), 90))
+        wrap_km = EARTH_RADIUS_KM * np.arcsin(coslat * np.sin(dlon))
+        pending = np.arange(len(qlat))
+        for depth, level in enumerate(self.levels):
+            if not len(pending):
+                break
+            exclude = pending if exclude_self else None
+            best[pending] = self._search(depth, qlat[pending], qlon[pending], best[pending], exclude)
+            # Everything closer than SEARCH_RADIUS cells, along the meridian
+            # and across it, was inside the block
+            span = math.radians(min(SEARCH_RADIUS * level.dlon, 90))
+            across = EARTH_RADIUS_KM * np.arcsin(coslat[pending] * math.sin(span))
+            limit = np.minimum(CERTIFY * np.minimum(SEARCH_RADIUS * level.cell_km, across), wrap_km[pending])
+            pending = pending[best[pending] > limit]
+        for i in pending:  # farther than the coarsest level: measure everything
+            d = haversine_km(qlat[i], qlon[i], self.lat, self.lon)
+            if exclude_self:
+                d[i] = np.inf
+            best[i] = d.min() if len(d) else np.inf
+        return best
+
+
+# -- analysis ------------------------------------------------------------------
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+
+class Geography:
+    __slots__ = ('source', 'artists', 'clients', 'cities', 'cells', 'nn', 'coverage', 'map_png')
+
+    def __init__(self, source):
+        self.source = str(source)
+        self.artists = 0
+        self.clients = 0
+        self.cities = []     # (city, artists, median NN km)
+        self.cells = []      # (centre lat, centre lon, artists)
+        self.nn = None       # percentiles + histogram of nearest-artist distances
+        self.coverage = []   # (radius km, clients covered, share)
+        self.map_png = None
+
+
+class ProfileCollector:
+    # Profile coordinates as they stream by, from iter_records() or from the
+    # sink of cgg_ingest.scan_export()
+    patterns = ('publicProfiles/$uid',)
+
+    def __init__(self):
+        self.cities = Categories()
+        self.alat, self.alon, self.acity, self.clat, self.clon = [], [], [], [], []
+
+    def add(self, pattern, keys, p):
+        lat = _number(p.get('latitude', p.get('lat')))
+        lon = _number(p.get('longitude', p.get('lng')))
+        if np.isnan(lat) or np.isnan(lon) or (lat == 0 and lon == 0) or abs(lat) > 90 or abs(lon) > 180:
+            return  # the app stores 0,0 when geocoding failed
+        if p.get('role', 'client') == 'artist':
+            self.alat.append(lat)
+            self.alon.append(lon)
+            self.acity.append(self.cities.code(str(p.get('city') or '').strip().casefold()))
+        else:
+            self.clat.append(lat)
+            self.clon.append(lon)
+
+    def profiles(self):
+        # -> artist lat/lon/city codes, client lat/lon, city categories
+        return (np.array(self.alat), np.array(self.alon), np.array(self.acity, dtype=np.int32),
+                np.array(self.clat), np.array(self.clon), self.cities)
+
+
+def load_profiles(path, rules_path=RULES_PATH):
+    collector = ProfileCollector()
+    for pattern, keys, record in iter_records(path, collector.patterns, rules_path):
+        collector.add(pattern, keys, record)
+    return collector.profiles()
+
+
+def artist_nearest(lat, lon):
+    # Nearest other artist; artists sharing coordinates are 0 km apart and
+    # only distinct positions go through the index
+    coords = np.stack([lat, lon], axis=1)
+    unique, inverse, counts = np.unique(coords, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    index = GridIndex(unique[:, 0], unique[:, 1])
+    nn = index.nearest(unique[:, 0], unique[:, 1], exclude_self=True)
+    nn[counts > 1] = 0.0
+    return nn[inverse]
+
+
+def analyze_geography(path, rules_path=RULES_PATH, profiles=None):
+    # profiles: load_profiles() output when it was collected already
+    alat, alon, acity, clat, clon, cities = profiles or load_profiles(path, rules_path)
+    geo = Geography(path)
+    geo.artists, geo.clients = len(alat), len(clat)
+    if not geo.artists:
+        return geo
+
+    nn = artist_nearest(alat, alon) if geo.artists > 1 else np.full(1, np.nan)
+    finite = nn[np.isfinite(nn)]
+    if len(finite):
+        geo.nn = {
+            'p10': float(np.percentile(finite, 10)), 'median': float(np.median(finite)),
+            'p90': float(np.percentile(finite, 90)), 'mean': float(finite.mean()),
+            'histogram': np.histogram(finite, bins=NN_BINS_KM)[0].tolist(),
+        }
+
+    count, _, _, median = group_stats(acity, nn, len(cities))
+    per_city = np.bincount(acity, minlength=len(cities))
+    for c in np.argsort(-per_city, kind='stable')[:TOP_N]:
+        if per_city[c]:
+            geo.cities.append((cities.labels[c].title() or '—', int(per_city[c]),
+                               None if np.isnan(median[c]) else float(median[c])))
+
+    grid = _GridLevel(alat, alon, *_cell_degrees(DENSITY_CELL_KM, float(np.abs(alat).max())))
+    top = np.argsort(-grid.counts, kind='stable')[:TOP_N]
+    south, north, west, east = grid.bounds(top)
+    for lat, lon, n in zip((south + north) / 2, (west + east) / 2, grid.counts[top]):
+        geo.cells.append((float(lat), float(lon), int(n)))
+
+    if geo.clients:
+        dist = GridIndex(alat, alon, max(np.abs(alat).max(), np.abs(clat).max())).nearest(clat, clon)
+        geo.coverage = [(r, int((dist <= r).sum()), float((dist <= r).mean())) for r in COVERAGE_RADII_KM]
+
+    geo.map_png = density_map(alat, alon, clat, clon)
+    return geo
+
+
+# -- density map ---------------------------------------------------------------
+
+def _extent(lat, lon):
+    # Robust bounding box (outliers would shrink everything else to a dot)
+    lat_lo, lat_hi = np.percentile(lat, [0.5, 99.5])
+    lon_lo, lon_hi = np.percentile(lon, [0.5, 99.5])
+    pad_lat = max((lat_hi - lat_lo) * 0.05, 0.02)
+    pad_lon = max((lon_hi - lon_lo) * 0.05, 0.02)
+    return lat_lo - pad_lat, lat_hi + pad_lat, lon_lo - pad_lon, lon_hi + pad_lon
+
+
+def density_map(alat, alon, clat, clon, width_pt=MAP_WIDTH_PT, dpi=MAP_DPI):
+    # Log-scaled 2D histogram of the artists, clients as dots; PNG bytes
+    from PIL import Image, ImageDraw
+
+    from cgg_charts import font as chart_font
+
+    lat_lo, lat_hi, lon_lo, lon_hi = _extent(alat, alon)
+    aspect = (lat_hi - lat_lo) / ((lon_hi - lon_lo) * math.cos(math.radians((lat_lo + lat_hi) / 2)))
+    aspect = min(max(aspect, 0.35), 1.0)
+    width = round(width_pt * dpi / 72)
+    height = round(width * aspect)
+    nx = MAP_BINS
+    ny = max(8, round(MAP_BINS * aspect))
+    hist, _, _ = np.histogram2d(alat, alon, bins=[ny, nx], range=[[lat_lo, lat_hi], [lon_lo, lon_hi]])
+    level = np.log1p(hist) / max(np.log1p(hist.max()), 1e-9)
+    # White -> report blue; empty cells stay white
+    ramp = np.array(BLUE, dtype=np.float64)
+    rgb = 255 - level[..., None] * (255 - ramp)
+    pixels = np.ascontiguousarray(rgb[::-1].astype(np.uint8))  # north up
+    image = Image.fromarray(pixels, 'RGB').resize((width, height), Image.NEAREST)
+
+    draw = ImageDraw.Draw(image)
+    if len(clat):
+        x = (clon - lon_lo) / (lon_hi - lon_lo) * width
+        y = (lat_hi - clat) / (lat_hi - lat_lo) * height
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        r = max(1, dpi // 72)
+        for px, py in zip(x[inside][:20000], y[inside][:20000]):
+            draw.ellipse([px - r, py - r, px + r, py + r], fill=CLIENT)
+    font = chart_font(round(8 * dpi / 72))
+    draw.rectangle([0, 0, width - 1, height - 1], outline=(0, 0, 0))
+    draw.text((4, 4), f"{lat_hi:.2f}°N, {lon_lo:.2f}°", fill=(0, 0, 0), font=font)
+    draw.text((width - 4, height - 4), f"{lat_lo:.2f}°N, {lon_hi:.2f}°", fill=(0, 0, 0), font=font,
+              anchor='rd')
+    out = BytesIO()
+    image.save(out, 'PNG')
+    return out.getvalue()
+
+
+# -- report content ------------------------------------------------------------
+
+def add_geography_content(report, geo: Geography, msg=None):
+    msg = msg or Messages()
+    km = msg.number
+    report.heading(msg('geo.heading'), level=1)
+    report.paragraph(msg('geo.summary', artists=geo.artists, clients=geo.clients,
+                         source=geo.source.rsplit('/', 1)[-1]))
+    if not geo.artists:
+        return
+
+    report.heading(msg('geo.cities.heading'), level=2)
+    report.table(msg['geo.cities.headers'],
+                 [[city, n, msg.percent(n * 100 / geo.artists), km(med, 2)] for city, n, med in geo.cities])
+
+    report.heading(msg('geo.cells.heading', size=DENSITY_CELL_KM), level=2)
+    report.table(msg['geo.cells.headers'],
+                 [[f"{lat:.3f}, {lon:.3f}", n] for lat, lon, n in geo.cells])
+    if geo.map_png:
+        report.image(geo.map_png, MAP_WIDTH_PT, caption=msg('geo.map.caption'))
+
+    report.heading(msg('geo.nn.heading'), level=2)
+    if geo.nn is None:
+        report.paragraph(msg('geo.nn.none'), italic=True)
+    else:
+        nn = geo.nn
+        report.paragraph(msg('geo.nn.summary', **{k: km(nn[k], 2) for k in ('p10', 'median', 'p90', 'mean')}))
+        report.chart(msg('geo.nn.chart'), msg['geo.nn.labels'], nn['histogram'], unit=msg('geo.nn.unit'))
+
+    report.heading(msg('geo.coverage.heading'), level=2)
+    if not geo.coverage:
+        report.paragraph(msg('geo.coverage.none'), italic=True)
+    else:
+        report.table(msg['geo.coverage.headers'],
+                     [[msg('geo.coverage.radius', radius=r), n, msg.percent(share * 100)]
+                      for r, n, share in geo.coverage])
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Syntax highlighting of code blocks for generate_cgg_report.py.
+#
+# highlight() escapes a JSON (database.rules.json) or Firebase security rules
+# (storage.rules) listing for XML/HTML and wraps every token in the markup
+# the renderer supplies for its kind; everything else (whitespace,
+# punctuation, identifiers) is left as is. One regex pass does the
+# tokenizing and the markup, and results are cached by content hash, so a
+# listing shared by several reports is only processed once per format.
+import hashlib
+import re
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+# Token kind -> RGB colour shared by the DOCX and HTML renderers
+COLORS = {
+    'key': '1F4E79',
+    'string': 'A31515',
+    'number': '098658',
+    'literal': '0000FF',
+    'keyword': 'AF00DB',
+    'comment': '6A8759',
+}
+
+# Patterns run over the escaped text; escape() leaves quotes alone
+_JSON = re.compile(r'''
+    (?P<key>"(?:[^"\\\n]|\\.)*")(?=\s*:)
+  | (?P<string>"(?:[^"\\\n]|\\.)*"?)
+  | (?P<number>-?\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<literal>\b(?:true|false|null)\b)
+''', re.VERBOSE)
+
+_RULES = re.compile(r'''
+    (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>"(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?)
+  | (?P<number>\b\d+(?:\.\d+)?\b)
+  | (?P<literal>\b(?:true|false|null)\b)
+  | (?P<keyword>\b(?:rules_version|service|match|allow|if|function|return|let|in|is
+                    |read|write|get|list|create|update|delete)\b)
+''', re.VERBOSE | re.DOTALL)
+
+LANGUAGES = {'json': _JSON, 'rules': _RULES}
+
+# Longer listings stay plain: past this size the token runs would cost more
+# to build and save than the rest of the report
+MAX_LINES = 10_000
+
+CACHE_SLOTS = 64
+_cache = OrderedDict()  # (sha256, language, markup) -> highlighted text (in-process LRU)
+
+
+def highlight(text, language, markup):
+    # markup: {kind: '%s' template} for every kind in COLORS. Returns the
+    # escaped, marked-up text, or None when the language is not supported
+    # or the listing is longer than MAX_LINES.
+    pattern = LANGUAGES.get(language)
+    if pattern is None or text.count('\n') >= MAX_LINES:
+        return None
+    key = (hashlib.sha256(text.encode('utf-8')).hexdigest(), language, tuple(sorted(markup.items())))
+    out = _cache.get(key)
+    if out is None:
+        out = _cache[key] = pattern.sub(lambda m: markup[m.lastgroup] % m.group(), escape(text))
+        if len(_cache) > CACHE_SLOTS:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(key)
+    return out
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# HTML renderer for generate_cgg_report.py: one self-contained page, written
+# node by node so large tables never have to be held as a single string.
+import base64
+from html import escape
+
+import cgg_charts
+import cgg_highlight
+from cgg_model import (
+    Bullet, Chart, CodeBlock, Cover, Definition, Heading, Image, PageBreak, Paragraph, Table, Toc,
+    iter_rows,
+)
+
+CSS = """
+body { font-family: 'Times New Roman', serif; font-size: 12pt; max-width: 52em; margin: 2em auto; }
+h1, h2, h3, h4, .cover .title { color: #1F4E79; }
+.cover { text-align: center; margin: 6em 0; page-break-after: always; }
+.cover .title { font-size: 24pt; font-weight: bold; }
+.cover .subtitle { font-size: 16pt; }
+table { border-collapse: collapse; margin: 0 0 1em; }
+th, td { border: 1px solid #000; padding: 2px 4px; vertical-align: top; text-align: left; }
+th { background: #1F4E79; color: #fff; }
+pre { font-family: 'Courier New', monospace; font-size: 9pt; }
+.page-break { page-break-after: always; }
+.chart { display: block; margin: 0 auto 1em; max-width: 100%; font-family: sans-serif; }
+figure { margin: 0 0 1em; text-align: center; }
+figure img { max-width: 100%; }
+figcaption, caption { font-style: italic; font-size: 10pt; }
+""" + ''.join(f".tk-{kind} {{ color: #{color}; }}\n" for kind, color in cgg_highlight.COLORS.items())
+
+_CODE_MARKUP = {kind: f'<span class="tk-{kind}">%s</span>' for kind in cgg_highlight.COLORS}
+
+
+def _cover(out, node: Cover):
+    meta = '<br>'.join(escape(m) for m in node.meta)
+    out.write(f'<section class="cover"><p class="title">{escape(node.title)}</p>'
+              f'<p class="subtitle">{escape(node.subtitle)}</p><p>{meta}</p>'
+              f'<p><strong>{escape(node.institution)}</strong></p></section>\n')
+
+
+def _toc(out, node: Toc, headings):
+    # Entries from cgg_paginate.index(), else the headings (contents only)
+    entries = node.entries
+    if entries is None:
+        entries = [(level, text, f'h{i}') for i, (text, level) in enumerate(headings)
+                   if 1 <= level <= 3] if node.kind == 'contents' else []
+    out.write(f'<nav class="toc {node.kind}"><ul>\n')
+    for level, text, anchor in entries:
+        out.write(f'<li style="margin-left:{level - 1}em"><a href="#{anchor}">{escape(text)}</a></li>\n')
+    out.write('</ul></nav>\n')
+
+
+def _paragraph(out, node: Paragraph):
+    text = escape(node.text).replace('\n', '<br>')
+    if node.bold:
+        text = f'<strong>{text}</strong>'
+    if node.italic:
+        text = f'<em>{text}</em>'
+    align = f' style="text-align:{node.align}"' if node.align != 'left' else ''
+    out.write(f'<p{align}>{text}</p>\n')
+
+
+def _table(out, node: Table):
+    out.write(f'<table id="{node.anchor}">\n' if node.anchor else '<table>\n')
+    if node.caption:
+        out.write(f'<caption>{escape(node.caption)}</caption>\n')
+    if node.col_widths_pt:
+        out.write('<colgroup>' + ''.join(f'<col style="width:{w}pt">' for w in node.col_widths_pt)
+                  + '</colgroup>\n')
+    out.write('<tr>' + ''.join(f'<th>{escape(str(h))}</th>' for h in node.headers) + '</tr>\n')
+    for row in iter_rows(node.headers, node.rows):
+        out.write('<tr>' + ''.join(f'<td>{escape(str(v))}</td>' for v in row) + '</tr>\n')
+    out.write('</table>\n')
+
+
+def _rgb(color):
+    return '#%02x%02x%02x' % color
+
+
+def _chart(out, node: Chart):
+    w, h = cgg_charts.WIDTH, cgg_charts.HEIGHT
+    out.write(f'<svg class="chart" viewBox="0 0 {w:g} {h:g}" width="{w:g}pt" height="{h:g}pt" '
+              f'xmlns="http://www.w3.org/2000/svg" role="img" aria-label="{escape(node.title)}">')
+    for op in cgg_charts.layout(node, w, h):
+        if op[0] == 'rect':
+            _, x, y, rw, rh, color = op
+            out.write(f'<rect x="{x:.2f}" y="{y:.2f}" width="{rw:.2f}" height="{rh:.2f}" fill="{_rgb(color)}"/>')
+        elif op[0] == 'line':
+            _, xa, ya, xb, yb, color = op
+            out.write(f'<line x1="{xa:.2f}" y1="{ya:.2f}" x2="{xb:.2f}" y2="{yb:.2f}" '
+                      f'stroke="{_rgb(color)}" stroke-width="0.5"/>')
+        else:
+            _, x, y, text, size, anchor, color = op
+            out.write(f'<text x="{x:.2f}" y="{y:.2f}" font-size="{size}" text-anchor="{anchor}" '
+                      f'fill="{_rgb(color)}">{escape(text)}</text>')
+    out.write('</svg>\n')
+
+
+def _code(out, node: CodeBlock):
+    text = cgg_highlight.highlight(node.text, node.language, _CODE_MARKUP) if node.language else None
+    out.write(f'<pre><code>{escape(node.text) if text is None else text}</code></pre>\n')
+
+
+def _image(out, node: Image):
+    width = f' style="width:{node.width_pt:g}pt"' if node.width_pt else ''
+    out.write(f'<figure id="{node.anchor}">' if node.anchor else '<figure>')
+    out.write(f'<img src="data:image/png;base64,{base64.b64encode(node.data).decode("ascii")}"'
+              f'{width} alt="{escape(node.caption)}">')
+    if node.caption:
+        out.write(f'<figcaption>{escape(node.caption)}</figcaption>')
+    out.write('</figure>\n')
+
+
+def render(report, path):
+    headings = [(n.text, n.level) for n in report if type(n) is Heading]
+    heading_no = 0
+    with open(path, 'w', encoding='utf-8') as out:
+        out.write(f'<!DOCTYPE html>\n<html lang="{report.locale}"><head><meta charset="utf-8">'
+                  f'<title>{escape(report.title)}</title><style>{CSS}</style></head><body>\n')
+        for node in report:
+            kind = type(node)
+            if kind is Heading:
+                level = min(max(node.level, 1), 6)
+                out.write(f'<h{level} id="{node.anchor or f"h{heading_no}"}">{escape(node.text)}</h{level}>\n')
+                heading_no += 1
+            elif kind is Cover:
+                _cover(out, node)
+            elif kind is Toc:
+                _toc(out, node, headings)
+            elif kind is Paragraph:
+                _paragraph(out, node)
+            elif kind is Bullet:
+                out.write(f'<p>{escape(node.marker)} {escape(node.text)}</p>\n')
+            elif kind is Definition:
+                out.write(f'<p>• <strong>{escape(node.term)}</strong> : {escape(node.text)}</p>\n')
+            elif kind is Table:
+                _table(out, node)
+            elif kind is CodeBlock:
+                _code(out, node)
+            elif kind is Chart:
+                _chart(out, node)
+            elif kind is Image:
+                _image(out, node)
+            elif kind is PageBreak:
+                out.write('<div class="page-break"></div>\n')
+        out.write('</body></html>\n')
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Message catalogs of the platform report (generate_cgg_report.py and its
+# annexes), as the web app's lib/i18n.ts does for the UI.
+#
+# locales/<locale>.json is one flat object: dotted keys to strings, or to
+# (nested) lists of strings for bullet lists and table rows. A catalog is read
+# once per process and shared by every report built in it; keys missing from
+# a locale fall back to the French source text.
+import json
+from functools import lru_cache
+from pathlib import Path
+
+LOCALES_DIR = Path(__file__).with_name('locales')
+DEFAULT_LOCALE = 'fr'
+
+
+def available_locales():
+    return sorted(path.stem for path in LOCALES_DIR.glob('*.json'))
+
+
+@lru_cache(maxsize=None)
+def catalog(locale):
+    path = LOCALES_DIR / f'{locale}.json'
+    if not path.is_file():
+        raise ValueError(f"Langue non prise en charge: {locale} (disponibles: {', '.join(available_locales())})")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Messages:
+    # msg('key', **values) -> formatted string; msg['key'] -> raw value
+
+    __slots__ = ('locale', '_catalog', '_fallback')
+
+    def __init__(self, locale=DEFAULT_LOCALE):
+        self.locale = locale
+        self._catalog = catalog(locale)
+        self._fallback = catalog(DEFAULT_LOCALE) if locale != DEFAULT_LOCALE else self._catalog
+
+    def __getitem__(self, key):
+        value = self._catalog.get(key)
+        return self._fallback[key] if value is None else value
+
+    def __call__(self, key, **values):
+        # Text without placeholders (paths like {uid}) is returned as is
+        text = self[key]
+        return text.format(**values) if values else text
+
+    def number(self, value, digits=1):
+        if value is None:
+            return "—"
+        return f"{value:.{digits}f}".replace('.', self['number.decimal'])
+
+    def percent(self, value, digits=1):
+        return self('number.percent', value=self.number(value, digits))
@@ -0,0 +1,612 @@
+# -*- coding: utf-8 -*-
+# Streaming ingestion of RTDB JSON exports for generate_cgg_report.py.
+#
+# The export is memory-mapped and read with a pull (event) parser, so a
+# multi-GB file is scanned in one pass without ever being loaded as a tree.
+# Records are located through the rules in database.rules.json; for each
+# record pattern (e.g. publicProfiles/$uid) we collect counts, byte sizes,
+# field fill rates and `.validate` type violations.
+import codecs
+import json
+import mmap
+import re
+import time
+from pathlib import Path
+
+RULES_PATH = Path(__file__).resolve().parent.parent / 'database.rules.json'
+
+# Nodes written by the app but absent from the rules (or documented in
+# section 2.5 of the report); the last segment is the record level.
+EXTRA_SCHEMA = {
+    'bookingsByArtist': '$uid/$bookingId',
+    'bookingsByClient': '$uid/$bookingId',
+    'leads': '$leadId',
+    'bookings': '$bookingId',
+    'stencils': '$artistId/$stencilId',
+}
+
+MAX_FIELDS_PER_RECORD = 200
+MAX_VIOLATION_SAMPLES = 3
+# Bytes decoded at a time when reading the members of a record container
+WINDOW_BYTES = 1 << 20
+
+# -- event parser ------------------------------------------------------------
+
+_SEP = re.compile(rb'[ \t\r\n,:]*')
+_STRING = re.compile(rb'"([^"\\]*(?:\\.[^"\\]*)*)"')
+_NUMBER = re.compile(rb'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?')
+# Everything up to the next bracket outside a string, in one match
+_STRUCT = re.compile(rb'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*([{}\[\]])')
+_MEMBER_SEP = re.compile(r'[ \t\r\n,]*')
+_KEY_SEP = re.compile(r'[ \t\r\n]*:[ \t\r\n]*')
+_json = json.JSONDecoder()
+_LITERALS = {b't': (b'true', True), b'f': (b'false', False), b'n': (b'null', None)}
+
+
+def _decode(raw):
+    if b'\\' in raw:
+        return json.loads(b'"' + raw + b'"')
+    return raw.decode('utf-8')
+
+
+class EventReader:
+    # Pull parser over a bytes-like buffer (an mmap for real exports).
+    # next_event() returns (event, value, start, end) with ijson-style event
+    # names: start_map, map_key, end_map, start_array, end_array, string,
+    # number, boolean, null. skip() jumps over the container just opened.
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+        self._stack = []
+        self._expect_key = False
+
+    def _after_value(self):
+        self._expect_key = bool(self._stack) and self._stack[-1] == b'{'
+
+    def next_event(self):
+        buf = self.buf
+        start = _SEP.match(buf, self.pos).end()
+        c = buf[start:start + 1]
+        if not c:
+            return None
+        if c == b'{' or c == b'[':
+            self._stack.append(c)
+            self._expect_key = c == b'{'
+            self.pos = start + 1
+            return ('start_map' if c == b'{' else 'start_array'), None, start, start + 1
+        if c == b'}' or c == b']':
+            self._stack.pop()
+            self._after_value()
+            self.pos = start + 1
+            return ('end_map' if c == b'}' else 'end_array'), None, start, start + 1
+        if c == b'"':
+            m = _STRING.match(buf, start)
+            if m is None:
+                raise ValueError(f"Unterminated string at byte {start}")
+            self.pos = m.end()
+            if self._expect_key:
+                self._expect_key = False
+                return 'map_key', _decode(m.group(1)), start, m.end()
+            self._after_value()
+            return 'string', _decode(m.group(1)), start, m.end()
+        literal = _LITERALS.get(c)
+        if literal is not None:
+            text, value = literal
+            self.pos = start + len(text)
+            self._after_value()
+            return ('null' if value is None else 'boolean'), value, start, self.pos
+        m = _NUMBER.match(buf, start)
+        if m is None:
+            raise ValueError(f"Unexpected byte {c!r} at {start}")
+        self.pos = m.end()
+        self._after_value()
+        raw = m.group()
+        value = float(raw) if raw.strip(b'-0123456789') else int(raw)
+        return 'number', value, start, self.pos
+
+    def _container_end(self):
+        # Offset just past the bracket closing the innermost open container
+        depth = 1
+        for m in _STRUCT.finditer(self.buf, self.pos):
+            depth += 1 if m.group(1) in (b'{', b'[') else -1
+            if depth == 0:
+                return m.end()
+        raise ValueError("Unbalanced JSON container")
+
+    def skip(self):
+        # Skip the rest of the innermost open container; returns its end
+        # offset and whether it had any children.
+        first = _SEP.match(self.buf, self.pos).end()
+        empty = self.buf[first:first + 1] in (b'}', b']')
+        self._close(self._container_end())
+        return self.pos, not empty
+
+    def members(self):
+        # Consume the rest of the innermost open container, yielding
+        # (key, value, size in bytes) per member; array members are keyed by
+        # index. Members are decoded by the C json scanner from a window of
+        # the buffer, so each one must fit in memory but the container need not.
+        is_map = self._stack[-1] == b'{'
+        limit = self._container_end()
+        pos, window = self.pos, WINDOW_BYTES
+        index = 0
+        while True:
+            chunk = self.buf[pos:min(pos + window, limit)]
+            complete = pos + len(chunk) >= limit
+            text = codecs.getincrementaldecoder('utf-8')().decode(chunk, final=complete)
+            i = done = 0  # `done`: end of the last member consumed from text
+            while True:
+                i = _MEMBER_SEP.match(text, i).end()
+                if complete and i == len(text) - 1:
+                    self._close(limit)
+                    return
+                try:
+                    if is_map:
+                        key, i = _json.raw_decode(text, i)
+                        i = _KEY_SEP.match(text, i).end()
+                    else:
+                        key = str(index)
+                    value, end = _json.raw_decode(text, i)
+                except ValueError:
+                    if complete:
+                        raise
+                    break
+                if end >= len(text) and not complete:
+                    break  # a scalar may continue past the window
+                index += 1
+                yield key, value, len(text[i:end].encode('utf-8'))
+                pos += len(text[done:end].encode('utf-8'))
+                i = done = end
+            if done == 0:
+                window *= 2  # a single member is larger than the window
+
+    def _close(self, end):
+        self.pos = end
+        self._stack.pop()
+        self._after_value()
+
+
+# -- .validate rules -----------------------------------------------------------
+
+class Children:
+    # Stand-in for a container value when evaluating rules
+    __slots__ = ('count', 'keys')
+
+    def __init__(self, count, keys=None):
+        self.count = count
+        self.keys = keys
+
+    def __repr__(self):
+        return f'{{{self.count} enfant(s)}}' if self.keys is None else repr(sorted(self.keys))
+
+
+def _is_number(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+_SIMPLE_ATOMS = {
+    'newData.isString()': lambda v: isinstance(v, str),
+    'newData.isNumber()': _is_number,
+    'newData.isBoolean()': lambda v: isinstance(v, bool),
+    'newData.hasChildren()': lambda v: isinstance(v, Children) and v.count > 0,
+    'newData.exists()': lambda v: v is not None,
+    'newData.val() == null': lambda v: v is None,
+    'newData.val() != null': lambda v: v is not None,
+}
+_EQ_LITERAL = re.compile(r"^newData\.val\(\) == '([^']*)'$")
+_MATCHES = re.compile(r"^newData\.val\(\)\.matches\(/(.*)/\)$")
+_HAS_CHILDREN = re.compile(r"^newData\.hasChildren\(\[(.*)\]\)$")
+
+
+def _split_top(expr, op):
+    parts, depth, quote, last = [], 0, None, 0
+    i = 0
+    while i < len(expr):
+        c = expr[i]
+        if quote:
+            if c == quote and expr[i - 1] != '\\':
+                quote = None
+        elif c in '\'"':
+            quote = c
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif depth == 0 and expr.startswith(op, i):
+            parts.append(expr[last:i])
+            last = i + len(op)
+            i += len(op)
+            continue
+        i += 1
+    parts.append(expr[last:])
+    return [p.strip() for p in parts]
+
+
+def _strip_parens(expr):
+    while expr.startswith('(') and expr.endswith(')'):
+        depth = 0
+        for i, c in enumerate(expr):
+            depth += (c == '(') - (c == ')')
+            if depth == 0 and i < len(expr) - 1:
+                return expr  # "(a) || (b)": the outer parens do not pair up
+        expr = expr[1:-1].strip()
+    return expr
+
+
+def _has_children(required):
+    def check(v):
+        if not isinstance(v, Children):
+            return False
+        if v.keys is None:
+            return None
+        return all(k in v.keys for k in required)
+    return check
+
+
+def _compile_atom(atom):
+    atom = _strip_parens(atom)
+    if '||' in atom or '&&' in atom:
+        return compile_validate(atom)
+    fn = _SIMPLE_ATOMS.get(atom)
+    if fn is not None:
+        return fn
+    m = _EQ_LITERAL.match(atom)
+    if m:
+        lit = m.group(1)
+        return lambda v: v == lit
+    m = _MATCHES.match(atom)
+    if m:
+        pattern = re.compile(m.group(1))
+        return lambda v: isinstance(v, str) and pattern.search(v) is not None
+    m = _HAS_CHILDREN.match(atom)
+    if m:
+        return _has_children([k.strip().strip('\'"') for k in m.group(1).split(',') if k.strip()])
+    return None  # not statically checkable (auth, root, parent(), ...)
+
+
+def compile_validate(expr):
+    # Returns check(value) -> True / False / None (undecidable from the data)
+    alternatives = []
+    for conj in _split_top(expr, '||'):
+        alternatives.append([_compile_atom(a) for a in _split_top(_strip_parens(conj), '&&')])
+
+    def check(value):
+        result = False
+        for atoms in alternatives:
+            verdict = True
+            for atom in atoms:
+                r = None if atom is None else atom(value)
+                if r is False:
+                    verdict = False
+                    break
+                if r is None:
+                    verdict = None
+            if verdict is True:
+                return True
+            if verdict is None:
+                result = None
+        return result
+
+    return check
+
+
+class RuleNode:
+    __slots__ = ('name', 'pattern', 'children', 'wildcard', 'validate', 'is_record', '_checks')
+
+    def __init__(self, name, pattern):
+        self.name = name
+        self.pattern = pattern
+        self.children = {}
+        self.wildcard = None
+        self.validate = None
+        self.is_record = False
+        self._checks = None
+
+    def child(self, key):
+        node = self.children.get(key)
+        return node if node is not None else self.wildcard
+
+    def field_checks(self):
+        # ({field: validate}, validate for other fields) of a record level
+        if self._checks is None:
+            wildcard = self.wildcard.validate if self.wildcard is not None else None
+            self._checks = ({k: c.validate for k, c in self.children.items()}, wildcard)
+        return self._checks
+
+
+def _build_rules(spec, name='', pattern=''):
+    node = RuleNode(name, pattern)
+    for key, value in spec.items():
+        if key == '.validate' and isinstance(value, str):
+            node.validate = compile_validate(value)
+        elif key.startswith('.') or not isinstance(value, dict):
+            continue
+        else:
+            child = _build_rules(value, key, f'{pattern}/{key}' if pattern else key)
+            if key.startswith('$'):
+                node.wildcard = child
+            else:
+                node.children[key] = child
+    # A wildcard level that declares named fields is one record per child
+    node.is_record = name.startswith('$') and bool(node.children)
+    return node
+
+
+def load_rules(path=RULES_PATH):
+    with open(path, encoding='utf-8') as f:
+        root = _build_rules(json.load(f).get('rules', {}))
+    for top, shape in EXTRA_SCHEMA.items():
+        if top in root.children:
+            continue
+        node = root.children[top] = RuleNode(top, top)
+        for segment in shape.split('/'):
+            node.wildcard = RuleNode(segment, f'{node.pattern}/{segment}')
+            node = node.wildcard
+        node.is_record = True
+    return root
+
+
+# -- statistics --------------------------------------------------------------
+
+class RecordStats:
+    __slots__ = ('pattern', 'count', 'bytes', 'fields', 'violations', 'samples')
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.count = 0
+        self.bytes = 0
+        self.fields = {}       # field -> records where present
+        self.violations = {}   # field ('' = record) -> count
+        self.samples = {}      # field -> [(record key path, value repr)]
+
+    def fill_rates(self):
+        return {k: v / self.count for k, v in self.fields.items()} if self.count else {}
+
+    def violation(self, field, where, value):
+        self.violations[field] = self.violations.get(field, 0) + 1
+        samples = self.samples.setdefault(field, [])
+        if len(samples) < MAX_VIOLATION_SAMPLES:
+            samples.append((where, repr(value)[:80]))
+
+    def to_dict(self):
+        return {
+            'count': self.count, 'bytes': self.bytes, 'fill_rates': self.fill_rates(),
+            'violations': self.violations, 'samples': self.samples,
+        }
+
+
+class ExportStats:
+    __slots__ = ('source', 'total_bytes', 'elapsed', 'nodes', 'records')
+
+    def __init__(self, source, total_bytes):
+        self.source = str(source)
+        self.total_bytes = total_bytes
+        self.elapsed = 0.0
+        self.nodes = {}    # top-level key -> {'bytes', 'records'}
+        self.records = {}  # record pattern -> RecordStats
+
+    def record(self, pattern):
+        rec = self.records.get(pattern)
+        if rec is None:
+            rec = self.records[pattern] = RecordStats(pattern)
+        return rec
+
+    @property
+    def total_violations(self):
+        return sum(sum(r.violations.values()) for r in self.records.values())
+
+    def to_dict(self):
+        return {
+            'source': self.source, 'total_bytes': self.total_bytes, 'elapsed': self.elapsed,
+            'nodes': self.nodes,
+            'records': {k: v.to_dict() for k, v in self.records.items()},
+        }
+
+
+class _Frame:
+    __slots__ = ('rule', 'start', 'path', 'top', 'keys', 'index')
+
+    def __init__(self, rule, start, path, top, keys=()):
+        self.rule = rule
+        self.start = start
+        self.path = path
+        self.top = top
+        self.keys = keys  # wildcard keys on the way down, as in iter_records()
+        self.index = 0    # next array index, for containers that are arrays
+
+
+def _shape(value):
+    # Value as seen by .validate: containers are only known by their children
+    if isinstance(value, dict):
+        return Children(len(value), value.keys())
+    if isinstance(value, list):
+        return Children(len(value))
+    return value
+
+
+def _add_record(rec, rule, where, value, size):
+    rec.count += 1
+    rec.bytes += size
+    fields = rec.fields
+    names = value if len(value) <= MAX_FIELDS_PER_RECORD else list(value)[:MAX_FIELDS_PER_RECORD]
+    for name in names:
+        fields[name] = fields.get(name, 0) + 1
+    checks, wildcard = rule.field_checks()
+    for name, field in value.items():
+        check = checks.get(name, wildcard)
+        if check is not None:
+            if isinstance(field, (dict, list)):
+                field = _shape(field)
+            if check(field) is False:
+                rec.violation(name, f'{where}/{name}', field)
+    if rule.validate is not None:
+        shape = _shape(value)
+        if rule.validate(shape) is False:
+            rec.violation('', where, shape)
+
+
+def scan_buffer(buf, rules, stats, sink=None):
+    # sink: optional {pattern: callable(pattern, keys, record)}; every record
+    # of those patterns is passed on as iter_records() would yield it, so
+    # other consumers share this pass
+    sink = sink or {}
+    reader = EventReader(buf)
+    frames = []   # open containers that we descend into
+    key = None
+    while True:
+        ev = reader.next_event()
+        if ev is None:
+            break
+        kind, value, start, end = ev
+        if kind == 'map_key':
+            key = value
+            continue
+        if kind in ('end_map', 'end_array'):
+            frame = frames.pop()
+            if len(frames) == 1:
+                stats.nodes[frame.top]['bytes'] += end - frame.start
+            key = None
+            continue
+
+        parent = frames[-1] if frames else None
+        if parent is None:
+            name, child_rule = None, rules
+        else:
+            if key is None:  # array element: RTDB addresses it by index
+                key = str(parent.index)
+                parent.index += 1
+            name, child_rule = key, parent.rule.child(key)
+        key = None
+
+        if kind in ('start_map', 'start_array'):
+            if parent is None:
+                frames.append(_Frame(rules, start, '', None))
+                continue
+            top = parent.top or name
+            if len(frames) == 1:
+                stats.nodes.setdefault(top, {'bytes': 0, 'records': 0})
+            if child_rule is None:
+                # Outside the known schema: only the size matters
+                stop, _ = reader.skip()
+                if len(frames) == 1:
+                    stats.nodes[top]['bytes'] += stop - start
+                continue
+            path = f'{parent.path}/{name}' if parent.path else name
+            keys = parent.keys + (name,) if child_rule.name.startswith('$') else parent.keys
+            record_rule = child_rule.wildcard
+            if record_rule is not None and record_rule.is_record and not child_rule.children:
+                # Container of records: each record is decoded whole (they
+                # are small) and checked against its rules, never descended
+                rec = stats.record(record_rule.pattern)
+                consumer = sink.get(record_rule.pattern)
+                count = 0
+                for rid, record, size in reader.members():
+                    if isinstance(record, dict):
+                        _add_record(rec, record_rule, f'{path}/{rid}', record, size)
+                        if consumer is not None:
+                            consumer(record_rule.pattern, keys + (rid,), record)
+                        count += 1
+                stats.nodes[top]['records'] += count
+                if len(frames) == 1:
+                    stats.nodes[top]['bytes'] += reader.pos - start
+                continue
+            if child_rule.is_record:
+                # A record reached through a mixed (named + wildcard) level
+                rec = stats.record(child_rule.pattern)
+                record = {k: v for k, v, _ in reader.members()}
+                if kind == 'start_map':
+                    _add_record(rec, child_rule, path, record, reader.pos - start)
+                    if child_rule.pattern in sink:
+                        sink[child_rule.pattern](child_rule.pattern, keys, record)
+                    stats.nodes[top]['records'] += 1
+                if len(frames) == 1:
+                    stats.nodes[top]['bytes'] += reader.pos - start
+                continue
+            frames.append(_Frame(child_rule, start, path, top, keys))
+        elif len(frames) == 1:
+            stats.nodes.setdefault(name, {'bytes': 0, 'records': 0})['bytes'] += end - start
+    return stats
+
+
+def scan_export(path, rules_path=RULES_PATH, sink=None):
+    # One pass over a memory-mapped export; nothing but the stats is kept
+    # (and what the sink, see scan_buffer(), keeps of the records)
+    t0 = time.perf_counter()
+    rules = load_rules(rules_path)
+    with open(path, 'rb') as f:
+        size = Path(path).stat().st_size
+        stats = ExportStats(path, size)
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                scan_buffer(buf, rules, stats, sink)
+    stats.elapsed = time.perf_counter() - t0
+    return stats
+
+
+# -- record extraction ---------------------------------------------------------
+
+def _leads_to(rule, patterns):
+    prefix = rule.pattern + '/'
+    return any(p == rule.pattern or p.startswith(prefix) for p in patterns)
+
+
+def _records_in(reader, rule, keys, patterns):
+    # The reader is just past the opening bracket of a container matched by
+    # `rule`; yields the wanted records below it and consumes the container.
+    record_rule = rule.wildcard
+    if record_rule is not None and record_rule.is_record and not rule.children:
+        if record_rule.pattern not in patterns:
+            reader.skip()
+            return
+        for rid, record, _ in reader.members():
+            if isinstance(record, dict):
+                yield record_rule.pattern, keys + (rid,), record
+        return
+    key, index = None, 0
+    while True:
+        kind, value, _, _ = reader.next_event()
+        if kind in ('end_map', 'end_array'):
+            return
+        if kind == 'map_key':
+            key = value
+            continue
+        if key is None:
+            key, index = str(index), index + 1
+        name, key = key, None
+        if kind not in ('start_map', 'start_array'):
+            continue
+        child = rule.child(name)
+        if child is None or not _leads_to(child, patterns):
+            reader.skip()
+            continue
+        child_keys = keys + (name,) if child.name.startswith('$') else keys
+        if child.is_record:
+            record = {k: v for k, v, _ in reader.members()}
+            if kind == 'start_map':
+                yield child.pattern, child_keys, record
+            continue
+        yield from _records_in(reader, child, child_keys, patterns)
+
+
+def iter_records(path, patterns, rules_path=RULES_PATH):
+    # Streams (pattern, wildcard keys, record) for the given record patterns,
+    # e.g. ('messages/$threadId/$messageId', (threadId, messageId), {...}).
+    # Like scan_export(), only one record is decoded at a time.
+    rules = load_rules(rules_path)
+    patterns = frozenset(patterns)
+    with open(path, 'rb') as f:
+        if not Path(path).stat().st_size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            reader = EventReader(buf)
+            event = reader.next_event()
+            if event is not None and event[0] == 'start_map':
+                yield from _records_in(reader, rules, (), patterns)
+
+
+def human_size(n, units=('o', 'Ko', 'Mo', 'Go')):
+    for unit in units:
+        if n < 1024 or unit == units[-1]:
+            return f"{n:.0f} {unit}" if unit == units[0] else f"{n:.1f} {unit}"
+        n /= 1024
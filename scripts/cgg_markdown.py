@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Markdown renderer for generate_cgg_report.py (GitHub-flavoured tables).
+# Images are written next to the report as <stem>.media/<sha256>.png.
+import re
+from pathlib import Path
+
+from cgg_charts import fmt_number
+from cgg_i18n import Messages
+from cgg_model import (
+    Bullet, Chart, CodeBlock, Cover, Definition, Heading, Image, PageBreak, Paragraph, Table, Toc,
+    iter_rows,
+)
+
+CHART_BAR_CHARS = 30
+
+
+def _cell(value):
+    return str(value).replace('|', '\\|').replace('\n', '<br>')
+
+
+def _fence(text):
+    # A backtick fence longer than any backtick run of the listing, which
+    # could otherwise close it
+    return '`' * max([3] + [len(run) + 1 for run in re.findall('`+', text)])
+
+
+def _table(out, node: Table):
+    if node.caption:
+        out.write(f'*{node.caption}*\n\n')
+    out.write('| ' + ' | '.join(_cell(h) for h in node.headers) + ' |\n')
+    out.write('|' + '---|' * len(node.headers) + '\n')
+    for row in iter_rows(node.headers, node.rows):
+        out.write('| ' + ' | '.join(_cell(v) for v in row) + ' |\n')
+    out.write('\n')
+
+
+def _chart(out, node: Chart, msg):
+    # Text rendering of the column chart: one bar per row
+    top = max((float(v) for v in node.values), default=0.0) or 1.0
+    out.write(f'**{node.title}**\n\n| | {_cell(node.unit or msg("chart.value"))} | |\n|---|---|---|\n')
+    for label, value in zip(node.labels, node.values):
+        bar = '█' * round(CHART_BAR_CHARS * max(float(value), 0.0) / top)
+        out.write(f'| {_cell(label)} | {fmt_number(value)} | {bar} |\n')
+    out.write('\n')
+
+
+def _image(out, node: Image, path):
+    # Content-addressed, so a figure used twice is stored once. hashlib is
+    # imported here: reports without figures do not pay for OpenSSL.
+    import hashlib
+
+    path = Path(path)
+    media = path.with_name(path.stem + '.media')
+    name = hashlib.sha256(node.data).hexdigest()[:16] + '.png'
+    media.mkdir(exist_ok=True)
+    if not (media / name).exists():
+        (media / name).write_bytes(node.data)
+    out.write(f'![{node.caption}]({media.name}/{name})\n')
+    if node.caption:
+        out.write(f'\n*{node.caption}*\n')
+    out.write('\n')
+
+
+def _toc(out, node: Toc, headings):
+    # Entries from cgg_paginate.index(), else the headings (contents only)
+    if node.entries is not None:
+        entries = [(level, text) for level, text, _ in node.entries]
+    else:
+        entries = [(level, text) for text, level in headings if 1 <= level <= 3] \
+            if node.kind == 'contents' else []
+    for level, text in entries:
+        out.write(f'{"  " * (level - 1)}- {text}\n')
+    out.write('\n')
+
+
+def render(report, path):
+    headings = [(n.text, n.level) for n in report if type(n) is Heading]
+    msg = Messages(report.locale)
+    with open(path, 'w', encoding='utf-8') as out:
+        for node in report:
+            kind = type(node)
+            if kind is Heading:
+                out.write(f'{"#" * min(max(node.level, 1), 6)} {node.text}\n\n')
+            elif kind is Cover:
+                out.write(f'# {node.title}\n\n**{node.subtitle}**\n\n')
+                out.write(''.join(f'{m}  \n' for m in node.meta))
+                out.write(f'\n**{node.institution}**\n\n---\n\n')
+            elif kind is Toc:
+                _toc(out, node, headings)
+            elif kind is Paragraph:
+                text = node.text
+                if node.bold:
+                    text = f'**{text}**'
+                if node.italic:
+                    text = f'*{text}*'
+                out.write(f'{text}\n\n')
+            elif kind is Bullet:
+                out.write(f'- {node.text}\n\n')
+            elif kind is Definition:
+                out.write(f'- **{node.term}** : {node.text}\n\n')
+            elif kind is Table:
+                _table(out, node)
+            elif kind is CodeBlock:
+                fence = _fence(node.text)
+                out.write(f'{fence}{node.language or ""}\n{node.text}\n{fence}\n\n')
+            elif kind is Chart:
+                _chart(out, node, msg)
+            elif kind is Image:
+                _image(out, node, path)
+            elif kind is PageBreak:
+                out.write('\n')
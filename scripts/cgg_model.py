@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# Intermediate document model for generate_cgg_report.py.
+#
+# add_content() and friends record the report once as a flat list of
+# lightweight nodes; each output format (cgg_docx, cgg_pdf, cgg_html,
+# cgg_markdown) only has to know how to render these node types.
+import importlib
+from collections.abc import Mapping
+
+import cgg_profile
+
+# Output format -> (renderer module, file extension). Renderers expose
+# render(report, path), optionally preload() for long-lived workers, and are
+# imported only in the process that uses them.
+RENDERERS = {
+    'docx': ('cgg_docx', '.docx'),
+    'pdf': ('cgg_pdf', '.pdf'),
+    'html': ('cgg_html', '.html'),
+    'md': ('cgg_markdown', '.md'),
+}
+
+
+class Node:
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, k) == getattr(other, k) for k in self.__slots__
+        )
+
+    def __repr__(self):
+        args = ', '.join(f'{k}={getattr(self, k)!r}' for k in self.__slots__)
+        return f'{type(self).__name__}({args})'
+
+
+class Cover(Node):
+    __slots__ = ('title', 'subtitle', 'meta', 'institution')
+
+    def __init__(self, title, subtitle, meta, institution):
+        self.title = title
+        self.subtitle = subtitle
+        self.meta = list(meta)
+        self.institution = institution
+
+
+class Toc(Node):
+    # Table of contents ('contents') or list of figures/tables. entries are
+    # (level, text, anchor) filled in by cgg_paginate.index(); pages maps an
+    # output format to the page of every entry once paginate() ran. Without
+    # entries a renderer may fall back to a field its viewer computes.
+    __slots__ = ('hint', 'kind', 'entries', 'pages')
+
+    def __init__(self, hint='', kind='contents', entries=None, pages=None):
+        self.hint = hint
+        self.kind = kind
+        self.entries = entries
+        self.pages = dict(pages or {})
+
+
+class Heading(Node):
+    # anchor: link target (bookmark, id) set by cgg_paginate.index()
+    __slots__ = ('text', 'level', 'anchor')
+
+    def __init__(self, text, level, anchor=None):
+        self.text = text
+        self.level = level
+        self.anchor = anchor
+
+
+class Paragraph(Node):
+    __slots__ = ('text', 'bold', 'italic', 'align')
+
+    def __init__(self, text, bold=False, italic=False, align='left'):
+        self.text = text
+        self.bold = bold
+        self.italic = italic
+        self.align = align
+
+
+class Bullet(Node):
+    __slots__ = ('text', 'marker')
+
+    def __init__(self, text, marker='•'):
+        self.text = text
+        self.marker = marker
+
+
+class Definition(Node):
+    __slots__ = ('term', 'text')
+
+    def __init__(self, term, text):
+        self.term = term
+        self.text = text
+
+
+class Table(Node):
+    __slots__ = ('headers', 'rows', 'col_widths_pt', 'caption', 'anchor')
+
+    def __init__(self, headers, rows, col_widths_pt=None, caption='', anchor=None):
+        self.headers = list(headers)
+        # Renderers may each iterate the rows (possibly in other processes),
+        # so one-shot iterators are materialized; columnar batches are kept.
+        if not isinstance(rows, (list, tuple, Mapping)):
+            rows = list(rows)
+        self.rows = rows
+        self.col_widths_pt = list(col_widths_pt) if col_widths_pt else None
+        self.caption = caption
+        self.anchor = anchor
+
+
+class CodeBlock(Node):
+    __slots__ = ('text', 'language')
+
+    def __init__(self, text, language=None):
+        self.text = text
+        self.language = language
+
+
+class Chart(Node):
+    # Column chart; cgg_charts lays it out for every format
+    __slots__ = ('title', 'labels', 'values', 'unit')
+
+    def __init__(self, title, labels, values, unit=''):
+        self.title = title
+        self.labels = list(labels)
+        self.values = list(values)
+        self.unit = unit
+
+
+class Image(Node):
+    # Raster figure (PNG bytes) scaled to width_pt, or to the text width
+    __slots__ = ('data', 'width_pt', 'caption', 'anchor')
+
+    def __init__(self, data, width_pt=None, caption='', anchor=None):
+        self.data = bytes(data)
+        self.width_pt = width_pt
+        self.caption = caption
+        self.anchor = anchor
+
+
+class PageBreak(Node):
+    __slots__ = ()
+
+
+def iter_rows(headers, rows):
+    # Accepts an iterable of row sequences or a columnar batch {header: column}
+    if isinstance(rows, Mapping):
+        return zip(*(rows[h] for h in headers))
+    return iter(rows)
+
+
+class Report:
+    # Builder used by add_content(); keeps the nodes in document order.
+    # The first `skeleton` nodes (the cover) do not depend on report data;
+    # renderers may serve them from a prebuilt template. pages: estimated
+    # page count per output format (cgg_paginate.paginate()). locale: language
+    # of the text, declared in the output files. cache_sections: the report
+    # is rebuilt often enough for cgg_docx to cache its sections on disk
+    # (the platform report, not one-off artist reports).
+
+    __slots__ = ('title', 'nodes', 'skeleton', 'pages', 'locale', 'cache_sections')
+
+    def __init__(self, title='', locale='fr', cache_sections=False):
+        self.title = title
+        self.locale = locale
+        self.cache_sections = cache_sections
+        self.nodes = []
+        self.skeleton = 0
+        self.pages = {}
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, node):
+        self.nodes.append(node)
+        return node
+
+    def mark_skeleton(self):
+        self.skeleton = len(self.nodes)
+
+    def cover(self, title, subtitle, meta, institution):
+        return self.add(Cover(title, subtitle, meta, institution))
+
+    def toc(self, hint='', kind='contents'):
+        return self.add(Toc(hint, kind))
+
+    def heading(self, text, level=1):
+        return self.add(Heading(text, level))
+
+    def paragraph(self, text, bold=False, italic=False, align='left'):
+        return self.add(Paragraph(text, bold, italic, align))
+
+    def bullet(self, text, marker='•'):
+        return self.add(Bullet(text, marker))
+
+    def definition(self, term, text):
+        return self.add(Definition(term, text))
+
+    def table(self, headers, rows, col_widths_pt=None, caption=''):
+        return self.add(Table(headers, rows, col_widths_pt, caption))
+
+    def code(self, text, language=None):
+        return self.add(CodeBlock(text, language))
+
+    def chart(self, title, labels, values, unit=''):
+        return self.add(Chart(title, labels, values, unit))
+
+    def image(self, data, width_pt=None, caption=''):
+        return self.add(Image(data, width_pt, caption))
+
+    def page_break(self):
+        return self.add(PageBreak())
+
+
+def renderer(fmt):
+    return importlib.import_module(RENDERERS[fmt][0])
+
+
+def preload(fmt):
+    hook = getattr(renderer(fmt), 'preload', None)
+    if hook is not None:
+        hook()
+
+
+def render(fmt, report, path):
+    with cgg_profile.span(f'render {fmt}', 'render'):
+        renderer(fmt).render(report, path)
+    return path
+
+
+def render_profiled(fmt, report, path):
+    # render() in a worker process with profiling on -> (path, events)
+    cgg_profile.enable()
+    try:
+        render(fmt, report, path)
+    finally:
+        events = cgg_profile.disable()
+    return path, events
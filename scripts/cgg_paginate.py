@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# Table of contents, lists of figures and tables, and page numbers for
+# generate_cgg_report.py without an office suite.
+#
+# index() gives every heading (down to TOC_LEVELS) and every captioned
+# figure and table an anchor, and fills the Toc nodes with their entries.
+# paginate() then lays the report out with the PDF renderer's engine and
+# font metrics, without writing anything, and records the page of every
+# anchor: exact for the PDF, an estimate of Word's layout for the DOCX
+# (DOCX_METRICS mirrors the spacing of cgg_docx's template). Renderers
+# write the entries as static, hyperlinked lines; a report that was not
+# paginated keeps the Word fields.
+import zlib
+
+from cgg_model import Heading, Image, Table, Toc
+
+TOC_LEVELS = 3
+PAGINATED = ('pdf', 'docx')
+
+# Word's layout of the python-docx template, in the terms of cgg_pdf.Metrics:
+# 1.25 in side margins, 10 pt after paragraphs, 1.15 line spacing (Times New
+# Roman's line is 1.107 em), single-spaced 12 pt table cells with 0.08 in
+# padding, 24/10 pt before headings, and the empty paragraphs python-docx
+# leaves after tables and page breaks.
+DOCX_METRICS = dict(
+    margin_x=90.0, margin_y=72.0,
+    leading=1.273, space_after=10.0,
+    heading_before={1: 24.0, 2: 10.0, 3: 10.0, 4: 10.0}, heading_after=0.0,
+    table_size=12, table_leading=1.107, cell_pad_x=5.76, cell_pad_y=0.0, after_table=2 * 12 * 1.273 + 10,
+    code_leading=1.133, break_line=12 * 1.273,
+)
+
+
+def _anchor(prefix, key, used):
+    # Derived from the entry rather than its position, so that editing one
+    # section leaves the anchors (and the DOCX section cache) of the others alone
+    n = zlib.crc32(key.encode('utf-8')) & 0x7FFFFFFF
+    while n in used:
+        n = (n + 1) & 0x7FFFFFFF
+    used.add(n)
+    return f'{prefix}{n:010d}'
+
+
+def anchor_id(anchor):
+    # Numeric id of an anchor (DOCX bookmark ids)
+    return int(anchor[4:])
+
+
+def index(report):
+    entries = {'contents': [], 'figures': [], 'tables': []}
+    used, seen = set(), {}
+    for node in report.nodes[report.skeleton:]:
+        kind = type(node)
+        if kind is Heading and node.level <= TOC_LEVELS:
+            target, prefix, text, level = 'contents', '_Toc', node.text, node.level
+        elif kind in (Image, Table) and node.caption:
+            target = 'figures' if kind is Image else 'tables'
+            prefix, text, level = '_Ref', node.caption, 1
+        else:
+            continue
+        key = f'{target}\0{text}'
+        seen[key] = seen.get(key, 0) + 1
+        node.anchor = _anchor(prefix, f'{key}\0{seen[key]}', used)
+        entries[target].append((level, text, node.anchor))
+    for node in report.nodes:
+        if type(node) is Toc:
+            node.entries = entries[node.kind]
+            node.pages = {}
+    return report
+
+
+def paginate(report, formats=PAGINATED):
+    # Page of every anchored entry and page count, per paginated format.
+    # cgg_pdf (and reportlab) is only imported when there is one.
+    for fmt in formats:
+        if fmt not in PAGINATED:
+            continue
+        import cgg_pdf
+
+        metrics = cgg_pdf.Metrics(**DOCX_METRICS) if fmt == 'docx' else cgg_pdf.Metrics()
+        pages, anchors = cgg_pdf.layout(report, metrics)
+        report.pages[fmt] = pages
+        for node in report.nodes:
+            if type(node) is Toc and node.entries is not None:
+                node.pages[fmt] = [anchors.get(anchor) for _, _, anchor in node.entries]
+    return report
@@ -0,0 +1,699 @@
+# -*- coding: utf-8 -*-
+# Streaming PDF backend for generate_cgg_report.py.
+#
+# Layout uses reportlab's metrics for the standard Type 1 fonts; pages are
+# written to the output file as soon as they are laid out, so only object
+# offsets stay in memory and 500+ page reports render in flat memory.
+# layout() runs the same engine without output to paginate a report
+# (cgg_paginate), optionally with other Metrics.
+import hashlib
+import re
+import struct
+import zlib
+from bisect import bisect_right
+from functools import lru_cache
+from io import BytesIO
+from itertools import accumulate
+
+from reportlab.lib.pagesizes import LETTER
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+import cgg_charts
+import cgg_profile
+from cgg_model import (
+    Bullet, Chart, CodeBlock, Cover, Definition, Heading, Image, PageBreak, Paragraph, Table, Toc,
+    iter_rows,
+)
+
+BLUE = (0x1F / 255, 0x4E / 255, 0x79 / 255)
+BLACK = (0, 0, 0)
+WHITE = (1, 1, 1)
+
+# (family, bold, italic) -> (resource name, base font)
+FONTS = {
+    ('Times', False, False): ('F1', 'Times-Roman'),
+    ('Times', True, False): ('F2', 'Times-Bold'),
+    ('Times', False, True): ('F3', 'Times-Italic'),
+    ('Times', True, True): ('F4', 'Times-BoldItalic'),
+    ('Courier', False, False): ('F5', 'Courier'),
+    ('Courier', True, False): ('F6', 'Courier-Bold'),
+    ('Courier', False, True): ('F7', 'Courier-Oblique'),
+    ('Courier', True, True): ('F8', 'Courier-BoldOblique'),
+}
+
+HEADING_SIZES = {0: 24, 1: 16, 2: 14, 3: 12, 4: 12}
+BODY_SIZE = 12
+TABLE_SIZE = 10
+CODE_SIZE = 9
+LEADING = 1.2
+CELL_PAD = 3
+
+TOC_INDENT = 18.0
+_TOKEN = re.compile(r'\n|[ \t]+|[^\s]+')
+
+
+class Metrics:
+    # Spacing of the flow layout; the defaults are the PDF's own
+    __slots__ = ('margin_x', 'margin_y', 'leading', 'space_after', 'heading_before', 'heading_after',
+                 'table_size', 'table_leading', 'cell_pad_x', 'cell_pad_y', 'after_table',
+                 'code_leading', 'break_line')
+
+    def __init__(self, margin_x=inch, margin_y=inch, leading=LEADING, space_after=6.0,
+                 heading_before=None, heading_after=6.0, table_size=TABLE_SIZE, table_leading=LEADING,
+                 cell_pad_x=CELL_PAD, cell_pad_y=CELL_PAD, after_table=6.0, code_leading=LEADING,
+                 break_line=0.0):
+        self.margin_x = margin_x
+        self.margin_y = margin_y
+        self.leading = leading
+        self.space_after = space_after
+        self.heading_before = heading_before or {0: 12.0, 1: 12.0}
+        self.heading_after = heading_after
+        self.table_size = table_size
+        self.table_leading = table_leading
+        self.cell_pad_x = cell_pad_x
+        self.cell_pad_y = cell_pad_y
+        self.after_table = after_table
+        self.code_leading = code_leading
+        self.break_line = break_line  # empty line left at the top of a page after a break
+
+
+class Style:
+    __slots__ = ('family', 'bold', 'italic', 'size', 'color')
+
+    def __init__(self, family='Times', bold=False, italic=False, size=BODY_SIZE, color=BLACK):
+        self.family = family
+        self.bold = bold
+        self.italic = italic
+        self.size = size
+        self.color = color
+
+    @property
+    def font(self):
+        return FONTS[(self.family, self.bold, self.italic)]
+
+    def with_(self, **kw):
+        st = Style(self.family, self.bold, self.italic, self.size, self.color)
+        for k, v in kw.items():
+            setattr(st, k, v)
+        return st
+
+
+NORMAL = Style()
+CODE = Style('Courier', size=CODE_SIZE)
+
+
+# The standard Type1 fonts only draw WinAnsi (cp1252): the characters of
+# the report text outside it are spelled out instead of becoming '?'
+WINANSI_SUBSTITUTES = str.maketrans({
+    '≥': '>=', '≤': '<=', '≠': '!=', '−': '-', '→': '->', '←': '<-', '⇒': '=>',
+    '\u2009': ' ', '\u202f': ' ', '\u2011': '-',
+})
+
+
+@lru_cache(maxsize=65536)
+def _unit_width(text, base_font):
+    return stringWidth(text.translate(WINANSI_SUBSTITUTES), base_font, 1.0)
+
+
+def text_width(text, style: Style):
+    return _unit_width(text, style.font[1]) * style.size
+
+
+def _pdf_string(text):
+    raw = text.translate(WINANSI_SUBSTITUTES).encode('cp1252', errors='replace')
+    return b'(' + raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _text_string(text):
+    # Document text strings (Info entries) are PDFDocEncoding, not WinAnsi:
+    # UTF-16BE with a byte order mark keeps every character
+    return b'<FEFF' + text.encode('utf-16-be').hex().upper().encode('ascii') + b'>'
+
+
+def _num(v):
+    return f'{v:.2f}'.rstrip('0').rstrip('.')
+
+
+def _color(rgb255):
+    return tuple(c / 255 for c in rgb255)
+
+
+def _png_image(data):
+    # -> (width, height, stream dictionary entries, stream data, compress).
+    # 8-bit grey/RGB and opaque palette non-interlaced PNGs are embedded as
+    # is: their IDAT is a zlib stream with per-row filters, i.e. FlateDecode
+    # with the PNG predictors. Anything else is decoded with Pillow.
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        width, height, depth, kind, _, _, interlace = struct.unpack('>IIBBBBB', data[16:29])
+        chunks, pos = {}, 8
+        while pos < len(data):
+            length, tag = struct.unpack('>I4s', data[pos:pos + 8])
+            chunks.setdefault(tag, []).append(data[pos + 8:pos + 8 + length])
+            pos += length + 12
+        colors = {0: 1, 2: 3, 3: 1}.get(kind)
+        if kind == 3:
+            palette = b''.join(chunks.get(b'PLTE', []))
+            space = f'[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]'
+            passthrough = palette and b'tRNS' not in chunks
+        else:
+            space = '/DeviceGray' if colors == 1 else '/DeviceRGB'
+            passthrough = depth == 8
+        if colors and passthrough and not interlace:
+            return (width, height,
+                    f'/ColorSpace {space} /BitsPerComponent {depth} /Filter /FlateDecode '
+                    f'/DecodeParms << /Predictor 15 /Colors {colors} /BitsPerComponent {depth} '
+                    f'/Columns {width} >>', b''.join(chunks[b'IDAT']), False)
+    from PIL import Image as PILImage
+
+    image = PILImage.open(BytesIO(data))
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = PILImage.new('RGB', image.size, 'white')
+        background.paste(image.convert('RGBA'), mask=image.convert('RGBA').split()[-1])
+        image = background
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    space = '/DeviceGray' if image.mode == 'L' else '/DeviceRGB'
+    return image.width, image.height, f'/ColorSpace {space} /BitsPerComponent 8', image.tobytes(), True
+
+
+def wrap_runs(runs, width):
+    # Greedy line breaking over styled runs; returns lists of (text, style, width)
+    lines = []
+    line = []
+    x = 0.0
+    space = None
+    for text, st in runs:
+        for tok in _TOKEN.findall(text):
+            if tok == '\n':
+                lines.append(line)
+                line, x, space = [], 0.0, None
+                continue
+            if tok[0] in ' \t':
+                if line:
+                    space = st
+                continue
+            w = text_width(tok, st)
+            sw = text_width(' ', space) if space is not None and line else 0.0
+            if line and x + sw + w > width:
+                lines.append(line)
+                line, x, sw = [], 0.0, 0.0
+            # Words wider than the frame are broken at character level: the
+            # widths of its prefixes are summed once, each cut is a bisection
+            if w > width and len(tok) > 1:
+                ends = list(accumulate((text_width(c, st) for c in tok), initial=0.0))
+                start = 0
+                while ends[-1] - ends[start] > width and len(tok) - start > 1:
+                    cut = max(start + 1, bisect_right(ends, ends[start] + width - x, start + 1, len(tok)) - 1)
+                    line.append((tok[start:cut], st, text_width(tok[start:cut], st)))
+                    lines.append(line)
+                    line, x, sw = [], 0.0, 0.0
+                    start = cut
+                tok = tok[start:]
+                w = text_width(tok, st)
+            if sw:
+                line.append((' ', space, sw))
+                x += sw
+            line.append((tok, st, w))
+            x += w
+            space = None
+    lines.append(line)
+    return lines
+
+
+def _line_height(line, default_size, leading=LEADING):
+    return max((st.size for _, st, _ in line), default=default_size) * leading
+
+
+def _image_size(data):
+    # -> (width, height) in pixels, from the PNG header when possible
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return struct.unpack('>II', data[16:24])
+    from PIL import Image as PILImage
+
+    return PILImage.open(BytesIO(data)).size
+
+
+class _PdfFile:
+    # Minimal incremental PDF object writer: objects go straight to disk
+
+    def __init__(self, path):
+        self._f = open(path, 'wb')
+        self._offsets = {}
+        self._next_id = 1
+        self._f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def reserve(self):
+        oid = self._next_id
+        self._next_id += 1
+        return oid
+
+    def write_obj(self, oid, body):
+        if isinstance(body, str):
+            body = body.encode('latin-1')
+        self._offsets[oid] = self._f.tell()
+        self._f.write(b'%d 0 obj\n' % oid + body + b'\nendobj\n')
+
+    def write_stream(self, oid, entries, data, compress=True):
+        if compress:
+            data = zlib.compress(data, 6)
+            entries += ' /Filter /FlateDecode'
+        self.write_obj(oid, f'<< {entries} /Length {len(data)} >>\nstream\n'.encode('latin-1')
+                       + data + b'\nendstream')
+
+    def close(self, root_id, info_id):
+        xref_at = self._f.tell()
+        count = self._next_id
+        out = [b'xref\n0 %d\n' % count, b'0000000000 65535 f \n']
+        for oid in range(1, count):
+            out.append(b'%010d 00000 n \n' % self._offsets.get(oid, 0))
+        out.append(b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                   % (count, root_id, info_id, xref_at))
+        self._f.write(b''.join(out))
+        self._f.close()
+
+
+class PdfReport:
+    # Flow layout: headings, styled paragraphs, tables and code blocks.
+    # Each page is flushed to disk by _end_page() as soon as it is full.
+    # With path None nothing is written: the layout only records the page
+    # count and where the anchors fall.
+
+    def __init__(self, path, pagesize=LETTER, title='', first_page_footer=False, metrics=None, lang=''):
+        self.m = metrics or Metrics()
+        self._lang = lang
+        self.width, self.height = pagesize
+        self.margin_x, self.margin_y = self.m.margin_x, self.m.margin_y
+        self.frame_width = self.width - 2 * self.margin_x
+        self.first_page_footer = first_page_footer
+        self.anchors = {}  # anchor -> (page number, y)
+        self._title = title
+        self._kids = []
+        self._ops = None
+        self._y = 0.0
+        self._page_fonts = set()
+        self._images = {}  # sha256 -> (resource name, object id, width, height)
+        self._page_images = set()
+        self._page_links = []
+        self._pdf = None
+        if path is None:
+            return
+        self._pdf = _PdfFile(path)
+        self._pages_id = self._pdf.reserve()
+        self._total_id = self._pdf.reserve()
+        self._font_ids = {}
+        for name, base in FONTS.values():
+            oid = self._pdf.reserve()
+            self._font_ids[name] = oid
+            self._pdf.write_obj(oid, f'<< /Type /Font /Subtype /Type1 /BaseFont /{base} '
+                                     f'/Encoding /WinAnsiEncoding >>')
+
+    # -- page management -------------------------------------------------
+
+    @property
+    def page_number(self):
+        return len(self._kids) + (1 if self._ops is not None else 0)
+
+    def _begin_page(self):
+        self._ops = []
+        self._page_fonts = set()
+        self._page_images = set()
+        self._page_links = []
+        self._y = self.height - self.margin_y
+
+    def _end_page(self):
+        if self._ops is None:
+            return
+        if self._pdf is None:
+            self._kids.append(None)
+            self._ops = None
+            return
+        number = len(self._kids) + 1
+        if number > 1 or self.first_page_footer:
+            self._draw_footer(number)
+        content_id = self._pdf.reserve()
+        self._pdf.write_stream(content_id, '', '\n'.join(self._ops).encode('latin-1'))
+        fonts = ' '.join(f'/{n} {self._font_ids[n]} 0 R' for n in sorted(self._page_fonts))
+        images = ''.join(f' /{n} {oid} 0 R' for n, oid in sorted(self._page_images))
+        links = ''.join(
+            f'<< /Type /Annot /Subtype /Link /Border [0 0 0] /Rect [{" ".join(_num(v) for v in rect)}] '
+            f'/Dest /{anchor} >>' for rect, anchor in self._page_links
+        )
+        page_id = self._pdf.reserve()
+        self._pdf.write_obj(
+            page_id,
+            f'<< /Type /Page /Parent {self._pages_id} 0 R '
+            f'/MediaBox [0 0 {_num(self.width)} {_num(self.height)}] /Contents {content_id} 0 R '
+            f'/Resources << /Font << {fonts} >> /XObject << /Tot {self._total_id} 0 R{images} >> >>'
+            + (f' /Annots [{links}]' if links else '') + ' >>'
+        )
+        self._kids.append(page_id)
+        self._ops = None
+
+    def _draw_footer(self, number):
+        st = NORMAL.with_(size=10)
+        label = f'Page {number} / '
+        x = self.width - self.margin_x - text_width(label + '000', st)
+        self._draw_text(x, self.margin_y / 2, label, st)
+        self._ops.append(f'q 1 0 0 1 {_num(x + text_width(label, st))} {_num(self.margin_y / 2)} cm '
+                         f'/Tot Do Q')
+
+    def _ensure(self, height):
+        # Start a new page unless `height` points still fit above the bottom margin
+        if self._ops is None:
+            self._begin_page()
+        elif self._y - height < self.margin_y:
+            self._end_page()
+            self._begin_page()
+
+    def page_break(self):
+        if self._ops is None:
+            self._begin_page()
+        self._end_page()
+        self._begin_page()
+        self._y -= self.m.break_line
+
+    def _mark(self, anchor):
+        if anchor:
+            self.anchors[anchor] = (self.page_number, self._y)
+
+    # -- drawing primitives ----------------------------------------------
+
+    def _draw_text(self, x, y, text, st):
+        name = st.font[0]
+        self._page_fonts.add(name)
+        r, g, b = st.color
+        self._ops.append(
+            f'BT /{name} {_num(st.size)} Tf {_num(r)} {_num(g)} {_num(b)} rg '
+            f'1 0 0 1 {_num(x)} {_num(y)} Tm {_pdf_string(text).decode("latin-1")} Tj ET'
+        )
+
+    def _draw_line_fragments(self, x, baseline, line):
+        # Merge adjacent fragments of the same style into one text show
+        buf, buf_st, buf_x = [], None, x
+        for text, st, w in line:
+            if buf and st is not buf_st:
+                self._draw_text(buf_x, baseline, ''.join(buf), buf_st)
+                buf_x = x
+                buf = []
+            if not buf:
+                buf_st = st
+            buf.append(text)
+            x += w
+        if buf:
+            self._draw_text(buf_x, baseline, ''.join(buf), buf_st)
+
+    def _rect(self, x, y, w, h, fill=None, stroke=True):
+        if fill is not None:
+            r, g, b = fill
+            self._ops.append(f'{_num(r)} {_num(g)} {_num(b)} rg {_num(x)} {_num(y)} '
+                             f'{_num(w)} {_num(h)} re f')
+        if stroke:
+            self._ops.append(f'0.5 w 0 0 0 RG {_num(x)} {_num(y)} {_num(w)} {_num(h)} re S')
+
+    # -- flow content ----------------------------------------------------
+
+    def paragraph(self, runs, align='left', space_before=0.0, space_after=None, indent=0.0,
+                  keep_with_next=0.0, anchor=None):
+        if isinstance(runs, str):
+            runs = [(runs, NORMAL)]
+        base = max((st.size for _, st in runs), default=BODY_SIZE)
+        width = self.frame_width - indent
+        lines = wrap_runs(runs, width)
+        leading = self.m.leading
+        first = _line_height(lines[0], base, leading)
+        self._ensure(space_before + first + keep_with_next)
+        if self._y < self.height - self.margin_y:
+            self._y -= space_before
+        self._mark(anchor)
+        for line in lines:
+            lh = _line_height(line, base, leading)
+            self._ensure(lh)
+            self._y -= lh
+            if line:
+                used = sum(w for _, _, w in line)
+                x = self.margin_x + indent
+                if align == 'center':
+                    x += (width - used) / 2
+                elif align == 'right':
+                    x += width - used
+                self._draw_line_fragments(x, self._y + lh - base, line)
+        self._y -= self.m.space_after if space_after is None else space_after
+
+    def heading(self, text, level=1, anchor=None):
+        size = HEADING_SIZES.get(level, BODY_SIZE)
+        st = Style(bold=True, size=size, color=BLUE)
+        self.paragraph([(text, st)], space_before=self.m.heading_before.get(level, 8.0),
+                       space_after=self.m.heading_after, keep_with_next=3 * BODY_SIZE * LEADING,
+                       anchor=anchor)
+
+    def toc(self, entries, pages=None):
+        # One line per (level, text, anchor) entry: the text, dot leaders and
+        # the page number (when known) right-aligned, linked to the anchor
+        number_w = text_width('0000', NORMAL)
+        dot_w = text_width(' .', NORMAL)
+        lh = BODY_SIZE * self.m.leading
+        for i, (level, text, anchor) in enumerate(entries):
+            page = pages[i] if pages and pages[i] is not None else None
+            indent = TOC_INDENT * (max(level, 1) - 1)
+            lines = wrap_runs([(text, NORMAL)], self.frame_width - indent - number_w - dot_w)
+            for n, line in enumerate(lines):
+                self._ensure(lh)
+                self._y -= lh
+                x = self.margin_x + indent
+                baseline = self._y + lh - BODY_SIZE
+                self._draw_line_fragments(x, baseline, line)
+                if n == len(lines) - 1 and page is not None:
+                    label = str(page)
+                    right = self.margin_x + self.frame_width
+                    start = x + sum(w for _, _, w in line)
+                    dots = int((right - text_width(label, NORMAL) - start) // dot_w) - 1
+                    if dots > 0:
+                        self._draw_text(right - text_width(label, NORMAL) - (dots + 1) * dot_w,
+                                        baseline, ' .' * dots, NORMAL)
+                    self._draw_text(right - text_width(label, NORMAL), baseline, label, NORMAL)
+                if anchor:
+                    self._page_links.append(((x, self._y, self.margin_x + self.frame_width, self._y + lh),
+                                             anchor))
+
+    def code(self, text):
+        lh = CODE_SIZE * self.m.code_leading
+        cols = max(1, int(self.frame_width // text_width('M', CODE)))
+        self._ensure(lh)
+        for raw in text.splitlines() or ['']:
+            raw = raw.expandtabs(4)
+            for i in range(0, max(len(raw), 1), cols):
+                self._ensure(lh)
+                self._y -= lh
+                if raw:
+                    self._draw_text(self.margin_x, self._y + lh - CODE_SIZE, raw[i:i + cols], CODE)
+        self._y -= 6
+
+    def chart(self, node):
+        # Vector drawing of the cgg_charts layout, centred in the frame
+        w, h = cgg_charts.WIDTH, cgg_charts.HEIGHT
+        self._ensure(h + 6)
+        left = self.margin_x + max(0.0, (self.frame_width - w) / 2)
+        top = self._y
+        for op in cgg_charts.layout(node, w, h):
+            if op[0] == 'rect':
+                _, x, y, rw, rh, color = op
+                self._rect(left + x, top - y - rh, rw, rh, fill=_color(color), stroke=False)
+            elif op[0] == 'line':
+                _, xa, ya, xb, yb, color = op
+                r, g, b = _color(color)
+                self._ops.append(f'0.5 w {_num(r)} {_num(g)} {_num(b)} RG {_num(left + xa)} '
+                                 f'{_num(top - ya)} m {_num(left + xb)} {_num(top - yb)} l S')
+            else:
+                _, x, y, text, size, anchor, color = op
+                st = NORMAL.with_(size=size, color=_color(color))
+                if anchor != 'start':
+                    x -= text_width(text, st) / (2 if anchor == 'middle' else 1)
+                self._draw_text(left + x, top - y, text, st)
+        self._y -= h + self.m.space_after
+
+    def image(self, data, width_pt=None, caption='', anchor=None):
+        # Raster figure, centred and scaled to width_pt (at most the frame
+        # width); identical images are embedded once per document
+        key = hashlib.sha256(data).hexdigest()
+        if key not in self._images:
+            if self._pdf is None:
+                pw, ph = _image_size(data)
+                oid = None
+            else:
+                pw, ph, entries, stream, compress = _png_image(data)
+                oid = self._pdf.reserve()
+                self._pdf.write_stream(oid, f'/Type /XObject /Subtype /Image /Width {pw} /Height {ph} '
+                                            f'{entries}', stream, compress=compress)
+            self._images[key] = (f'Im{len(self._images) + 1}', oid, pw, ph)
+        name, oid, pw, ph = self._images[key]
+        w = min(width_pt or self.frame_width, self.frame_width)
+        h = min(w * ph / pw, self.height - 2 * self.margin_y - BODY_SIZE * 2)
+        w = h * pw / ph
+        self._ensure(h + 6)
+        self._mark(anchor)
+        self._page_images.add((name, oid))
+        x = self.margin_x + (self.frame_width - w) / 2
+        self._ops.append(f'q {_num(w)} 0 0 {_num(h)} {_num(x)} {_num(self._y - h)} cm /{name} Do Q')
+        self._y -= h + self.m.space_after
+        if caption:
+            self.paragraph([(caption, NORMAL.with_(italic=True, size=10))], align='center')
+
+    def table(self, headers, rows, col_widths_pt=None, caption='', anchor=None):
+        ncols = len(headers)
+        if col_widths_pt:
+            scale = min(1.0, self.frame_width / float(sum(col_widths_pt)))
+            widths = [w * scale for w in col_widths_pt]
+        else:
+            widths = [self.frame_width / ncols] * ncols
+        size, pad_x, pad_y = self.m.table_size, self.m.cell_pad_x, self.m.cell_pad_y
+        body_st = NORMAL.with_(size=size)
+        head_st = body_st.with_(bold=True, color=WHITE)
+        lh = size * self.m.table_leading
+
+        def cell_lines(row, st):
+            # Same failure as cgg_docx._row_xml() for a row too wide
+            if len(row) > ncols:
+                raise ValueError(f"Row has {len(row)} cells, table has {ncols} columns: {row!r}")
+            cells = [str(v) for v in row] + [''] * (ncols - len(row))
+            return [wrap_runs([(c, st)], w - 2 * pad_x) for c, w in zip(cells, widths)]
+
+        header = cell_lines(headers, head_st)
+        header_count = max(len(c) for c in header)
+        header_h = header_count * lh + 2 * pad_y
+
+        def draw_row(cells, start, count, fill=None):
+            h = count * lh + 2 * pad_y
+            x = self.margin_x
+            top = self._y
+            for lines, w in zip(cells, widths):
+                self._rect(x, top - h, w, h, fill=fill)
+                y = top - pad_y
+                for line in lines[start:start + count]:
+                    y -= lh
+                    self._draw_line_fragments(x + pad_x, y + lh - size, line)
+                x += w
+            self._y -= h
+
+        def new_page_with_header():
+            self._end_page()
+            self._begin_page()
+            draw_row(header, 0, header_count, fill=BLUE)
+
+        if caption:
+            # Caption above the table, kept with its header and first row
+            self.paragraph([(caption, NORMAL.with_(italic=True, size=10))], align='center',
+                           keep_with_next=header_h + lh + 2 * pad_y, anchor=anchor)
+        self._ensure(header_h + lh + 2 * pad_y)
+        if not caption:
+            self._mark(anchor)
+        draw_row(header, 0, header_count, fill=BLUE)
+        page_lines = int((self.height - 2 * self.margin_y - header_h - 2 * pad_y) // lh)
+        for row in iter_rows(headers, rows):
+            cells = cell_lines(row, body_st)
+            total = max(len(c) for c in cells)
+            start = 0
+            while start < total:
+                avail = int((self._y - self.margin_y - 2 * pad_y) // lh)
+                # Keep short rows whole; split rows taller than a full page
+                if avail < 1 or (start == 0 and total <= page_lines and total > avail):
+                    new_page_with_header()
+                    continue
+                count = min(total - start, avail)
+                draw_row(cells, start, count)
+                start += count
+        self._y -= self.m.after_table
+
+    # -- output ----------------------------------------------------------
+
+    def close(self):
+        if self._ops is not None or not self._kids:
+            if self._ops is None:
+                self._begin_page()
+            self._end_page()
+        pdf = self._pdf
+        if pdf is None:
+            return
+        total = str(len(self._kids))
+        st = NORMAL.with_(size=10)
+        pdf.write_stream(
+            self._total_id,
+            f'/Type /XObject /Subtype /Form /BBox [0 -5 {_num(text_width(total, st) + 1)} 15] '
+            f'/Resources << /Font << /F1 {self._font_ids["F1"]} 0 R >> >>',
+            f'BT /F1 10 Tf 0 0 0 rg 0 0 Td ({total}) Tj ET'.encode('latin-1'),
+        )
+        kids = ' '.join(f'{k} 0 R' for k in self._kids)
+        pdf.write_obj(self._pages_id, f'<< /Type /Pages /Kids [{kids}] /Count {len(self._kids)} >>')
+        # Named destinations of the anchors, for the links of the TOC lines
+        dests = ' '.join(f'/{anchor} [{self._kids[page - 1]} 0 R /XYZ null {_num(y)} null]'
+                         for anchor, (page, y) in self.anchors.items())
+        root_id = pdf.reserve()
+        lang = f' /Lang ({self._lang})' if self._lang else ''
+        pdf.write_obj(root_id, f'<< /Type /Catalog /Pages {self._pages_id} 0 R /Dests << {dests} >>{lang} >>')
+        info_id = pdf.reserve()
+        pdf.write_obj(info_id, b'<< /Producer (generate_cgg_report) /Title '
+                      + _text_string(self._title) + b' >>')
+        pdf.close(root_id, info_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _cover(pdf: PdfReport, node: Cover):
+    pdf.paragraph('\n\n\n\n', space_after=0)
+    pdf.paragraph([(node.title, Style(bold=True, size=24, color=BLUE))], align='center',
+                  space_after=24)
+    pdf.paragraph([(node.subtitle, NORMAL.with_(size=16))], align='center', space_after=24)
+    pdf.paragraph('\n'.join(node.meta), align='center', space_after=24)
+    pdf.paragraph([(node.institution, NORMAL.with_(bold=True))], align='center')
+    pdf.page_break()
+
+
+def _paragraph(pdf: PdfReport, node: Paragraph):
+    pdf.paragraph([(node.text, NORMAL.with_(bold=node.bold, italic=node.italic))], align=node.align)
+
+
+def _bullet(pdf: PdfReport, node: Bullet):
+    if node.marker == '•':
+        pdf.paragraph([('• ', NORMAL.with_(bold=True)), (node.text, NORMAL)])
+    else:
+        pdf.paragraph(f'{node.marker} {node.text}')
+
+
+RENDERERS = {
+    Cover: _cover,
+    # A Toc that was never indexed (cgg_paginate) stays a Word-only field
+    Toc: lambda pdf, n: n.entries and pdf.toc(n.entries, n.pages.get('pdf')),
+    Heading: lambda pdf, n: pdf.heading(n.text, n.level, n.anchor),
+    Paragraph: _paragraph,
+    Bullet: _bullet,
+    Definition: lambda pdf, n: pdf.paragraph(f'• {n.term} : {n.text}'),
+    Table: lambda pdf, n: pdf.table(n.headers, n.rows, n.col_widths_pt, n.caption, n.anchor),
+    CodeBlock: lambda pdf, n: pdf.code(n.text),
+    Chart: lambda pdf, n: pdf.chart(n),
+    Image: lambda pdf, n: pdf.image(n.data, n.width_pt, n.caption, n.anchor),
+    PageBreak: lambda pdf, n: pdf.page_break(),
+}
+
+
+def render(report, path):
+    with PdfReport(path, title=report.title, lang=report.locale) as pdf:
+        profiler = cgg_profile.current()
+        if profiler is None:
+            for node in report:
+                RENDERERS[type(node)](pdf, node)
+        else:
+            profiler.render_nodes(RENDERERS, pdf, report.nodes)
+
+
+def layout(report, metrics=None):
+    # Lays the report out without writing it -> (page count, {anchor: page})
+    pdf = PdfReport(None, title=report.title, metrics=metrics)
+    for node in report:
+        RENDERERS[type(node)](pdf, node)
+    pdf.close()
+    return len(pdf._kids), {anchor: page for anchor, (page, _) in pdf.anchors.items()}
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# Opt-in instrumentation for generate_cgg_report.py (--profile).
+#
+# Steps are recorded as spans with wall time, CPU time, tracemalloc peak and,
+# for the DOCX renderer, the number of XML elements they added. Renderers ask
+# current() for the active Profiler once per document: it is None unless
+# enable() was called in this process, so an unprofiled build only pays that
+# lookup and the shared no-op context of span().
+#
+# Spans from worker processes are returned to the parent as plain dicts and
+# written together as a JSON summary and a Chrome trace-event file
+# (chrome://tracing, Perfetto).
+import json
+import os
+import time
+from contextlib import nullcontext
+
+tracemalloc = None  # imported by enable(): it pulls in pickle and linecache
+_active = None
+_started = False  # tracemalloc was started by enable(), not by the caller
+_NOOP = nullcontext()
+
+
+def current():
+    return _active
+
+
+def enable():
+    # A fresh profiler: a forked worker must not carry its parent's events
+    global _active, _started, tracemalloc
+    import tracemalloc
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started = True
+    _active = Profiler()
+    return _active
+
+
+def disable():
+    # -> the recorded events; tracing started elsewhere (python -X
+    # tracemalloc, a test) is left running
+    global _active, _started
+    profiler, _active = _active, None
+    if profiler is None:
+        return []
+    if _started:
+        tracemalloc.stop()
+        _started = False
+    return profiler.events
+
+
+def span(name, cat='step', elements=None):
+    return _NOOP if _active is None else _active.span(name, cat, elements)
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'cat', 'elements', 'start', 'cpu', 'memory', 'peak', 'count')
+
+    def __init__(self, profiler, name, cat, elements):
+        self.profiler = profiler
+        self.name = name
+        self.cat = cat
+        self.elements = elements
+
+    def __enter__(self):
+        stack = self.profiler._stack
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            # The peak counter is shared: hand what was reached so far to the
+            # enclosing span before restarting it for this one
+            stack[-1].peak = max(stack[-1].peak, peak)
+        tracemalloc.reset_peak()
+        self.memory = current
+        self.peak = current
+        self.count = self.elements() if self.elements is not None else None
+        stack.append(self)
+        self.cpu = time.process_time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        cpu = time.process_time_ns() - self.cpu
+        stack = self.profiler._stack
+        stack.pop()
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, self.peak)
+        self.profiler.events.append({
+            'name': self.name,
+            'cat': self.cat,
+            'pid': os.getpid(),
+            'depth': len(stack),
+            'ts_us': self.start // 1000,
+            'wall_ms': (end - self.start) / 1e6,
+            'cpu_ms': cpu / 1e6,
+            'peak_kib': (self.peak - self.memory) / 1024,
+            'elements': self.elements() - self.count if self.elements is not None else None,
+        })
+        return False
+
+
+class Profiler:
+    __slots__ = ('events', '_stack')
+
+    def __init__(self):
+        self.events = []
+        self._stack = []
+
+    def span(self, name, cat='step', elements=None):
+        # elements: optional callable returning a running count of XML elements
+        return _Span(self, name, cat, elements)
+
+    def render_nodes(self, renderers, target, nodes, elements=None):
+        # The renderer loop with one span per node and one per section
+        # (a level-1 heading and the nodes up to the next one). The open
+        # section is closed even when a renderer raises.
+        section = None
+        try:
+            for node in nodes:
+                kind = type(node)
+                if kind.__name__ == 'Heading' and node.level == 1:
+                    if section is not None:
+                        section.__exit__(None, None, None)
+                        section = None
+                    heading = self.span(node.text, 'section', elements)
+                    heading.__enter__()
+                    section = heading
+                with self.span(kind.__name__, 'node', elements):
+                    renderers[kind](target, node)
+        finally:
+            if section is not None:
+                section.__exit__(None, None, None)
+
+
+def summary(events, process_names=None):
+    # Totals per (process, category, step name); nested spans are included
+    # in their parents
+    names = process_names or {}
+    steps = {}
+    for e in events:
+        process = names.get(e['pid'], str(e['pid']))
+        s = steps.setdefault((process, e['cat'], e['name']), {
+            'process': process, 'cat': e['cat'], 'name': e['name'], 'calls': 0,
+            'wall_ms': 0.0, 'cpu_ms': 0.0, 'peak_kib': 0.0, 'elements': None,
+        })
+        s['calls'] += 1
+        s['wall_ms'] += e['wall_ms']
+        s['cpu_ms'] += e['cpu_ms']
+        s['peak_kib'] = max(s['peak_kib'], e['peak_kib'])
+        if e['elements'] is not None:
+            s['elements'] = (s['elements'] or 0) + e['elements']
+    return sorted(steps.values(), key=lambda s: -s['wall_ms'])
+
+
+def write(events, json_path, trace_path, process_names=None):
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'summary': summary(events, process_names), 'events': events}, f,
+                  ensure_ascii=False, indent=1)
+    trace = [
+        {'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': name}}
+        for pid, name in (process_names or {}).items()
+    ]
+    for e in events:
+        trace.append({
+            'name': e['name'], 'cat': e['cat'], 'ph': 'X', 'pid': e['pid'], 'tid': 0,
+            'ts': e['ts_us'], 'dur': round(e['wall_ms'] * 1000),
+            'args': {k: e[k] for k in ('cpu_ms', 'peak_kib', 'elements') if e[k] is not None},
+        })
+    with open(trace_path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
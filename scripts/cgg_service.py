@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+# Local report-rendering service for the admin dashboard (generate_cgg_report.py --serve).
+#
+#   GET /report?format=pdf          platform report (save_report)
+#   GET /report?format=pdf&lang=en  same, English edition (locales/*.json)
+#   GET /report/<uid>?format=docx   one artist (cgg_batch), &lang= as well
+#   GET /health
+#
+# Renders run in a warm, bounded process pool, rebuilt if a worker dies.
+# Identical requests that arrive while a render is running wait for that
+# render instead of starting their own. Artist reports are looked up in an
+# index of the export's artist records (cgg_batch.ArtistIndex), streamed
+# once per snapshot by the service and shared by all its requests. Finished files go into an LRU cache bounded by size and keyed by
+# (snapshot hash, report, format, locale). Responses are streamed with chunked
+# transfer encoding. The data comes from a Snapshot: FileSnapshot reads an
+# RTDB JSON export from disk, which also makes it the local stand-in for the
+# live database.
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from cgg_i18n import DEFAULT_LOCALE, available_locales
+from cgg_model import RENDERERS, preload, render
+
+CHUNK_BYTES = 64 * 1024
+CACHE_MAX_BYTES = 512 * 2**20
+MAX_PENDING_PER_WORKER = 8  # distinct renders queued beyond this get 503
+MAX_HEADER_BYTES = 16 * 1024
+
+CONTENT_TYPES = {
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'pdf': 'application/pdf',
+    'html': 'text/html; charset=utf-8',
+    'md': 'text/markdown; charset=utf-8',
+}
+_UID = re.compile(r'^[A-Za-z0-9_-]{1,128}$')  # RTDB keys as used for UIDs
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class FileSnapshot:
+    # RTDB export on disk. The hash is recomputed only when the file changes,
+    # so replacing the export invalidates every cached output.
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._stat = None
+        self._hash = None
+
+    def current(self):
+        # -> (hash, path of the JSON export); blocking, run in a thread
+        st = os.stat(self.path)
+        stat = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if stat != self._stat:
+            h = hashlib.sha256()
+            with open(self.path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+            self._stat, self._hash = stat, h.hexdigest()[:32]
+        return self._hash, self.path
+
+
+class OutputCache:
+    # Rendered files under `root`, evicted least recently used first once
+    # their total size passes max_bytes. Files already open for streaming
+    # survive eviction until they are closed.
+
+    def __init__(self, root, max_bytes=CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.total = 0
+        self._entries = OrderedDict()  # name -> size
+        for path in sorted(self.root.glob('*.out'), key=lambda p: p.stat().st_mtime):
+            self._entries[path.name] = path.stat().st_size
+            self.total += path.stat().st_size
+
+    @staticmethod
+    def name(key):
+        return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()[:32] + '.out'
+
+    def get(self, key):
+        name = self.name(key)
+        if name not in self._entries:
+            return None
+        self._entries.move_to_end(name)
+        return self.root / name
+
+    def put(self, key, path):
+        # Moves the rendered file at path into the cache -> cached path
+        name = self.name(key)
+        target = self.root / name
+        os.replace(path, target)
+        self.total += target.stat().st_size - self._entries.pop(name, 0)
+        self._entries[name] = target.stat().st_size
+        while self.total > self.max_bytes and len(self._entries) > 1:
+            old, size = self._entries.popitem(last=False)
+            (self.root / old).unlink(missing_ok=True)
+            self.total -= size
+        return target
+
+
+# -- worker side ------------------------------------------------------------
+
+_analysis = (None, None)  # (snapshot hash, analyze_input() result) for the platform report
+
+
+def _init_worker(formats):
+    for fmt in formats:
+        preload(fmt)
+
+
+def _render_job(snapshot_hash, export_path, uid, fmt, locale, out_path, data=None):
+    # Runs in the pool: renders one report to out_path -> out_path.
+    # data: the artist's records (cgg_batch.ArtistIndex.data()) for uid
+    global _analysis
+    if uid is None:
+        import generate_cgg_report
+        if _analysis[0] != snapshot_hash:
+            _analysis = (None, None)
+            _analysis = (snapshot_hash, generate_cgg_report.analyze_input(export_path))
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(out_path)) as tmp:
+            paths = generate_cgg_report.save_report((fmt,), tmp, workers=1, locales=(locale,),
+                                                    analysis=_analysis[1])
+            os.replace(paths[generate_cgg_report.edition(fmt, locale)], out_path)
+        return out_path
+
+    import cgg_batch
+    return render(fmt, cgg_batch.build_artist_report(uid, data, locale), out_path)
+
+
+# -- service ------------------------------------------------------------------
+
+class Busy(Exception):
+    pass
+
+
+class ReportService:
+
+    def __init__(self, snapshot, cache_dir, workers=None, cache_bytes=CACHE_MAX_BYTES,
+                 formats=('docx', 'pdf')):
+        self.snapshot = snapshot
+        self.cache = OutputCache(cache_dir, cache_bytes)
+        self.workers = workers or os.cpu_count() or 1
+        self.formats = tuple(formats)
+        self.pool = self._new_pool()
+        self.max_pending = self.workers * MAX_PENDING_PER_WORKER
+        self._inflight = {}  # key -> Future of the cached path
+        self._artists = (None, None)  # (snapshot hash, Future of its ArtistIndex)
+        self.renders = 0
+
+    def _new_pool(self):
+        # forkserver: a worker forked from this process would inherit the
+        # client sockets open at that moment and keep their connections open
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(self.formats,),
+                                   mp_context=multiprocessing.get_context('forkserver'))
+
+    async def start(self):
+        # Starts every worker (renderers imported, templates built) before
+        # the first request; the pool would otherwise start them one by one
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, os.getpid) for _ in range(self.workers)))
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    async def output(self, uid, fmt, locale=DEFAULT_LOCALE):
+        # -> the rendered report opened for reading, from the cache, an
+        # identical render in flight, or a new render. The file is opened
+        # here, before the next await, so a later put() cannot evict it
+        # between the lookup and the streaming.
+        loop = asyncio.get_running_loop()
+        snapshot_hash, export_path = await loop.run_in_executor(None, self.snapshot.current)
+        key = (snapshot_hash, uid or '', fmt, locale)
+        for _ in range(3):
+            path = self.cache.get(key)
+            if path is not None:
+                return open(path, 'rb')
+            future = self._inflight.get(key)
+            if future is None:
+                if len(self._inflight) >= self.max_pending:
+                    raise Busy()
+                future = self._inflight[key] = loop.create_future()
+                loop.create_task(self._render(key, export_path, uid, fmt, locale, future))
+            # shield: a client that disconnects must not cancel the others' render
+            path = await asyncio.shield(future)
+            try:
+                return open(path, 'rb')
+            except FileNotFoundError:
+                continue  # evicted by another render before this waiter resumed
+        raise Busy()
+
+    async def artist_data(self, snapshot_hash, export_path, uid):
+        # -> the artist's records; the index of a snapshot is built once,
+        # requests arriving meanwhile wait for it
+        import cgg_batch
+        loaded, index = self._artists
+        if loaded != snapshot_hash:
+            index = asyncio.get_running_loop().run_in_executor(None, cgg_batch.load_artists, export_path)
+            self._artists = (snapshot_hash, index)
+        try:
+            data = (await asyncio.shield(index)).data(uid)
+        except Exception:
+            if self._artists[1] is index:
+                self._artists = (None, None)  # the next request tries again
+            raise
+        if not data.get('profile'):
+            raise LookupError(f"publicProfiles/{uid} introuvable dans l'export")
+        return data
+
+    async def _render(self, key, export_path, uid, fmt, locale, future):
+        tmp = self.cache.root / f'{OutputCache.name(key)}.{os.getpid()}.tmp'
+        pool = self.pool
+        try:
+            data = await self.artist_data(key[0], export_path, uid) if uid is not None else None
+            self.renders += 1
+            await asyncio.get_running_loop().run_in_executor(
+                pool, _render_job, key[0], export_path, uid, fmt, locale, str(tmp), data)
+            future.set_result(self.cache.put(key, tmp))
+        except Exception as exc:
+            if isinstance(exc, BrokenProcessPool) and self.pool is pool:
+                # A worker died (killed, out of memory): this render fails,
+                # the next ones get a new pool
+                self.pool = self._new_pool()
+                pool.shutdown(wait=False)
+            tmp.unlink(missing_ok=True)
+            future.set_exception(exc)
+            future.exception()  # retrieved: nobody may be waiting any more
+        finally:
+            del self._inflight[key]
+
+    # -- HTTP -----------------------------------------------------------------
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        try:
+            method, target, _ = request.split(b'\r\n', 1)[0].decode('latin-1').split(' ', 2)
+            await self._respond(writer, method, target)
+        except ConnectionError:
+            pass
+        except ValueError:
+            await self._error(writer, 400, "Requête invalide", 'GET')
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, method, target):
+        if method not in ('GET', 'HEAD'):
+            return await self._error(writer, 405, "Méthode non prise en charge", 'GET')
+        url = urlsplit(target)
+        if url.path == '/health':
+            body = json.dumps({'renders': self.renders, 'inflight': len(self._inflight),
+                               'cached': len(self.cache._entries), 'cache_bytes': self.cache.total})
+            return await self._send(writer, 200, 'application/json', body.encode(), method)
+        parts = url.path.strip('/').split('/')
+        if parts[0] != 'report' or len(parts) > 2:
+            return await self._error(writer, 404, "Introuvable", method)
+        uid = unquote(parts[1]) if len(parts) == 2 else None
+        query = parse_qs(url.query)
+        fmt = query.get('format', ['pdf'])[0]
+        locale = query.get('lang', [DEFAULT_LOCALE])[0]
+        if fmt not in RENDERERS or (uid is not None and not _UID.match(uid)):
+            return await self._error(writer, 400, "Format ou UID invalide", method)
+        if locale not in available_locales():
+            return await self._error(writer, 400, "Langue non prise en charge", method)
+        try:
+            f = await self.output(uid, fmt, locale)
+        except Busy:
+            return await self._error(writer, 503, "Trop de rendus en attente", method, retry_after=5)
+        except LookupError as exc:
+            return await self._error(writer, 404, str(exc), method)
+        except Exception as exc:
+            return await self._error(writer, 500, f"{type(exc).__name__}: {exc}", method)
+
+        suffix = f'.{locale}' if locale != DEFAULT_LOCALE else ''
+        name = f"{uid or 'plateforme'}{suffix}{RENDERERS[fmt][1]}"
+        with f:
+            writer.write(self._head(200, CONTENT_TYPES[fmt], {
+                'Transfer-Encoding': 'chunked',
+                'Content-Disposition': f'attachment; filename="{name}"',
+            }))
+            if method == 'GET':
+                while chunk := f.read(CHUNK_BYTES):
+                    writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                    await writer.drain()
+                writer.write(b'0\r\n\r\n')
+            await writer.drain()
+
+    @staticmethod
+    def _head(status, content_type, headers):
+        lines = [f'HTTP/1.1 {status} {_REASONS[status]}', f'Content-Type: {content_type}',
+                 'Connection: close', *(f'{k}: {v}' for k, v in headers.items())]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def _send(self, writer, status, content_type, body, method='GET', headers=None):
+        writer.write(self._head(status, content_type, dict(headers or {}, **{'Content-Length': len(body)})))
+        if method == 'GET':
+            writer.write(body)
+        await writer.drain()
+
+    async def _error(self, writer, status, message, method, retry_after=None):
+        headers = {'Retry-After': retry_after} if retry_after else None
+        await self._send(writer, status, 'application/json',
+                         json.dumps({'error': message}, ensure_ascii=False).encode('utf-8'),
+                         method, headers)
+
+
+async def serve(input_path, host='127.0.0.1', port=8765, workers=None, cache_dir=None,
+                cache_bytes=CACHE_MAX_BYTES, ready=None):
+    # Runs until cancelled or sent SIGTERM, then stops the workers; ready
+    # (optional) is called with the bound port. The handler comes first: a
+    # SIGTERM while the workers start must stop them too.
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, lambda: stop.done() or stop.set_result(None))
+    except NotImplementedError:
+        pass  # Windows: Ctrl+C only
+    own_cache = cache_dir is None
+    if own_cache:
+        cache_dir = tempfile.mkdtemp(prefix='cgg-service-')
+    service = ReportService(FileSnapshot(input_path), cache_dir, workers, cache_bytes)
+    try:
+        await service.start()
+        server = await asyncio.start_server(service.handle, host, port, limit=MAX_HEADER_BYTES)
+        async with server:
+            bound = server.sockets[0].getsockname()[1]
+            print(f"Service de rapports: http://{host}:{bound}/report?format=pdf "
+                  f"({service.workers} processus, export {input_path})", flush=True)
+            if ready is not None:
+                ready(bound)
+            await stop
+    finally:
+        try:
+            loop.remove_signal_handler(signal.SIGTERM)
+        except NotImplementedError:
+            pass
+        service.close()
+        if own_cache:
+            shutil.rmtree(cache_dir, ignore_errors=True)
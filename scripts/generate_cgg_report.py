@@ -1,347 +1,101 @@
 # -*- coding: utf-8 -*-
+import argparse
 import os
+import sys
 from pathlib import Path
-from datetime import datetime
-
-from docx import Document
-from docx.shared import Pt, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.section import WD_ORIENT
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-from docx.shared import RGBColor
-
-# Optional lightweight PDF generation (text-focused)
-try:
-    from reportlab.lib.pagesizes import LETTER
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.units import inch
-    REPORTLAB_AVAILABLE = True
-except Exception:
-    REPORTLAB_AVAILABLE = False
+
+import cgg_paginate
+import cgg_profile
+from cgg_i18n import DEFAULT_LOCALE, Messages, available_locales
+from cgg_ingest import RULES_PATH, human_size, scan_export
+from cgg_model import RENDERERS, Report, render, render_profiled
 
 DOWNLOADS = str(Path.home() / "Downloads")
-OUT_DOCX = os.path.join(DOWNLOADS, "Rapport_final_-_Projet_Synthese_groupe_3503_CGG_v1.2.docx")
+OUT_BASENAME = "Rapport_final_-_Projet_Synthese_groupe_3503_CGG_v1.2"
+OUT_DOCX = os.path.join(DOWNLOADS, f"{OUT_BASENAME}.docx")
 OUT_PDF  = os.path.join(DOWNLOADS, "Rapport_final_-_Projet_Synthese_groupe_3503_v1.2.pdf")
 
-BLUE = RGBColor(0x1F, 0x4E, 0x79)  # CGG-like blue for headings
+DEFAULT_FORMATS = ('docx', 'pdf')
 
+# Deployed security rules listed in full in the appendix: (path, highlighting)
+RULES_LISTINGS = [
+    (RULES_PATH, 'json'),
+    (RULES_PATH.with_name('storage.rules'), 'rules'),
+]
 
-def set_styles(doc: Document):
-    style = doc.styles['Normal']
-    style.font.name = 'Times New Roman'
-    style.font.size = Pt(12)
 
-    for level in (1, 2, 3, 4):
-        try:
-            s = doc.styles[f'Heading {level}']
-        except KeyError:
-            continue
-        s.font.name = 'Times New Roman'
-        s.font.size = Pt(16 if level == 1 else 14 if level == 2 else 12)
-        s.font.color.rgb = BLUE
-
-
-def add_field_run(paragraph, instr_text: str):
-    # Creates a complex field like PAGE or NUMPAGES
-    run = paragraph.add_run()
-    r_element = run._r
-    fldChar1 = OxmlElement('w:fldChar')
-    fldChar1.set(qn('w:fldCharType'), 'begin')
-
-    instrText = OxmlElement('w:instrText')
-    instrText.set(qn('xml:space'), 'preserve')
-    instrText.text = instr_text
-
-    fldChar2 = OxmlElement('w:fldChar')
-    fldChar2.set(qn('w:fldCharType'), 'separate')
-
-    fldChar3 = OxmlElement('w:fldChar')
-    fldChar3.set(qn('w:fldCharType'), 'end')
-
-    r_element.append(fldChar1)
-    r_element.append(instrText)
-    r_element.append(fldChar2)
-    r_element.append(fldChar3)
-    return run
-
-
-def add_footer_page_numbers(doc: Document):
-    section = doc.sections[0]
-    section.different_first_page_header_footer = True
-    footer = section.footer
-    p = footer.paragraphs[0] if footer.paragraphs else footer.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-    p.add_run("Page ")
-    add_field_run(p, 'PAGE')
-    p.add_run(" / ")
-    add_field_run(p, 'NUMPAGES')
-
-
-def add_cover_page(doc: Document):
-    section = doc.sections[0]
-    section.orientation = WD_ORIENT.PORTRAIT
-    # Centered title block
-    spacer = doc.add_paragraph("\n\n\n\n")
-    spacer.paragraph_format.space_after = Pt(0)
-
-    title = doc.add_paragraph()
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    r = title.add_run("RAPPORT FINAL – PROJET SYNTHÈSE\n\n")
-    r.bold = True
-    r.font.size = Pt(24)
-    r.font.color.rgb = BLUE
-
-    app = doc.add_paragraph()
-    app.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    app.add_run("Application: InkMatching\n\n").font.size = Pt(16)
-
-    meta = doc.add_paragraph()
-    meta.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    meta.add_run("Programme: Informatique – Projet de Synthèse\n").font.size = Pt(12)
-    meta.add_run("Groupe: 3503\n").font.size = Pt(12)
-    meta.add_run("Date de remise: 21 octobre 2025\n").font.size = Pt(12)
-    meta.add_run("Auteur: Youness Haji\n\n").font.size = Pt(12)
-
-    college = doc.add_paragraph()
-    college.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    rr = college.add_run("Collège Gérald-Godin, Montréal (QC)")
-    rr.font.size = Pt(12)
-    rr.bold = True
-
-    # Page break to start content
-    doc.add_page_break()
-
-
-def add_toc(doc: Document):
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-    r = p.add_run("Table des matières (clic droit > Mettre à jour le champ dans Word)")
-    r.italic = True
-    # Insert a TOC field (Word must update to render)
-    p = doc.add_paragraph()
-    fld = OxmlElement('w:fldSimple')
-    fld.set(qn('w:instr'), 'TOC \\o "1-3" \\h \\z \\u')
-    r = OxmlElement('w:r')
-    t = OxmlElement('w:t')
-    t.text = ""
-    r.append(t)
-    fld.append(r)
-    p._p.append(fld)
-    doc.add_page_break()
-
-
-def add_table(doc: Document, headers, rows, col_widths_pt=None):
-    table = doc.add_table(rows=1, cols=len(headers))
-    table.style = 'Table Grid'
-    hdr_cells = table.rows[0].cells
-    for i, h in enumerate(headers):
-        hdr_cells[i].text = str(h)
-    for row in rows:
-        cells = table.add_row().cells
-        for i, val in enumerate(row):
-            cells[i].text = str(val)
-    if col_widths_pt:
-        for row in table.rows:
-            for i, w in enumerate(col_widths_pt):
-                row.cells[i].width = Inches(w / 72.0)
-    doc.add_paragraph("\n")
-
-
-def add_code_block(doc: Document, text: str):
-    for line in text.splitlines():
-        p = doc.add_paragraph()
-        run = p.add_run(line)
-        run.font.name = 'Courier New'
-        run.font.size = Pt(9)
-
-
-def add_content(doc: Document):
-    # HISTORIQUE DES VERSIONS
-    doc.add_heading('HISTORIQUE DES VERSIONS', level=1)
-    add_table(
-        doc,
-        headers=["Version", "Date", "Auteur", "Description"],
-        rows=[
-            ["1.0", "2025-10-21", "Y. Haji", "Version initiale (PDF)"],
-            ["1.1", "2025-10-21", "Y. Haji", "Mise en forme complète (DOCX): TOC, figures, tableaux, acronymes, en-têtes/pieds"],
-            ["1.2", "2025-10-21", "Y. Haji", "Complétion selon gabarit professeur"],
-        ],
+def add_cover_page(report: Report, msg=None):
+    msg = msg or Messages()
+    report.cover(
+        title=msg('cover.title'),
+        subtitle=msg('cover.subtitle'),
+        meta=msg['cover.meta'],
+        institution=msg('cover.institution'),
     )
 
-    # LISTE DES FIGURES / TABLEAUX / ACRONYMES
-    doc.add_heading('TABLE DES MATIÈRES', level=1)
-    doc.add_paragraph('(Voir TOC ci-dessus, à mettre à jour dans Word)')
-
-    doc.add_heading('LISTE DES FIGURES', level=1)
-    figs = [
-        "Figure 1 – Diagramme de contexte",
-        "Figure 2 – Diagramme des cas d'utilisation",
-        "Figure 3 – Diagramme de classes (modèle de données)",
-        "Figure 4 – Diagramme de séquence – S'enregistrer",
-        "Figure 5 – Diagramme de séquence – Recherche d'artistes",
-        "Figure 6 – Diagramme de séquence – Client envoie un message",
-        "Figure 7 – Diagramme de séquence – Artiste répond",
-        "Figure 8 – Diagramme de séquence – Client consulte les stencils",
-        "Figure 9 – Diagramme de transition d'états – Booking",
-        "Figure 10 – Diagramme de transition d'états – Général",
-        "Figure 11 – Architecture matérielle",
-        "Figure 12 – Architecture logicielle",
-    ]
-    for f in figs:
-        doc.add_paragraph(f, style=None)
-
-    doc.add_heading('LISTE DES TABLEAUX', level=1)
-    tabs = [
-        "Tableau 1 – Historique des versions",
-        "Tableau 2 – Acronymes et abréviations",
-        "Tableau 3 – Structure de la base de données",
-        "Tableau 4 – Exigences logiques de base de données",
-        "Tableau 5 – Exigences non-fonctionnelles",
-    ]
-    for t in tabs:
-        doc.add_paragraph(t)
-
-    doc.add_heading('LISTE DES ACRONYMES ET ABRÉVIATIONS', level=1)
-    add_table(
-        doc,
-        headers=["Acronyme", "Définition"],
-        rows=[
-            ["RTDB", "Firebase Realtime Database"],
-            ["CRUD", "Create, Read, Update, Delete"],
-            ["UI", "User Interface"],
-            ["UX", "User Experience"],
-            ["SDK", "Software Development Kit"],
-            ["TOC", "Table Of Contents"],
-            ["API", "Application Programming Interface"],
-            ["JWT", "JSON Web Token (auth côté web si utilisé)"],
-            ["SaaS", "Software as a Service"],
-            ["SLA", "Service Level Agreement"],
-        ],
-    )
 
-    doc.add_paragraph("Note : Ce document vise à présenter le système logiciel dans son ensemble et à établir les spécifications et exigences qui seront validées à la livraison du système. Il doit être présenté de la façon la plus directe et concise possible en évitant les répétitions.")
+def add_toc(report: Report, msg=None):
+    # The hint is only shown when the DOCX falls back to a Word TOC field
+    report.toc((msg or Messages())('toc.hint'))
 
-    # 1. INTRODUCTION
-    doc.add_heading('1. INTRODUCTION', level=1)
-    doc.add_paragraph(
-        "InkMatching est une application web et mobile conçue pour faciliter la mise en relation entre clients et artistes tatoueurs. "
-        "Le système offre une plateforme complète permettant la découverte d'artistes, la gestion des demandes de tatouage (leads), la communication en temps réel, la réservation de rendez-vous et le suivi des soins post-tatouage (aftercare)."
-    )
-    doc.add_paragraph(
-        "Ce document présente la vue d'ensemble du système logiciel InkMatching, incluant ses spécifications fonctionnelles et non-fonctionnelles, son architecture technique, ainsi que les exigences qui seront validées à la livraison du système."
-    )
 
-    doc.add_heading('1.1 Objectifs', level=2)
-    for bullet in [
-        "Documenter l'ensemble des exigences fonctionnelles et non-fonctionnelles du système InkMatching",
-        "Présenter l'architecture technique et les choix technologiques",
-        "Décrire les spécifications détaillées permettant la conception et les tests du système",
-        "Servir de référence pour l'équipe de développement et les évaluateurs du projet",
-        "Établir les critères de validation et d'acceptation du système",
-    ]:
-        p = doc.add_paragraph(style=None)
-        p.add_run("• ").bold = True
-        p.add_run(bullet)
-    doc.add_paragraph("Public-cible: équipe de développement, professeurs/évaluateurs CGG, parties prenantes.")
-
-    doc.add_heading('1.2 Portée', level=2)
-    doc.add_paragraph("Nom du système : InkMatching")
-    doc.add_paragraph(
-        "Système biplateforme (web et iOS) connectant des clients et des artistes. Backend Firebase. Fonctionnalités incluses : profils publics (adresse, ville, styles, photo, lat/lng), carte, géocodage (MapLibre + Nominatim), leads, messagerie temps réel, calendrier/booking, aftercare, stencils, authentification. Hors portée : paiements avancés, notation, vocal/vidéo, galerie publique, recommandations automatiques."
-    )
+def _pattern(pattern):
+    # publicProfiles/$uid -> publicProfiles/{uid}, as written in the report
+    return '/'.join(f'{{{p[1:]}}}' if p.startswith('$') else p for p in pattern.split('/'))
 
-    doc.add_heading('1.3 Définitions', level=2)
-    defs = [
-        ("Lead", "Demande initiale d'un client auprès d'un artiste."),
-        ("Aftercare", "Plan de soins post-tatouage assigné au client."),
-        ("Profil public", "Fiche visible: displayName, adresse, ville, styles, cover, lat/lng."),
-        ("Thread", "Conversation privée client-artiste."),
-        ("Stencil", "Modèle/dessin préparatoire uploadé par l'artiste."),
-        ("Géocodage", "Conversion d'adresse en coordonnées GPS."),
-        ("Status (lead)", "pending, accepted, rejected, completed."),
-        ("Booking", "Réservation rendez-vous avec date/heure/durée/statut."),
-        ("RTDB", "Base NoSQL temps réel de Firebase."),
-        ("UID", "Identifiant unique Firebase Auth."),
-    ]
-    for k, v in defs:
-        doc.add_paragraph(f"• {k} : {v}")
-
-    doc.add_heading('1.4 Documents de références', level=2)
-    refs = [
-        "Code source (web Next.js/TS, iOS SwiftUI)",
-        "Firebase Docs", "Next.js Docs", "SwiftUI Docs", "MapLibre GL JS Docs", "Nominatim API",
-        "Diagrammes UML (annexe)",
-        "Gabarit de rapport final – professeur",
-        "Normes: TS/Swift, règles Firebase, Material/HIG",
-    ]
-    for r in refs:
-        doc.add_paragraph(f"- {r}")
 
-    # 2. DESCRIPTION GÉNÉRALE DU LOGICIEL
-    doc.add_heading('2. DESCRIPTION GÉNÉRALE DU LOGICIEL', level=1)
-    doc.add_heading("2.1 Vue d'ensemble des fonctions du produit", level=2)
-    doc.add_paragraph("Découverte: profils publics, carte interactive, filtres.")
-    doc.add_paragraph("Communication: leads, messagerie temps réel, notifications.")
-    doc.add_paragraph("Gestion: calendrier/booking, aftercare, stencils, profil.")
-
-    doc.add_heading('2.2 Interfaces externes', level=2)
-    doc.add_paragraph("Acteurs: Client, Artiste. Systèmes: Firebase Auth/RTDB/Storage, MapLibre, Nominatim.")
-    doc.add_paragraph("Cas d'utilisation: s'inscrire, rechercher, envoyer lead, chatter, réserver, aftercare, stencils.")
-
-    doc.add_heading('2.3 Spécifications fonctionnelles', level=2)
-    doc.add_paragraph("Flux principaux: création profil public (géocodage adresse), découverte sur carte, messagerie temps réel, acceptation lead + aftercare.")
-
-    doc.add_heading('2.4 Technologies utilisées', level=2)
-    doc.add_paragraph("Web: Next.js 14, TypeScript, Tailwind, MapLibre GL JS.")
-    doc.add_paragraph("iOS: SwiftUI, CoreLocation, PhotosUI, Combine.")
-    doc.add_paragraph("Backend: Firebase Auth, RTDB, Storage; Nominatim.")
-    doc.add_paragraph("Outils: GitHub, VS Code, Xcode, Firebase Console.")
-
-    doc.add_heading('2.5 Exigences logiques de bases de données', level=2)
-    doc.add_paragraph("Base NoSQL RTDB dénormalisée, hiérarchie peu profonde, duplication contrôlée.")
-    # Table: Structure DB (simplified)
-    add_table(
-        doc,
-        headers=["Espace Firebase", "Clé(s)", "Champs majeurs", "Type", "Description"],
-        rows=[
-            ["publicProfiles/{uid}", "uid", "role, displayName, city, address, styles, coverURL, latitude, longitude, createdAt, updatedAt", "Object", "Profils publics artistes"],
-            ["leads/{leadId}", "leadId", "clientId, artistId, message, status, aftercareId, createdAt, updatedAt", "Object", "Demandes de tatouage"],
-            ["aftercareByClient/{clientId}/{aftercareId}", "clientId, aftercareId", "title, steps[], status, assignedAt, artistId, completedAt", "Object", "Plans indexés par client"],
-            ["aftercareByArtist/{artistId}/{aftercareId}", "artistId, aftercareId", "title, steps[], status, assignedAt, clientId, completedAt", "Object", "Plans indexés par artiste"],
-            ["threads/{threadId}", "threadId", "participants[], lastMessage, lastMessageTimestamp, updatedAt", "Object", "Conversations"],
-            ["threads/{threadId}/messages/{messageId}", "threadId, messageId", "senderId, text, timestamp, read", "Object", "Messages"],
-            ["bookings/{bookingId}", "bookingId", "clientId, artistId, date, time, duration, status, createdAt, notes", "Object", "Réservations"],
-            ["stencils/{artistId}/{stencilId}", "artistId, stencilId", "imageURL, title, description, uploadedAt, associatedLeadId", "Object", "Modèles/stencils"],
-        ],
-    )
+def _size(msg, n):
+    return human_size(n, msg['number.size_units'])
 
-    doc.add_heading('2.6 Architecture du logiciel', level=2)
-    doc.add_paragraph("Architecture matérielle et logicielle (Figures 11-12) avec clients Web/iOS, Firebase (Auth, RTDB, Storage), services externes Nominatim/MapLibre.")
 
-    # 3. DESCRIPTION DÉTAILLÉE (selected highlights)
-    doc.add_heading('3. DESCRIPTION DÉTAILLÉE', level=1)
-    doc.add_heading('3.1 Interfaces externes', level=2)
-    doc.add_paragraph("Transactions: Auth, création profil (validation + géocodage + upload cover), recherche, envoi de message, gestion de lead.")
+def add_measured_structure(report: Report, stats, msg):
+    # Section 2.5 from a scan of the export (cgg_ingest.scan_export)
+    report.paragraph(msg('measured.source', source=os.path.basename(stats.source),
+                         size=_size(msg, stats.total_bytes),
+                         records=sum(r.count for r in stats.records.values())))
+    rows = []
+    for pattern, rec in sorted(stats.records.items(), key=lambda kv: -kv[1].bytes):
+        fields = sorted(rec.fill_rates().items(), key=lambda kv: (-kv[1], kv[0]))
+        rows.append([
+            _pattern(pattern), rec.count, _size(msg, rec.bytes),
+            ", ".join(f"{k} {msg.percent(v * 100, 0)}" for k, v in fields) or "—",
+            sum(rec.violations.values()),
+        ])
+    measured = {p.split('/')[0] for p in stats.records}
+    for top, node in sorted(stats.nodes.items(), key=lambda kv: -kv[1]['bytes']):
+        if top not in measured and node['bytes'] > 2:
+            rows.append([top, "—", _size(msg, node['bytes']), msg('measured.unschematized'), "—"])
+    report.table(headers=msg['measured.headers'], rows=rows, caption=msg('database.caption'))
 
-    doc.add_heading('3.4 Exigences logiques de bases de données', level=2)
-    # Big two-column table summarizing logical requirements
-    add_table(
-        doc,
-        headers=["Dimension", "Description détaillée"],
-        rows=[
-            ["Types d'informations", "Profils, Leads, Aftercare, Threads, Messages, Bookings, Stencils"],
-            ["Fréquence d'utilisation", "Lectures fréquentes: profils/messages; Écritures fréquentes: messages"],
-            ["Capacité d'accès", "Temps réel via WebSocket; accès public/privé selon règles; concurrence gérée"],
-            ["Entités et relations", "Voir diagramme de classes; relations 1:N via IDs; duplication contrôlée"],
-            ["Contraintes d'intégrité", "Règles RTDB, validations client, enums restreints, timestamps serveur, lat/lng validés"],
-            ["Exigences de rétention", "Conservation durable des données clés; backups Firebase"],
-            ["Exigences de stockage", "Estimations tailles; images compressées; scalabilité Firebase"],
-        ],
-    )
 
-    doc.add_heading('Règles de sécurité Firebase (extrait)', level=3)
-    firebase_rules = """{
+# Rows of the 3.4 table, as catalog keys requirements.<key>: [dimension, text]
+REQUIREMENTS = ('types', 'frequency', 'access', 'entities', 'integrity', 'retention', 'storage')
+
+
+def measured_requirements(msg, stats, activity=None):
+    # -> {requirement: measured text}, replacing the estimated rows of the 3.4 table
+    nodes = sorted(stats.nodes.items(), key=lambda kv: -kv[1]['bytes'])
+    records = sum(r.count for r in stats.records.values())
+    return {
+        'types': ", ".join(f"{top} ({node['records']})" for top, node in nodes if node['records']),
+        'integrity': msg('requirements.measured.integrity', records=records,
+                         violations=stats.total_violations),
+        'storage': msg('requirements.measured.storage', total=_size(msg, stats.total_bytes),
+                       nodes=", ".join(f"{top} {_size(msg, node['bytes'])}" for top, node in nodes[:3])),
+        'frequency': activity.frequency_summary(msg) if activity is not None else None,
+    }
+
+
+def add_violations(report: Report, stats, msg):
+    rows = []
+    for pattern, rec in sorted(stats.records.items()):
+        for field, count in sorted(rec.violations.items(), key=lambda kv: -kv[1]):
+            where, value = rec.samples[field][0]
+            rows.append([_pattern(pattern), field or msg('violations.record'), count, f"{where} = {value}"])
+    report.table(headers=msg['violations.headers'], rows=rows)
+
+
+FIREBASE_RULES_EXCERPT = """{
   "rules": {
     "publicProfiles": {
       "$uid": {
@@ -375,91 +129,377 @@ def add_content(doc: Document):
     }
   }
 }"""
-    add_code_block(doc, firebase_rules)
-
-    doc.add_heading('3.5 Contraintes de conception', level=2)
-    doc.add_paragraph("Standards code (TS/Swift), normes Firebase, contraintes réseau/quotas, conformité RGPD/PIPEDA, accessibilité WCAG.")
-
-    doc.add_heading('3.6 Exigences non-fonctionnelles', level=2)
-    add_table(
-        doc,
-        headers=["Caractéristique", "Exigence détaillée"],
-        rows=[
-            ["Fiabilité", "Gestion d'erreurs, retry, validations, logs, 99.5% cible"],
-            ["Disponibilité", "SLA Firebase 99.95%, tolérance pannes, fallbacks"],
-            ["Sécurité", "Auth JWT, règles strictes, TLS 1.3, URLs signées"],
-            ["Entretien", "Code modulaire, typage fort, tests, doc, CI/CD"],
-            ["Modularité", "Libs dédiées (aftercare, profiles, chat, auth, leads)"],
-            ["Performance", "Lazy loading, pagination, cache, <3s, <500ms"],
-            ["Portabilité", "Web navigateurs modernes, iOS 15+, responsive"],
-            ["Utilisabilité", "UX intuitive, accessibilité, aide contextuelle"],
-            ["Scalabilité", "10k+ utilisateurs, RTDB scalable, CDN"],
-        ],
-    )
+
+
+def add_content(report: Report, stats=None, activity=None, geography=None, executor=None, msg=None):
+    # Every text comes from the message catalog (cgg_i18n); msg defaults to French.
+    # executor: the caller's process pool, if any, draws the missing figures
+    msg = msg or Messages()
+
+    # HISTORIQUE DES VERSIONS
+    report.heading(msg('history.heading'), level=1)
+    report.table(headers=msg['history.headers'], rows=msg['history.rows'], caption=msg('history.caption'))
+
+    # LISTE DES FIGURES / TABLEAUX / ACRONYMES
+    # Entries and page numbers: cgg_paginate (captioned figures and tables)
+    report.heading(msg('toc.heading'), level=1)
+    add_toc(report, msg)
+
+    report.heading(msg('figures.heading'), level=1)
+    report.toc(kind='figures')
+
+    report.heading(msg('tables.heading'), level=1)
+    report.toc(kind='tables')
+
+    report.heading(msg('acronyms.heading'), level=1)
+    report.table(headers=msg['acronyms.headers'], rows=msg['acronyms.rows'], caption=msg('acronyms.caption'))
+
+    report.paragraph(msg('acronyms.note'))
+
+    # 1. INTRODUCTION
+    report.heading(msg('intro.heading'), level=1)
+    for text in msg['intro.paragraphs']:
+        report.paragraph(text)
+
+    report.heading(msg('objectives.heading'), level=2)
+    for bullet in msg['objectives.bullets']:
+        report.bullet(bullet)
+    report.paragraph(msg('objectives.audience'))
+
+    report.heading(msg('scope.heading'), level=2)
+    report.paragraph(msg('scope.name'))
+    report.paragraph(msg('scope.text'))
+
+    report.heading(msg('definitions.heading'), level=2)
+    for k, v in msg['definitions.items']:
+        report.definition(k, v)
+
+    report.heading(msg('references.heading'), level=2)
+    for r in msg['references.items']:
+        report.bullet(r, marker='-')
+
+    # 2. DESCRIPTION GÉNÉRALE DU LOGICIEL
+    report.heading(msg('overview.heading'), level=1)
+    report.heading(msg('functions.heading'), level=2)
+    for text in msg['functions.paragraphs']:
+        report.paragraph(text)
+
+    report.heading(msg('interfaces.heading'), level=2)
+    for text in msg['interfaces.paragraphs']:
+        report.paragraph(text)
+
+    report.heading(msg('functional.heading'), level=2)
+    report.paragraph(msg('functional.text'))
+
+    report.heading(msg('technologies.heading'), level=2)
+    for text in msg['technologies.paragraphs']:
+        report.paragraph(text)
+
+    report.heading(msg('database.heading'), level=2)
+    report.paragraph(msg('database.text'))
+    if stats is not None:
+        add_measured_structure(report, stats, msg)
+    else:
+        # Table: Structure DB (simplified)
+        report.table(headers=msg['database.headers'], rows=msg['database.rows'],
+                     caption=msg('database.caption'))
+
+    report.heading(msg('architecture.heading'), level=2)
+    report.paragraph(msg('architecture.text'))
+
+    # 3. DESCRIPTION DÉTAILLÉE (selected highlights)
+    report.heading(msg('detailed.heading'), level=1)
+    report.heading(msg('transactions.heading'), level=2)
+    report.paragraph(msg('transactions.text'))
+
+    report.heading(msg('requirements.heading'), level=2)
+    # Big two-column table summarizing logical requirements
+    measured = measured_requirements(msg, stats, activity) if stats is not None else {}
+    requirements = [[msg[f'requirements.{key}'][0], measured.get(key) or msg[f'requirements.{key}'][1]]
+                    for key in REQUIREMENTS]
+    report.table(headers=msg['requirements.headers'], rows=requirements,
+                 caption=msg('requirements.caption'))
+    if stats is not None and stats.total_violations:
+        add_violations(report, stats, msg)
+
+    report.heading(msg('rules.excerpt_heading'), level=3)
+    report.code(FIREBASE_RULES_EXCERPT, language='json')
+
+    report.heading(msg('constraints.heading'), level=2)
+    report.paragraph(msg('constraints.text'))
+
+    report.heading(msg('nonfunctional.heading'), level=2)
+    report.table(headers=msg['nonfunctional.headers'], rows=msg['nonfunctional.rows'],
+                 caption=msg('nonfunctional.caption'))
 
     # 4. INFORMATIONS COMPLÉMENTAIRES (summarized)
-    doc.add_heading('4. INFORMATIONS COMPLÉMENTAIRES', level=1)
-    doc.add_heading('4.1 Index', level=2)
-    doc.add_paragraph("Aftercare, API, Artiste, Auth, Booking, Client, Firebase, Géocodage, Lead, MapLibre, Message, Next.js, Nominatim, Profil public, RTDB, Stencil, SwiftUI, Thread, TypeScript")
+    report.heading(msg('info.heading'), level=1)
+    report.heading(msg('index.heading'), level=2)
+    report.paragraph(msg('index.text'))
 
-    doc.add_heading('4.2 Annexes (sélection)', level=2)
-    doc.add_paragraph("Annexes UC-01 à UC-07 détaillant les cas d'utilisation majeurs (messagerie, recherche, enregistrement, aftercare, booking).")
+    report.heading(msg('annexes.heading'), level=2)
+    report.paragraph(msg('annexes.text'))
 
-    doc.add_heading('CONCLUSION', level=1)
-    doc.add_paragraph(
-        "Ce rapport présente InkMatching dans son ensemble : architecture moderne (Next.js/SwiftUI/Firebase), fonctionnalités complètes (découverte, chat, leads, booking, aftercare), sécurité renforcée, UX soignée et documentation exhaustive. Le système est prêt au déploiement et extensible (paiements, notation, Android, API publique)."
-    )
+    report.heading(msg('conclusion.heading'), level=1)
+    report.paragraph(msg('conclusion.text'))
 
     # Risques et mitigation (table)
-    doc.add_heading('Annexe – Risques et mitigation', level=2)
-    add_table(
-        doc,
-        headers=["Risque", "Probabilité", "Impact", "Mitigation"],
-        rows=[
-            ["Dépassement quota Nominatim", "Moyenne", "Moyen", "Cache, limitation requêtes, service backup"],
-            ["Quota Firebase dépassé", "Faible", "Élevé", "Surveillance, optimisation, alertes"],
-            ["Données sensibles exposées", "Faible", "Critique", "Règles strictes, audits, validation entrées"],
-            ["Performance dégradée", "Moyenne", "Moyen", "Lazy loading, pagination, optimisation images"],
-        ],
-    )
+    report.heading(msg('risks.heading'), level=2)
+    report.table(headers=msg['risks.headers'], rows=msg['risks.rows'])
+
+    # Règles de sécurité déployées (listings complets)
+    listings = [(path, language) for path, language in RULES_LISTINGS if path.is_file()]
+    if listings:
+        report.heading(msg('rules.annex_heading'), level=2)
+        for path, language in listings:
+            report.paragraph(path.name, bold=True)
+            report.code(path.read_text(encoding='utf-8'), language=language)
+
+    from cgg_figures import add_figures_content
+    add_figures_content(report, msg, executor=executor)
+
+    if activity is not None:
+        from cgg_analytics import add_activity_content
+        add_activity_content(report, activity, msg)
+
+    if geography is not None:
+        from cgg_geo import add_geography_content
+        add_geography_content(report, geography, msg)
+
+
+def build_report(stats=None, activity=None, geography=None, executor=None,
+                 locale=DEFAULT_LOCALE) -> Report:
+    msg = Messages(locale)
+    report = Report(title=msg('report.title'), locale=locale, cache_sections=True)
+    add_cover_page(report, msg)
+    report.mark_skeleton()
+    add_content(report, stats, activity, geography, executor, msg)
+    return cgg_paginate.index(report)
+
+
+def edition(fmt, locale=DEFAULT_LOCALE):
+    # Key of one output in save_report()'s result: docx, or docx.en for
+    # another locale than the default
+    return fmt if locale == DEFAULT_LOCALE else f'{fmt}.{locale}'
+
+
+def render_all(jobs, workers=None, profile=False, executor=None):
+    # jobs: {key: (report, format, output path)}. Independent outputs (every
+    # format of every locale edition) render concurrently from the reports
+    # built once, so the wall time is that of the slowest renderer.
+    # executor: the caller's process pool, else one is started for the call.
+    # With profile, worker processes send their spans back: -> (paths, events)
+    if len(jobs) == 1 or workers == 1:
+        paths = {key: render(fmt, report, path) for key, (report, fmt, path) in jobs.items()}
+        return (paths, []) if profile else paths
+    if executor is None:
+        with _pool(min(len(jobs), workers or os.cpu_count() or 1)) as pool:
+            return render_all(jobs, workers, profile, pool)
+    task = render_profiled if profile else render
+    futures = {key: executor.submit(task, fmt, report, path) for key, (report, fmt, path) in jobs.items()}
+    results = {key: f.result() for key, f in futures.items()}
+    if not profile:
+        return results
+    return ({key: path for key, (path, _) in results.items()},
+            [e for _, events in results.values() for e in events])
+
+
+def _pool(workers):
+    # Imported here: multiprocessing is a large share of startup time
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+class _SharedPool:
+    # The process pool of save_report(), started on first use: a run with
+    # one output and its figures cached never pays for multiprocessing
+    def __init__(self, workers):
+        self.workers = workers
+        self.pool = None
+
+    def _get(self):
+        if self.pool is None:
+            self.pool = _pool(self.workers)
+        return self.pool
+
+    def submit(self, fn, *args):
+        return self._get().submit(fn, *args)
+
+    def map(self, fn, *iterables):
+        return self._get().map(fn, *iterables)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def output_paths(formats, out_dir=DOWNLOADS, locale=DEFAULT_LOCALE):
+    # Editions in another locale than the default get a .<locale> suffix
+    suffix = '' if locale == DEFAULT_LOCALE else f'.{locale}'
+    paths = {}
+    for fmt in formats:
+        if fmt == 'docx' and out_dir == DOWNLOADS:
+            paths[fmt] = OUT_DOCX[:-len('.docx')] + suffix + '.docx'
+        elif fmt == 'pdf' and out_dir == DOWNLOADS:
+            paths[fmt] = OUT_PDF[:-len('.pdf')] + suffix + '.pdf'
+        else:
+            paths[fmt] = os.path.join(out_dir, OUT_BASENAME + suffix + RENDERERS[fmt][1])
+    return paths
+
+
+def analyze_input(input_path):
+    # -> (stats, activity, geography) of an RTDB export, for build_report()
+    # One pass over the export: the scan hands the records the analyses need
+    # to their collectors as it validates them
+    from cgg_analytics import ActivityCollector
+    from cgg_geo import ProfileCollector, analyze_geography
+    activity, profiles = ActivityCollector(), ProfileCollector()
+    sink = {}
+    for collector in (activity, profiles):
+        for pattern in collector.patterns:
+            sink.setdefault(pattern, []).append(collector.add)
+    sink = {pattern: adds[0] if len(adds) == 1 else _fan_out(adds) for pattern, adds in sink.items()}
+    with cgg_profile.span('scan_export', 'input'):
+        stats = scan_export(input_path, sink=sink)
+    with cgg_profile.span('analyze_export', 'input'):
+        activity = activity.result(input_path)
+    with cgg_profile.span('analyze_geography', 'input'):
+        geography = analyze_geography(input_path, profiles=profiles.profiles())
+    return stats, activity, geography
+
+
+def _fan_out(adds):
+    def add(pattern, keys, record):
+        for a in adds:
+            a(pattern, keys, record)
+    return add
+
+
+def save_report(formats=DEFAULT_FORMATS, out_dir=DOWNLOADS, workers=None, input_path=None,
+                profile=False, toc_fields=False, locales=(DEFAULT_LOCALE,), analysis=None):
+    # input_path: RTDB export whose measured statistics fill sections 2.5/3.4
+    # and the activity and geography annexes (NumPy is only needed in that case).
+    # analysis: analyze_input() of that export when the caller already has it.
+    # profile: also write <basename>.profile.json and a Chrome trace of the build.
+    # toc_fields: skip pagination; the DOCX keeps Word's TOC field instead.
+    # locales: one edition per locale. The export is scanned and analysed
+    # once; each edition is built and paginated from those results, then all
+    # outputs render together. Unless workers == 1, one process pool draws
+    # the figures and renders the outputs. -> {edition(format, locale): path}
+    if profile:
+        cgg_profile.enable()
+    if analysis is None:
+        analysis = analyze_input(input_path) if input_path else (None, None, None)
+    stats, activity, geography = analysis
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    executor = None if workers == 1 else _SharedPool(workers or os.cpu_count() or 1)
+    try:
+        jobs = {}
+        for locale in locales:
+            with cgg_profile.span('build_report', 'content'):
+                report = build_report(stats, activity, geography, executor, locale)
+            if not toc_fields:
+                with cgg_profile.span('paginate', 'content'):
+                    cgg_paginate.paginate(report, formats)
+            for fmt, path in output_paths(formats, out_dir, locale).items():
+                jobs[edition(fmt, locale)] = (report, fmt, path)
+        results = render_all(jobs, workers, profile, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if not profile:
+        return results
+
+    paths, worker_events = results
+    events = cgg_profile.disable() + worker_events
+    names = {os.getpid(): 'generate_cgg_report'}
+    for e in worker_events:
+        names.setdefault(e['pid'], f"worker {len(names)}")
+    base = os.path.join(out_dir, OUT_BASENAME)
+    paths['profile'] = base + '.profile.json'
+    paths['trace'] = base + '.trace.json'
+    cgg_profile.write(events, paths['profile'], paths['trace'], names)
+    return paths
 
 
 def save_docx_and_pdf():
-    doc = Document()
-    set_styles(doc)
-    add_cover_page(doc)
-    add_toc(doc)
-    add_footer_page_numbers(doc)
-    add_content(doc)
-
-    Path(DOWNLOADS).mkdir(parents=True, exist_ok=True)
-    doc.save(OUT_DOCX)
-
-    # Optional PDF text export (simple)
-    text_for_pdf = (
-        "RAPPORT FINAL – PROJET SYNTHÈSE\n\n" \
-        "Application: InkMatching — Collège Gérald-Godin\n\n" \
-        "Ce PDF est une version texte simplifiée. La version DOCX contient la mise en forme complète (couverture, TOC, en-têtes/pieds, tableaux).\n\n"
-    )
-    if REPORTLAB_AVAILABLE:
-        c = canvas.Canvas(OUT_PDF, pagesize=LETTER)
-        width, height = LETTER
-        x = inch
-        y = height - inch
-        for line in text_for_pdf.splitlines():
-            c.drawString(x, y, line)
-            y -= 14
-            if y < inch:
-                c.showPage()
-                y = height - inch
-        c.showPage()
-        c.save()
+    return save_report(('docx', 'pdf'))
+
+
+def _read_uids(args):
+    uids = list(args.uids or [])
+    if args.uids_file:
+        with open(args.uids_file, encoding='utf-8') as f:
+            uids.extend(line.strip() for line in f if line.strip())
+    return uids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère le rapport final CGG (InkMatching).")
+    parser.add_argument('--format', dest='formats', nargs='+', choices=sorted(RENDERERS),
+                        default=list(DEFAULT_FORMATS), help="formats de sortie")
+    parser.add_argument('--out', default=DOWNLOADS, help="répertoire de sortie")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="processus de rendu (1 = séquentiel)")
+    parser.add_argument('--input', help="export JSON de la Realtime Database "
+                                        "(statistiques des sections 2.5 et 3.4, ou source de --batch)")
+    parser.add_argument('--profile', action='store_true',
+                        help="mesure chaque étape (temps, CPU, mémoire, éléments XML) et écrit "
+                             "un résumé JSON et une trace Chrome dans --out")
+    parser.add_argument('--lang', dest='locales', nargs='+', choices=available_locales(),
+                        default=[DEFAULT_LOCALE],
+                        help="langues des éditions du rapport, générées ensemble à partir "
+                             "d'une seule analyse de l'export")
+    parser.add_argument('--toc-field', action='store_true',
+                        help="table des matières DOCX en champ Word (à mettre à jour dans Word) "
+                             "au lieu des numéros de page estimés")
+    batch = parser.add_argument_group("rapports par artiste")
+    batch.add_argument('--batch', action='store_true',
+                       help="un rapport par artiste à partir d'un export RTDB (--input)")
+    batch.add_argument('--uids', nargs='+', help="UIDs à traiter (défaut: tous les artistes)")
+    batch.add_argument('--uids-file', help="fichier d'UIDs, un par ligne")
+    batch.add_argument('--chunk-size', type=int, default=16,
+                       help="rapports envoyés à un processus à la fois")
+    service = parser.add_argument_group("service HTTP (tableau de bord admin)")
+    service.add_argument('--serve', type=int, nargs='?', const=8765, metavar='PORT',
+                         help="sert GET /report[/<uid>]?format=... à partir de --input")
+    service.add_argument('--host', default='127.0.0.1', help="adresse d'écoute de --serve")
+    service.add_argument('--cache-dir', help="cache des rapports rendus (défaut: temporaire)")
+    service.add_argument('--cache-mb', type=int, default=512, help="taille maximale du cache (Mo)")
+    args = parser.parse_args(argv)
+
+    if args.serve is not None:
+        if not args.input:
+            parser.error("--serve requiert --input")
+        import asyncio
+        import cgg_service
+        try:
+            asyncio.run(cgg_service.serve(args.input, args.host, args.serve, args.workers,
+                                          args.cache_dir, args.cache_mb * 2**20))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.batch:
+        if not args.input:
+            parser.error("--batch requiert --input")
+        if len(args.locales) > 1:
+            parser.error("--batch accepte une seule langue (--lang)")
+        import cgg_batch
+        manifest = cgg_batch.run_batch(args.input, _read_uids(args), args.out, args.formats,
+                                       workers=args.workers, chunk_size=args.chunk_size,
+                                       locale=args.locales[0])
+        print(f"OK: {len(manifest['generated'])}/{manifest['requested']} rapports -> {args.out}")
+        for failure in manifest['failed']:
+            print(f"ÉCHEC: {failure['uid']}: {failure['error'].splitlines()[0]}", file=sys.stderr)
+        return 1 if manifest['failed'] else 0
+
+    for fmt, path in save_report(args.formats, out_dir=args.out, workers=args.workers,
+                                 input_path=args.input, profile=args.profile,
+                                 toc_fields=args.toc_field, locales=args.locales).items():
+        print(f"OK: {fmt.upper():<4} -> {path}")
+    return 0
 
 
 if __name__ == '__main__':
-    save_docx_and_pdf()
-    print(f"OK: DOCX -> {OUT_DOCX}")
-    if REPORTLAB_AVAILABLE:
-        print(f"OK: PDF  -> {OUT_PDF}")
-    else:
-        print("Note: reportlab non disponible, PDF non généré.")
+    sys.exit(main())
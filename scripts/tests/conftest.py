@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# The report scripts are standalone modules next to this directory
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS))
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    # Tests never touch the user's cache: caching is off unless cache_dir is used
+    import cgg_cache
+    monkeypatch.setattr(cgg_cache, 'CACHE_DIR', '')
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch, no_cache):
+    # A cold on-disk cache (cgg_cache) for the test only
+    import cgg_cache
+    path = tmp_path / 'cache'
+    monkeypatch.setattr(cgg_cache, 'CACHE_DIR', str(path))
+    return path
+
+
+@pytest.fixture(scope='session')
+def synthetic_export(tmp_path_factory):
+    # Small export from the benchmark's generator, checked against the rules
+    import bench_cgg_report
+    return bench_cgg_report.synthetic_export(tmp_path_factory.mktemp('exports'), 300)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import json
+from collections import Counter, defaultdict
+from statistics import median
+
+import numpy as np
+import pytest
+
+from cgg_analytics import MINUTE_MS, analyze_export, dedupe, group_stats
+
+H = 3_600_000
+
+EXPORT = {
+    'publicProfiles': {
+        'a1': {'role': 'artist', 'displayName': 'Alex'},
+        'a2': {'role': 'artist', 'displayName': 'Sam'},
+        'a3': {'role': 'artist', 'displayName': 'Noa'},
+    },
+    # l1 is in both layouts and counted once, with its first status
+    'leadsByArtist': {'a1': {'l1': {'status': 'new'}, 'l2': {'status': 'accepted'}},
+                      'a2': {'l3': {'status': 'custom'}}},
+    'leads': {'l1': {'artistId': 'a1', 'status': 'declined'}, 'l4': {'artistId': 'a2'}},
+    # a3 has bookings but no appointment, a2 the reverse
+    'bookingsByArtist': {'a1': {'b1': {'status': 'pending'}, 'b2': {'status': 'confirmed'}},
+                         'a3': {'b3': {'status': 'pending'}}},
+    'bookings': {'b1': {'artistId': 'a1'}, 'b4': {'artistId': 'a3'}},
+    'appointmentsByArtist': {
+        'a1': {'p1': {'startsAt': 0, 'endsAt': 2 * H}, 'p2': {'startsAt': 0, 'endsAt': H},
+               'p3': {'startsAt': 0, 'endsAt': 3 * H}, 'p4': {'startsAt': 5 * H, 'endsAt': 0},
+               'p5': {'startsAt': 0}},
+        'a2': {'p6': {'startsAt': 0, 'endsAt': H // 2}, 'p7': {'startsAt': 0, 'endsAt': 90 * MINUTE_MS}},
+    },
+    'aftercareByArtist': {'a1': {'c1': {'status': 'active', 'createdAt': 0}}},
+    'aftercareByClient': {'u1': {'c1': {'status': 'active', 'createdAt': 0},
+                                 'c2': {'status': 'completed', 'createdAt': 0, 'completedAt': 86_400_000}}},
+}
+
+
+def _plain_group_stats(codes, values, n):
+    groups = defaultdict(list)
+    for code, value in zip(codes.tolist(), values.tolist()):
+        if value == value:
+            groups[code].append(value)
+    return ([len(groups[g]) for g in range(n)], [sum(groups[g]) for g in range(n)],
+            [sum(groups[g]) / len(groups[g]) if groups[g] else np.nan for g in range(n)],
+            [median(groups[g]) if groups[g] else np.nan for g in range(n)])
+
+
+@pytest.mark.parametrize('scale', [1.0, 0.25, 1e15])
+def test_group_stats_matches_a_plain_group_by(scale):
+    # Groups 3 and 7 are empty; 1e15 takes the lexsort path
+    rng = np.random.default_rng(1)
+    codes = rng.choice([0, 1, 2, 4, 5, 6], 500).astype(np.int32)
+    values = np.round(rng.uniform(-50, 200, 500)) * scale
+    values[rng.random(500) < 0.1] = np.nan
+    for got, expected in zip(group_stats(codes, values, 8), _plain_group_stats(codes, values, 8)):
+        np.testing.assert_allclose(got, expected, rtol=1e-12)
+
+
+def test_group_stats_without_values():
+    count, total, mean, median_ = group_stats(np.array([0, 1], np.int32), np.array([np.nan, np.nan]), 3)
+    assert count.tolist() == [0, 0, 0] and total.tolist() == [0, 0, 0]
+    assert np.isnan(mean).all() and np.isnan(median_).all()
+
+
+def test_dedupe_keeps_the_first_row_of_every_id():
+    columns = {'id': np.array([3, 1, 3, 2, 1], np.int32), 'value': np.arange(5.0)}
+    kept = dedupe(columns, 'id')
+    assert kept['id'].tolist() == [3, 1, 2]
+    assert kept['value'].tolist() == [0.0, 1.0, 3.0]
+    empty = {'id': np.array([], np.int32)}
+    assert dedupe(empty, 'id') is empty
+
+
+def test_export_matches_a_plain_group_by(tmp_path):
+    path = tmp_path / 'export.json'
+    path.write_text(json.dumps(EXPORT), encoding='utf-8')
+    activity = analyze_export(path)
+
+    leads = {}
+    for layout in ('leadsByArtist', 'leads'):
+        for key, node in EXPORT[layout].items():
+            for lead_id, lead in (node.items() if layout == 'leadsByArtist' else [(key, node)]):
+                leads.setdefault(lead_id, lead.get('status') or '—')
+    assert activity.leads['total'] == len(leads)
+    assert dict(activity.leads['statuses']) == Counter(leads.values())
+
+    bookings = {}
+    for uid, node in EXPORT['bookingsByArtist'].items():
+        for booking_id in node:
+            bookings.setdefault(booking_id, uid)
+    for booking_id, booking in EXPORT['bookings'].items():
+        bookings.setdefault(booking_id, booking['artistId'])
+    durations = defaultdict(list)
+    for uid, node in EXPORT['appointmentsByArtist'].items():
+        for appointment in node.values():
+            if appointment.get('endsAt', -1) >= appointment['startsAt']:
+                durations[uid].append((appointment['endsAt'] - appointment['startsAt']) / MINUTE_MS)
+    per_artist = Counter(bookings.values())
+    names = {uid: profile['displayName'] for uid, profile in EXPORT['publicProfiles'].items()}
+    expected = {names[uid]: (per_artist[uid], len(durations[uid]),
+                             sum(durations[uid]) / len(durations[uid]) if durations[uid] else None,
+                             median(durations[uid]) if durations[uid] else None, sum(durations[uid]) / 60)
+                for uid in per_artist.keys() | durations.keys()}
+    assert activity.bookings['total'] == len(bookings)
+    assert activity.bookings['appointments'] == sum(len(node) for node in EXPORT['appointmentsByArtist'].values())
+    assert {name: tuple(row) for name, *row in activity.bookings['rows']} == expected
+
+    assert activity.aftercare['total'] == 2
+    assert dict(activity.aftercare['statuses']) == {'active': 1, 'completed': 1}
+    assert activity.aftercare['latency']['max'] == 1.0
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import cgg_batch
+
+LEAD = {'clientId': 'c1', 'clientName': 'Camille', 'message': 'Bonjour', 'style': 'fineline',
+        'city': 'Lyon', 'createdAt': 1_700_000_000_000, 'status': 'new'}
+
+EXPORT = {
+    'publicProfiles': {
+        'a1': {'role': 'artist', 'displayName': 'Alex', 'city': 'Lyon'},
+        'a2': {'role': 'artist', 'displayName': 'Sam'},
+        'c1': {'role': 'client', 'displayName': 'Camille'},
+    },
+    # Live layout for a1, flat layout (owner field) for a2
+    'leadsByArtist': {'a1': {'l1': LEAD, 'l2': dict(LEAD, status='accepted')}},
+    'leads': {'l3': dict(LEAD, artistId='a2'), 'l4': dict(LEAD, artistId='a3')},
+    'bookings': [{'artistId': 'a1', 'status': 'pending', 'requestedAt': 1}],
+    'appointmentsByArtist': {'a2': {'p1': {'title': 'Séance', 'startsAt': 0, 'endsAt': 5_400_000}}},
+}
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / 'export.json'
+    path.write_text(json.dumps(EXPORT, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+def test_records_grouped_per_artist(export):
+    index = cgg_batch.load_artists(export)
+    assert index.uids() == ['a1', 'a2']
+    a1, a2 = index.data('a1'), index.data('a2')
+    assert a1['profile'] == EXPORT['publicProfiles']['a1']
+    assert sorted(a1['leads']) == ['l1', 'l2']
+    assert list(a1['bookings'].values()) == EXPORT['bookings']
+    assert 'appointments' not in a1
+    assert sorted(a2['leads']) == ['l3']
+    assert list(a2['appointments']) == ['p1']
+
+
+def test_only_requested_artists_are_kept(export):
+    index = cgg_batch.load_artists(export, ['a2', 'c1'])
+    assert index.uids() == ['a2', 'c1']
+    assert {uid for uid, _ in index.records} == {'a2'}
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_one_file_per_artist(export, tmp_path, workers):
+    out = tmp_path / 'out'
+    manifest = cgg_batch.run_batch(export, ['a1', 'a2', 'nobody'], out, ('md', 'html'), workers=workers)
+    assert [g['uid'] for g in manifest['generated']] == ['a1', 'a2']
+    assert [f['uid'] for f in manifest['failed']] == ['nobody']
+    assert sorted(p.name for p in out.iterdir()) == [
+        'a1.html', 'a1.md', 'a2.html', 'a2.md', cgg_batch.MANIFEST_NAME]
+    text = (out / 'a1.md').read_text(encoding='utf-8')
+    assert 'Alex' in text and 'Camille' in text
+    assert json.loads((out / cgg_batch.MANIFEST_NAME).read_text(encoding='utf-8')) == manifest
+
+
+@pytest.mark.parametrize('locale, texts', [
+    ('fr', ['RAPPORT ARTISTE', 'Nom affiché', 'Aucune donnée.', '| Note | 4,5 |', '| Public | oui |']),
+    ('en', ['ARTIST REPORT', 'Display name', 'No data.', '| Rating | 4.5 |', '| Public | yes |']),
+])
+def test_artist_report_locale(export, tmp_path, locale, texts):
+    index = cgg_batch.load_artists(export)
+    data = dict(index.data('a1'), profile=dict(EXPORT['publicProfiles']['a1'], rating=4.5, isPublic=True))
+    report = cgg_batch.build_artist_report('a1', data, locale)
+    assert report.locale == locale
+    text = cgg_batch.render('md', report, tmp_path / 'a1.md').read_text(encoding='utf-8')
+    for expected in texts:
+        assert expected in text
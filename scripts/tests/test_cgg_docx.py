@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from io import BytesIO
+from zipfile import ZipFile
+
+import pytest
+
+import cgg_docx
+import generate_cgg_report
+
+
+@pytest.fixture(scope='module', params=['outline', 'export'])
+def report(request):
+    # The report without data, and with the sections, figures and annexes
+    # of an export
+    if request.param == 'outline':
+        return generate_cgg_report.build_report()
+    export = request.getfixturevalue('synthetic_export')
+    return generate_cgg_report.build_report(*generate_cgg_report.analyze_input(str(export)))
+
+
+def _document_xml(report):
+    return cgg_docx.build_document(report).part.blob
+
+
+def test_cached_sections_match_a_plain_build(report, cache_dir):
+    report.cache_sections = False
+    plain = _document_xml(report)
+    assert not cache_dir.exists() or not list(cache_dir.glob('section-*.zip'))
+    report.cache_sections = True
+    cold = _document_xml(report)
+    assert list(cache_dir.glob('section-*.zip'))
+    warm = _document_xml(report)
+    assert cold == plain
+    assert warm == plain
+
+
+def test_sections_are_not_cached_unless_asked(report, cache_dir):
+    report.cache_sections = False
+    _document_xml(report)
+    assert not list(cache_dir.glob('section-*.zip'))
+
+
+def test_write_package_matches_doc_save(report, tmp_path):
+    doc = cgg_docx.build_document(report)
+    saved = BytesIO()
+    doc.save(saved)
+    path = tmp_path / 'report.docx'
+    cgg_docx.write_package(doc, path)
+    with ZipFile(saved) as expected, ZipFile(path) as written:
+        assert sorted(written.namelist()) == sorted(expected.namelist())
+        for name in expected.namelist():
+            assert written.read(name) == expected.read(name), name
+
+
+def test_write_package_is_reproducible(report, tmp_path):
+    doc = cgg_docx.build_document(report)
+    first, second = tmp_path / 'a.docx', tmp_path / 'b.docx'
+    cgg_docx.write_package(doc, first)
+    cgg_docx.write_package(doc, second)
+    assert first.read_bytes() == second.read_bytes()
+
+
+def _package(doc):
+    saved = BytesIO()
+    doc.save(saved)
+    with ZipFile(saved) as package:
+        return {name: package.read(name) for name in package.namelist()}
+
+
+def _png():
+    from PIL import Image
+
+    data = BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(data, 'PNG')
+    return BytesIO(data.getvalue())
+
+
+def test_template_copies_are_independent(cache_dir):
+    skeleton = generate_cgg_report.build_report().nodes[:1]
+    cgg_docx._templates.clear()
+    changed = cgg_docx.open_template(skeleton)  # built, then kept on disk and in memory
+    untouched = _package(cgg_docx.open_template(skeleton))
+    assert cgg_docx.template_bytes(skeleton) == cgg_docx._build_template(skeleton)
+
+    changed.add_paragraph('modifié')
+    changed.add_picture(_png())
+    changed.core_properties.title = 'modifié'
+    changed.styles['Normal'].font.bold = True
+    changed.sections[0].footer.add_paragraph('pied modifié')
+    warm = cgg_docx.open_template(skeleton)
+    assert warm.part.package is not changed.part.package
+    assert _package(warm) == untouched
+    cgg_docx._templates.clear()  # read back from the disk cache
+    assert _package(cgg_docx.open_template(skeleton)) == untouched
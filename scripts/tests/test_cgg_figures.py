@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import json
+
+import cgg_figures
+
+
+def _states(specs):
+    return [spec for spec in specs if spec['kind'] == 'states']
+
+
+def test_state_edges_are_declared_transitions():
+    declared = {kind: {(a, b) for a, b in transitions}
+                for kind, (_, transitions) in cgg_figures.LIFECYCLES.items()}
+    lead, general = _states(cgg_figures.figure_specs())
+    assert lead['states'] == ['new', 'accepted', 'declined', 'archived']
+    assert ('●', 'new', '') in lead['edges']
+    assert {(a, b) for a, b, _ in lead['edges'] if a != '●'} == declared['lead']
+    assert ('accepted', 'declined', '') not in lead['edges']
+    for a, b, _ in general['edges']:
+        assert a == '●' or (a.split(' ', 1)[1], b.split(' ', 1)[1]) in declared['lead'] | {cgg_figures.HANDOFF}
+
+
+def test_rules_without_status_enums(tmp_path):
+    rules = tmp_path / 'rules.json'
+    rules.write_text(json.dumps({'rules': {'leads': {'$leadId': {'status': {'.validate': 'newData.isString()'}}}}}))
+    for spec in _states(cgg_figures.figure_specs(rules)):
+        assert spec['states'] == [] and spec['edges'] == []
+        assert cgg_figures.draw(dict(spec, title='states'), dpi=50)
+
+
+def test_missing_figures_drawn_by_the_callers_executor():
+    class Executor:
+        calls = 0
+
+        def map(self, fn, *iterables):
+            Executor.calls += 1
+            return map(fn, *iterables)
+
+    specs = [dict(spec, title=str(n)) for n, spec in enumerate(_states(cgg_figures.figure_specs()))]
+    assert cgg_figures.render_figures(specs, 50, Executor()) == cgg_figures.render_figures(specs, 50)
+    assert Executor.calls == 1
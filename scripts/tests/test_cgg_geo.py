@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from cgg_geo import GridIndex, artist_nearest, haversine_km
+
+
+def _brute_force(lat, lon, qlat, qlon, exclude_self=False):
+    d = haversine_km(qlat[:, None], qlon[:, None], lat[None, :], lon[None, :])
+    if exclude_self:
+        np.fill_diagonal(d, np.inf)
+    return d.min(axis=1)
+
+
+def _points(case, rng):
+    if case == 'north pole':
+        return rng.uniform(86, 90, 2000), rng.uniform(-180, 180, 2000)
+    if case == 'south pole':
+        return rng.uniform(-90, -84, 2000), rng.uniform(-180, 180, 2000)
+    if case == 'antimeridian':
+        east = rng.random(2000) < 0.5
+        return rng.uniform(-60, 60, 2000), np.where(east, rng.uniform(179.5, 180, 2000),
+                                                    rng.uniform(-180, -179.5, 2000))
+    if case == 'sparse':
+        return rng.uniform(-90, 90, 40), rng.uniform(-180, 180, 40)
+    # a dense city and scattered points
+    return (np.r_[rng.normal(45.5, 0.05, 1500), rng.uniform(-90, 90, 500)],
+            np.r_[rng.normal(-73.6, 0.05, 1500), rng.uniform(-180, 180, 500)])
+
+
+@pytest.mark.parametrize('case', ['north pole', 'south pole', 'antimeridian', 'sparse', 'city'])
+def test_nearest_matches_brute_force(case):
+    rng = np.random.default_rng(0)
+    lat, lon = _points(case, rng)
+    index = GridIndex(lat, lon)
+    np.testing.assert_allclose(index.nearest(lat, lon, exclude_self=True),
+                               _brute_force(lat, lon, lat, lon, exclude_self=True), rtol=1e-9)
+    qlat, qlon = rng.uniform(-90, 90, 300), rng.uniform(-180, 180, 300)
+    np.testing.assert_allclose(index.nearest(qlat, qlon), _brute_force(lat, lon, qlat, qlon), rtol=1e-9)
+
+
+def test_artists_sharing_coordinates():
+    lat = np.array([45.5, 45.5, 46.0])
+    lon = np.array([-73.6, -73.6, -73.6])
+    nn = artist_nearest(lat, lon)
+    assert nn[0] == nn[1] == 0.0
+    assert nn[2] == pytest.approx(haversine_km(45.5, -73.6, 46.0, -73.6))
+
+
+def test_empty_index():
+    assert np.isinf(GridIndex([], []).nearest([0.0], [0.0])).all()
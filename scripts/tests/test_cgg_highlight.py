@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import re
+from html import unescape
+from io import StringIO
+
+from lxml import etree
+
+import cgg_docx
+import cgg_highlight
+import cgg_html
+from cgg_highlight import highlight
+from cgg_model import CodeBlock
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MARKUP = {kind: f'[{kind}:%s]' for kind in cgg_highlight.COLORS}
+
+LISTING = '{\n  "a<b": "x & y",\n  ".read": true,\n  "n": -1.5e3\n}'
+RULES = "match /b/{id} {\n  // a < b & c\n  allow read: if 'x' == \"<y>\";\n}"
+
+
+def test_json_tokens_and_escaping():
+    assert highlight(LISTING, 'json', MARKUP) == (
+        '{\n  [key:"a&lt;b"]: [string:"x &amp; y"],\n  [key:".read"]: [literal:true],\n'
+        '  [key:"n"]: [number:-1.5e3]\n}')
+
+
+def test_rules_tokens_and_escaping():
+    assert highlight(RULES, 'rules', MARKUP) == (
+        "[keyword:match] /b/{id} {\n  [comment:// a &lt; b &amp; c]\n"
+        "  [keyword:allow] [keyword:read]: [keyword:if] [string:'x'] == [string:\"&lt;y&gt;\"];\n}")
+
+
+def test_plain_when_unsupported_or_too_long():
+    assert highlight(LISTING, 'python', MARKUP) is None
+    assert highlight('1\n' * cgg_highlight.MAX_LINES, 'json', MARKUP) is None
+
+
+def _runs(xml):
+    # -> [(style, text)] of a w:p's runs, breaks as newlines
+    p = etree.fromstring(f'<w:p xmlns:w="{W[1:-1]}">{xml}</w:p>')
+    runs = []
+    for r in p.iter(W + 'r'):
+        style = r.find(f'{W}rPr/{W}rStyle')
+        text = ''.join(e.text or '' if e.tag == W + 't' else '\n' for e in r if e.tag in (W + 't', W + 'br'))
+        runs.append((None if style is None else style.get(W + 'val'), text))
+    return runs
+
+
+def test_docx_code_runs():
+    for text, language in [(LISTING, 'json'), (RULES, 'rules'), (LISTING, None)]:
+        runs = _runs(cgg_docx._code_xml(text, language))
+        assert ''.join(t for _, t in runs) == text
+        assert all(t for _, t in runs)  # no empty run left around tokens and breaks
+    runs = _runs(cgg_docx._code_xml(LISTING, 'json'))
+    tokens = [(style, t) for style, t in runs if style != cgg_docx._code_style_id(None)]
+    assert [(cgg_docx._code_style_id('key'), '"a<b": ')] == tokens[:1]
+    assert (cgg_docx._code_style_id('string'), '"x & y",\n  ') in tokens
+
+
+def test_html_code_escaping():
+    out = StringIO()
+    cgg_html._code(out, CodeBlock(LISTING, 'json'))
+    html = out.getvalue()
+    assert '<span class="tk-key">"a&lt;b"</span>' in html
+    assert unescape(re.sub('<[^>]+>', '', html)) == LISTING + '\n'
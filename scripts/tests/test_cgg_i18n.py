@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from string import Formatter
+
+import pytest
+
+from cgg_i18n import DEFAULT_LOCALE, Messages, available_locales, catalog
+
+OTHER_LOCALES = [locale for locale in available_locales() if locale != DEFAULT_LOCALE]
+
+
+def _shape(value):
+    # Strings compare by their placeholders, lists by their nesting
+    if isinstance(value, list):
+        return [_shape(v) for v in value]
+    return sorted(name for _, name, _, _ in Formatter().parse(value) if name is not None)
+
+
+def test_locales():
+    assert DEFAULT_LOCALE in available_locales()
+    assert OTHER_LOCALES
+
+
+@pytest.mark.parametrize('locale', OTHER_LOCALES)
+def test_same_keys(locale):
+    source, translated = catalog(DEFAULT_LOCALE), catalog(locale)
+    assert sorted(set(source) - set(translated)) == []
+    assert sorted(set(translated) - set(source)) == []
+
+
+@pytest.mark.parametrize('locale', OTHER_LOCALES)
+def test_same_placeholders_and_shapes(locale):
+    source, translated = catalog(DEFAULT_LOCALE), catalog(locale)
+    for key in source.keys() & translated.keys():
+        assert _shape(translated[key]) == _shape(source[key]), key
+
+
+def test_unknown_locale():
+    with pytest.raises(ValueError):
+        Messages('xx')
+
+
+def test_formatting():
+    fr, en = Messages('fr'), Messages('en')
+    assert fr.number(12.34) == '12,3'
+    assert en.number(12.34) == '12.3'
+    assert fr.percent(12.34) == '12,3 %'
+    assert en.percent(12.34, digits=2) == en('number.percent', value='12.34')
+    assert fr('diagrams.more', n=3) != en('diagrams.more', n=3)
+    assert '3' in en('diagrams.more', n=3)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from cgg_analytics import SOURCES
+from cgg_ingest import EventReader, compile_validate, iter_records, scan_export
+
+LEAD = {'clientId': 'c1', 'clientName': 'Camille', 'message': 'Bonjour', 'style': 'fineline',
+        'city': 'Lyon', 'createdAt': 1_700_000_000_000, 'status': 'new'}
+
+EXPORT = {
+    'users': {
+        'a1': {'role': 'artist', 'email': 'a1@example.com', 'createdAt': 1},
+        'c1': {'role': 'admin'},
+    },
+    'publicProfiles': {
+        'a1': {'role': 'artist', 'city': 'Lyon', 'latitude': 45.76, 'longitude': 4.84},
+        'c1': {'role': 'client', 'latitude': '45.7', 'longitude': 4.8},
+    },
+    'messages': {
+        't1': {
+            'm1': {'id': 'm1', 'senderId': 'a1', 'createdAt': 1, 'kind': 'text', 'text': 'Salut'},
+            'm2': {'id': 'm2', 'senderId': 'c1', 'createdAt': 2, 'kind': 'sticker'},
+            'm3': {'senderId': 'c1', 'createdAt': 3, 'kind': 'text'},
+        },
+    },
+    'leadsByArtist': {
+        'a1': {'l1': LEAD, 'l2': dict(LEAD, status='pending')},
+    },
+    'unknownNode': {'x': [1, 2, {'y': None}]},
+}
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / 'export.json'
+    path.write_text(json.dumps(EXPORT, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+def test_event_reader_events():
+    reader = EventReader('{"a": [1, "xé\\n", true, null], "b": {"c": -2.5e1}}'.encode())
+    events = []
+    while (event := reader.next_event()) is not None:
+        events.append(event[:2])
+    assert events == [
+        ('start_map', None), ('map_key', 'a'), ('start_array', None), ('number', 1),
+        ('string', 'xé\n'), ('boolean', True), ('null', None), ('end_array', None),
+        ('map_key', 'b'), ('start_map', None), ('map_key', 'c'), ('number', -25.0),
+        ('end_map', None), ('end_map', None),
+    ]
+
+
+def test_event_reader_skip():
+    reader = EventReader(b'{"a": {"b": [1, {"c": "}"}]}, "d": 2}')
+    assert reader.next_event()[0] == 'start_map'
+    assert reader.next_event()[:2] == ('map_key', 'a')
+    assert reader.next_event()[0] == 'start_map'
+    reader.skip()
+    assert reader.next_event()[:2] == ('map_key', 'd')
+    assert reader.next_event()[:2] == ('number', 2)
+
+
+@pytest.mark.parametrize('expr, value, expected', [
+    ("newData.isString() || newData.val() == null", 'x', True),
+    ("newData.isString() || newData.val() == null", None, True),
+    ("newData.isString() || newData.val() == null", 3, False),
+    ("newData.val() == 'artist' || newData.val() == 'client'", 'admin', False),
+    ("newData.isString() && newData.val().matches(/^(new|accepted|declined|archived)$/)", 'new', True),
+    ("newData.isString() && newData.val().matches(/^(new|accepted|declined|archived)$/)", 'pending', False),
+    # Rules that depend on the auth state cannot be decided from an export
+    ("newData.isString() && newData.val() == auth.uid", 'x', None),
+])
+def test_compile_validate(expr, value, expected):
+    assert compile_validate(expr)(value) is expected
+
+
+def test_scan_export_violations(export):
+    stats = scan_export(export)
+    violations = {pattern: rec.violations for pattern, rec in stats.records.items() if rec.violations}
+    assert violations == {
+        'users/$uid': {'role': 1},
+        'publicProfiles/$uid': {'latitude': 1},
+        'messages/$threadId/$messageId': {'kind': 1, '': 1},
+        'leadsByArtist/$uid/$leadId': {'status': 1},
+    }
+    assert stats.total_violations == 5
+    assert stats.records['messages/$threadId/$messageId'].samples['kind'] == [
+        ('messages/t1/m2/kind', "'sticker'")]
+
+
+def test_scan_export_counts(export):
+    stats = scan_export(export)
+    assert stats.nodes['messages']['records'] == 3
+    assert stats.nodes['leadsByArtist']['records'] == 2
+    assert stats.records['users/$uid'].fill_rates() == {'role': 1.0, 'email': 0.5, 'createdAt': 0.5}
+    # Outside the rules: only measured
+    assert stats.nodes['unknownNode']['records'] == 0
+    for top, value in EXPORT.items():
+        assert stats.nodes[top]['bytes'] == len(json.dumps(value, ensure_ascii=False).encode())
+
+
+def test_scan_sink_matches_iter_records(export):
+    seen = []
+    sink = {pattern: lambda *record: seen.append(record) for pattern in SOURCES}
+    scan_export(export, sink=sink)
+    assert sorted(seen, key=repr) == sorted(iter_records(export, SOURCES), key=repr)
+    assert ('messages/$threadId/$messageId', ('t1', 'm3'), EXPORT['messages']['t1']['m3']) in seen
+
+
+def test_synthetic_export_follows_the_rules(synthetic_export):
+    stats = scan_export(str(synthetic_export))
+    assert stats.records
+    assert stats.total_violations == 0
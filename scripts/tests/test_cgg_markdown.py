@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import re
+
+import pytest
+
+import cgg_markdown
+from cgg_model import Report
+
+
+def _code_blocks(markdown):
+    # -> [(info string, content)] as a CommonMark reader sees them: a fence
+    # closes at the first line of at least as many backticks
+    blocks, lines = [], iter(markdown.split('\n'))
+    for line in lines:
+        opening = re.match(r'(`{3,})(.*)$', line)
+        if opening:
+            content = []
+            for line in lines:
+                if re.fullmatch(r' {0,3}`{%d,}\s*' % len(opening[1]), line):
+                    break
+                content.append(line)
+            blocks.append((opening[2], '\n'.join(content)))
+    return blocks
+
+
+@pytest.mark.parametrize('text', [
+    '{"a": 1}',
+    'Exemple:\n```\ncode\n```\nfin',
+    '````json\n{}\n````',
+    'inline `x` and ``y``',
+])
+def test_code_block_fences(tmp_path, text):
+    report = Report()
+    report.code(text, language='json')
+    report.paragraph('après')
+    path = tmp_path / 'report.md'
+    cgg_markdown.render(report, path)
+    markdown = path.read_text(encoding='utf-8')
+    assert _code_blocks(markdown) == [('json', text)]
+    assert markdown.rstrip().endswith('après')
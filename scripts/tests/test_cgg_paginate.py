@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import cgg_paginate
+import cgg_pdf
+from cgg_model import Report
+
+HEADERS = ['Clé', 'Valeur']
+FILLER = "Texte de remplissage qui occupe une ligne ou deux de la page. " * 3
+
+
+def _report(fillers=0):
+    # Contents, a section per page break, a captioned table of several pages
+    # and a heading that follows `fillers` paragraphs
+    report = Report(title='Pagination')
+    report.toc()
+    report.toc(kind='tables')
+    report.page_break()
+    for n in range(1, 4):
+        report.heading(f'Section {n}', level=1)
+        report.paragraph(FILLER)
+        report.page_break()
+    report.heading('Tableau', level=1)
+    report.table(HEADERS, [[f'item{i:03d}', FILLER[:40]] for i in range(150)], caption='Longue table')
+    report.heading('Suite', level=1)
+    for _ in range(fillers):
+        report.paragraph(FILLER)
+    report.heading('Titre gardé', level=2)
+    report.paragraph('Premier paragraphe du titre gardé.')
+    return cgg_paginate.paginate(cgg_paginate.index(report), ('pdf',))
+
+
+def _pages(report, tmp_path):
+    # -> the text of every page of the rendered PDF
+    pypdf = pytest.importorskip('pypdf')
+    path = tmp_path / 'report.pdf'
+    cgg_pdf.render(report, path)
+    return [page.extract_text() for page in pypdf.PdfReader(path).pages]
+
+
+def _entries(report, kind):
+    toc = next(node for node in report if getattr(node, 'kind', None) == kind)
+    return {text: page for (_, text, _), page in zip(toc.entries, toc.pages['pdf'])}
+
+
+def test_page_breaks_and_contents(tmp_path):
+    report = _report()
+    pages = _pages(report, tmp_path)
+    assert len(pages) == report.pages['pdf'] > 5
+    contents = _entries(report, 'contents')
+    assert [contents[f'Section {n}'] for n in range(1, 4)] == [2, 3, 4]
+    assert contents['Tableau'] == 5
+    for text, page in contents.items():
+        assert text in pages[page - 1], text
+        # Page 1 holds the contents
+        assert not any(text in other for other in pages[1:page - 1]), text
+    assert _entries(report, 'tables') == {'Longue table': 5}
+
+
+def test_table_header_repeated_on_every_page(tmp_path):
+    report = _report()
+    pages = _pages(report, tmp_path)
+    spanned = [text for text in pages if 'item' in text]
+    assert len(spanned) > 1
+    rows = []
+    for text in spanned:
+        lines = text.split('\n')
+        header = lines.index('Clé Valeur')
+        assert not any('item' in line for line in lines[:header])
+        rows += [line.split()[0] for line in lines if line.startswith('item')]
+    assert rows == [f'item{i:03d}' for i in range(150)]
+
+
+@pytest.mark.parametrize('fillers', range(0, 40, 3))
+def test_heading_kept_with_next(tmp_path, fillers):
+    report = _report(fillers)
+    pages = _pages(report, tmp_path)
+    page = _entries(report, 'contents')['Titre gardé']
+    assert 'Titre gardé' in pages[page - 1]
+    assert 'Premier paragraphe du titre gardé.' in pages[page - 1]
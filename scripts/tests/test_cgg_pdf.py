@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+import cgg_pdf
+from cgg_pdf import NORMAL, text_width, wrap_runs
+
+
+def _texts(lines):
+    return [''.join(text for text, _, _ in line) for line in lines]
+
+
+def test_wrap_breaks_words_between_lines():
+    lines = wrap_runs([("un deux trois quatre cinq", NORMAL)], text_width("un deux trois", NORMAL) + 1)
+    assert _texts(lines) == ["un deux trois", "quatre cinq"]
+    assert _texts(wrap_runs([("a\nb", NORMAL)], 100)) == ["a", "b"]
+
+
+def test_wrap_breaks_long_words_at_the_last_character_that_fits():
+    word = "abcdefghijklmnopqrstuvwxyzàéWM0123456789" * 5
+    width = 120.0
+    lines = wrap_runs([("début " + word, NORMAL)], width)
+    texts = _texts(lines)
+    assert texts[0] == "début"
+    assert ''.join(texts[1:]) == word
+    for text, following in zip(texts[1:], texts[2:]):
+        assert text_width(text, NORMAL) <= width
+        # One more character would not have fitted
+        assert text_width(text + following[0], NORMAL) > width
+
+
+def test_wrap_long_words_in_linear_time():
+    word = "abcdefghij" * 10_000
+    t0 = time.perf_counter()
+    lines = wrap_runs([(word, NORMAL)], 200.0)
+    assert time.perf_counter() - t0 < 2.0
+    assert ''.join(_texts(lines)) == word
+
+
+@pytest.mark.parametrize('rows', [[['a', 'b', 'c']], {'A': ['a'], 'B': ['b']}])
+def test_table_rows_wider_than_the_header(tmp_path, rows):
+    import cgg_docx
+    from docx import Document
+
+    with cgg_pdf.PdfReport(tmp_path / 'table.pdf') as pdf:
+        if isinstance(rows, dict):
+            pdf.table(['A', 'B'], rows)  # a columnar batch cannot be wider
+            return
+        with pytest.raises(ValueError, match='3 cells, table has 2 columns'):
+            pdf.table(['A', 'B'], rows)
+    with pytest.raises(ValueError, match='3 cells, table has 2 columns'):
+        cgg_docx.add_table(Document(), ['A', 'B'], rows)
+
+
+def test_round_trip(tmp_path, synthetic_export):
+    pypdf = pytest.importorskip('pypdf')
+    import generate_cgg_report
+
+    import cgg_paginate
+
+    report = generate_cgg_report.build_report(*generate_cgg_report.analyze_input(str(synthetic_export)))
+    cgg_paginate.paginate(report, ('pdf',))
+    path = tmp_path / 'report.pdf'
+    cgg_pdf.render(report, path)
+    reader = pypdf.PdfReader(path)
+    assert len(reader.pages) == report.pages['pdf'] > 1
+    assert reader.metadata.title == report.title
+    text = reader.pages[0].extract_text()
+    assert 'INKMATCHING' in text.upper()
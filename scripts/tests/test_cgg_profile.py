@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import tracemalloc
+
+import pytest
+
+import cgg_profile
+from cgg_model import Heading, Paragraph
+
+
+@pytest.fixture
+def profiler():
+    profiler = cgg_profile.enable()
+    yield profiler
+    cgg_profile.disable()
+
+
+def test_section_closed_when_a_renderer_raises(profiler):
+    def paragraph(target, node):
+        if node.text == 'boom':
+            raise RuntimeError(node.text)
+        target.append(node.text)
+
+    renderers = {Heading: lambda target, node: target.append(node.text), Paragraph: paragraph}
+    nodes = [Heading('Un', 1), Paragraph('a'), Heading('Deux', 1), Paragraph('boom')]
+    with pytest.raises(RuntimeError):
+        profiler.render_nodes(renderers, [], nodes)
+    assert profiler._stack == []
+    assert [e['name'] for e in profiler.events if e['cat'] == 'section'] == ['Un', 'Deux']
+
+
+def test_tracing_started_by_the_caller_keeps_running():
+    tracemalloc.start()
+    try:
+        cgg_profile.enable()
+        cgg_profile.disable()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    cgg_profile.enable()
+    cgg_profile.disable()
+    assert not tracemalloc.is_tracing()
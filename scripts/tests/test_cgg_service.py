@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+
+import cgg_service
+from conftest import SCRIPTS
+
+EXPORT = {
+    'publicProfiles': {
+        'a1': {'role': 'artist', 'displayName': 'Alex', 'city': 'Lyon'},
+        'c1': {'role': 'client', 'displayName': 'Camille'},
+    },
+    'leads': {'l1': {'artistId': 'a1', 'clientName': 'Camille', 'status': 'new', 'createdAt': 1}},
+}
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / 'export.json'
+    path.write_text(json.dumps(EXPORT, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+async def _fetch(port, target, method='GET'):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'{method} {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b'\r\n\r\n', 1)
+    lines = head.decode('latin-1').split('\r\n')
+    headers = dict(line.split(': ', 1) for line in lines[1:])
+    if headers.get('Transfer-Encoding') == 'chunked':
+        chunks = []
+        while True:
+            size, body = body.split(b'\r\n', 1)
+            if not int(size, 16):
+                break
+            chunks.append(body[:int(size, 16)])
+            body = body[int(size, 16) + 2:]
+        body = b''.join(chunks)
+    return int(lines[0].split(' ')[1]), headers, body
+
+
+def _serve(export, tmp_path, scenario):
+    # Runs scenario(service, port) against a service with one worker
+    async def main():
+        service = cgg_service.ReportService(cgg_service.FileSnapshot(export), tmp_path / 'cache',
+                                            workers=1, formats=('md',))
+        try:
+            await service.start()
+            server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+            async with server:
+                return await scenario(service, server.sockets[0].getsockname()[1])
+        finally:
+            service.close()
+    return asyncio.run(main())
+
+
+def test_artist_report_and_cached_repeat(export, tmp_path):
+    async def scenario(service, port):
+        first = await _fetch(port, '/report/a1?format=md')
+        second = await _fetch(port, '/report/a1?format=md')
+        return first, second, service.renders
+
+    (status, headers, body), second, renders = _serve(export, tmp_path, scenario)
+    assert status == 200
+    assert headers['Content-Type'] == cgg_service.CONTENT_TYPES['md']
+    assert headers['Content-Disposition'] == 'attachment; filename="a1.md"'
+    assert 'Alex' in body.decode('utf-8')
+    assert second == (status, headers, body)
+    assert renders == 1
+
+
+def test_artist_report_in_english(export, tmp_path):
+    async def scenario(service, port):
+        return await _fetch(port, '/report/a1?format=md&lang=en')
+
+    status, headers, body = _serve(export, tmp_path, scenario)
+    assert status == 200
+    assert headers['Content-Disposition'] == 'attachment; filename="a1.en.md"'
+    assert 'ARTIST REPORT' in body.decode('utf-8')
+
+
+def test_errors(export, tmp_path):
+    async def scenario(service, port):
+        return [await _fetch(port, target, method) for target, method in [
+            ('/report/c1?format=md', 'GET'), ('/report/nobody?format=md', 'HEAD'),
+            ('/report?format=odt', 'GET'), ('/report', 'POST')]]
+
+    (client, head, bad, post) = _serve(export, tmp_path, scenario)
+    assert client[0] == 404 and 'publicProfiles/c1' in json.loads(client[2])['error']
+    assert head[0] == 404 and head[1]['Content-Length'] != '0' and head[2] == b''
+    assert bad[0] == 400
+    assert post[0] == 405
+
+
+def test_pool_rebuilt_after_a_worker_dies(export, tmp_path):
+    async def scenario(service, port):
+        for pid in list(service.pool._processes):
+            os.kill(pid, signal.SIGKILL)
+        failed = await _fetch(port, '/report/a1?format=md')
+        return failed, await _fetch(port, '/report/a1?format=md')
+
+    failed, retried = _serve(export, tmp_path, scenario)
+    assert failed[0] == 500
+    assert retried[0] == 200
+
+
+@pytest.mark.parametrize('when', ['serving', 'starting'])
+def test_sigterm_stops_the_workers(export, when):
+    server = subprocess.Popen([sys.executable, str(SCRIPTS / 'generate_cgg_report.py'), '--serve', '0',
+                               '--input', export, '--workers', '1'],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        if when == 'serving':
+            assert 'http://127.0.0.1:' in server.stdout.readline()
+        server.terminate()
+        # No worker, forkserver or resource tracker outlives the service
+        # with its stdout still open
+        out, err = server.communicate(timeout=30)
+    finally:
+        server.kill()
+    if when == 'serving':
+        assert server.returncode == 0
+    assert 'leaked' not in err